@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Appointment, Consultation
+from .models import Appointment, AppointmentSeries, Consultation, DoctorPatientPanel
 
 class ConsultationInline(admin.StackedInline):
     model = Consultation
@@ -19,3 +19,16 @@ class ConsultationAdmin(admin.ModelAdmin):
     list_filter = ('follow_up_needed', 'consultation_datetime')
     search_fields = ('patient__first_name', 'patient__last_name', 'doctor__first_name', 'doctor__last_name', 'diagnosis')
     date_hierarchy = 'consultation_datetime'
+
+@admin.register(DoctorPatientPanel)
+class DoctorPatientPanelAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'patient', 'first_visit', 'last_visit', 'visit_count')
+    search_fields = ('patient__first_name', 'patient__last_name', 'doctor__first_name', 'doctor__last_name')
+    date_hierarchy = 'last_visit'
+
+
+@admin.register(AppointmentSeries)
+class AppointmentSeriesAdmin(admin.ModelAdmin):
+    list_display = ('id', 'patient', 'doctor', 'frequency', 'interval', 'start_datetime', 'until', 'occurrences')
+    list_filter = ('frequency',)
+    search_fields = ('patient__first_name', 'patient__last_name', 'doctor__first_name', 'doctor__last_name')
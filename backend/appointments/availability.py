@@ -0,0 +1,189 @@
+"""
+Doctor availability from weekly StaffSchedule windows minus booked appointments.
+
+A doctor's free time over a date range is held as an integer bitmask with
+one bit per ``SLOT_MINUTES`` slot on the grid that starts at local midnight:
+working hours set bits and every appointment that is not cancelled clears
+the slots it overlaps. Appointments have no duration, so each one occupies
+``SLOT_MINUTES`` from its start. Any set of doctors and dates is answered
+with three queries (doctors, schedules, booked appointments).
+
+Bookings cluster on a few slot starts shared by many doctors, so each
+distinct start is converted to bits once; weekly schedules are expanded
+over the range once per distinct schedule.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from userauth.directory import get_doctor_directory
+from userauth.models import Staff, StaffSchedule
+from .models import INACTIVE_STATUSES, SLOT_MINUTES, Appointment
+
+SLOT = timedelta(minutes=SLOT_MINUTES)
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+MAX_RANGE_DAYS = 31
+WEEKDAYS = [day for day, _ in StaffSchedule.DAYS_OF_WEEK]
+# The set bit positions of every byte value, for reading a mask a byte at a time
+BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def _minutes(value):
+    """Minutes since midnight, rounded up to the next whole minute."""
+    return value.hour * 60 + value.minute + (value.second > 0 or value.microsecond > 0)
+
+
+def window_mask(start_time, end_time):
+    """Bits for the whole slots of one day that fit between ``start_time`` and ``end_time``."""
+    first = -(-_minutes(start_time) // SLOT_MINUTES)
+    last = (end_time.hour * 60 + end_time.minute) // SLOT_MINUTES
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+class SlotGrid:
+    """The slot grid for the local dates ``[start_date, end_date)``."""
+
+    def __init__(self, start_date, end_date):
+        self.start_date = start_date
+        self.days = (end_date - start_date).days
+        self.day_starts = [
+            timezone.make_aware(datetime.combine(start_date + timedelta(days=offset), time.min))
+            for offset in range(self.days + 1)
+        ]
+        self.slot_times = [
+            day_start + slot * SLOT for day_start in self.day_starts[:-1] for slot in range(SLOTS_PER_DAY)
+        ]
+        self.full = (1 << len(self.slot_times)) - 1
+        self.tz = timezone.get_current_timezone()
+
+    @property
+    def start(self):
+        return self.day_starts[0]
+
+    @property
+    def end(self):
+        return self.day_starts[-1]
+
+    def index(self, local):
+        return (local.date() - self.start_date).days * SLOTS_PER_DAY
+
+    def working_mask(self, schedule):
+        """Expand ``{day_of_week: day_mask}`` over every date in the grid."""
+        mask = 0
+        for offset in range(self.days):
+            day_mask = schedule.get(WEEKDAYS[(self.start_date.weekday() + offset) % 7])
+            if day_mask:
+                mask |= day_mask << (offset * SLOTS_PER_DAY)
+        return mask
+
+    def booked_bits(self, moment):
+        """Bits of the slots overlapped by an appointment starting at ``moment``."""
+        local = moment.astimezone(self.tz)
+        day = self.index(local)
+        first = day + (local.hour * 60 + local.minute) // SLOT_MINUTES
+        last = day + -(-_minutes(local) // SLOT_MINUTES)
+        bits = (1 << first if first >= 0 else 0) | (1 << last if last >= 0 else 0)
+        return bits & self.full
+
+    def not_before_mask(self, moment):
+        """Bits of the slots starting at or after ``moment``."""
+        if moment <= self.start:
+            return self.full
+        if moment >= self.end:
+            return 0
+        local = moment.astimezone(self.tz)
+        first = self.index(local) + -(-_minutes(local) // SLOT_MINUTES)
+        return self.full & ~((1 << first) - 1)
+
+    def slot_starts(self, mask):
+        """The start datetimes of the set bits, earliest first."""
+        times = self.slot_times
+        starts = []
+        for offset, value in enumerate(mask.to_bytes(-(-len(times) // 8), 'little')):
+            if value:
+                starts.extend(times[offset * 8 + bit] for bit in BYTE_BITS[value])
+        return starts
+
+
+def find_free_slots(start_date, end_date, doctor_ids=None, specialization=None):
+    """
+    Free slots per active doctor for dates in ``[start_date, end_date)``.
+
+    Returns a list of ``(doctor, [slot_start, ...])`` ordered by doctor name.
+    Slots already in the past are left out.
+    """
+    doctors = Staff.objects.filter(role='doctor', status='active')
+    if doctor_ids:
+        doctors = doctors.filter(id__in=doctor_ids)
+    if specialization:
+        doctors = doctors.filter(specialization=specialization)
+    doctors = list(
+        doctors.only('id', 'first_name', 'last_name', 'specialization').order_by('last_name', 'first_name', 'id')
+    )
+    if not doctors:
+        return []
+
+    ids = [doctor.id for doctor in doctors]
+    grid = SlotGrid(start_date, end_date)
+
+    schedules = {}
+    day_masks = {}
+    # Times and datetimes are read as text so each distinct value is parsed once, not once per row
+    rows = StaffSchedule.objects.filter(staff_id__in=ids, is_active=True).values_list(
+        'staff_id', 'day_of_week', Cast('start_time', CharField()), Cast('end_time', CharField())
+    )
+    for staff_id, day_of_week, start_time, end_time in rows:
+        if (start_time, end_time) not in day_masks:
+            day_masks[start_time, end_time] = window_mask(time.fromisoformat(start_time), time.fromisoformat(end_time))
+        schedules.setdefault(staff_id, {})[day_of_week] = day_masks[start_time, end_time]
+
+    booked = dict.fromkeys(ids, 0)
+    appointments = Appointment.objects.filter(
+        doctor_id__in=ids,
+        appointment_datetime__gt=grid.start - SLOT,
+        appointment_datetime__lt=grid.end,
+    ).exclude(status__in=INACTIVE_STATUSES)
+    moment_bits = {}
+    rows = appointments.values_list('doctor_id', Cast('appointment_datetime', CharField()))
+    for doctor_id, moment in rows:
+        bits = moment_bits.get(moment)
+        if bits is None:
+            bits = moment_bits[moment] = grid.booked_bits(_stored_datetime(moment))
+        booked[doctor_id] |= bits
+
+    upcoming = grid.not_before_mask(timezone.now())
+    working = {}
+    free = []
+    for doctor in doctors:
+        schedule = tuple(sorted(schedules.get(doctor.id, {}).items()))
+        if schedule not in working:
+            working[schedule] = grid.working_mask(dict(schedule)) & upcoming
+        free.append((doctor, grid.slot_starts(working[schedule] & ~booked[doctor.id])))
+    return free
+
+
+def _stored_datetime(value):
+    """Parse a datetime column read as text; the database holds naive values in UTC."""
+    moment = datetime.fromisoformat(value)
+    return moment if timezone.is_aware(moment) else moment.replace(tzinfo=dt_timezone.utc)
+
+
+def resolve_doctor(value):
+    """Find an active doctor by id or by the name shown in the doctor directory."""
+    value = str(value or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return Staff.objects.filter(role='doctor', status='active', id=int(value)).first()
+    name = value.lower()
+    if name.startswith('dr. '):
+        name = name[4:]
+    directory, _ = get_doctor_directory()
+    for entry in directory['results']:
+        if entry['name'].lower() == name:
+            return Staff.objects.filter(id=entry['id']).first()
+    return None
@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Appointment
+
+SLOT_CONSTRAINT = 'appt_unique_doctor_slot'
+
+
+class SlotUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The doctor already has an appointment in that time slot.'
+    default_code = 'slot_unavailable'
+
+
+def is_slot_conflict(error):
+    # MySQL and PostgreSQL name the constraint, SQLite names its columns
+    message = str(error)
+    return SLOT_CONSTRAINT in message or 'slot_start' in message
+
+
+@contextmanager
+def slot_guard():
+    """
+    Run appointment writes in a savepoint, turning a slot clash into ``SlotUnavailable``.
+
+    The (doctor, slot_start) unique constraint decides between concurrent
+    bookings of the same slot without locking anything wider than the index
+    entry, and the savepoint leaves any surrounding transaction usable.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as error:
+        if is_slot_conflict(error):
+            raise SlotUnavailable()
+        raise
+
+
+def book_appointment(**fields):
+    """Create an appointment or raise ``SlotUnavailable``."""
+    with slot_guard():
+        return Appointment.objects.create(**fields)
@@ -0,0 +1,59 @@
+"""
+Appointment deltas for the live waiting-room and doctor boards.
+
+Every status change (and every new booking or reassignment) is published
+after its transaction commits to ``doctor:<id>`` and ``clinic``. Set-based
+updates skip ``save()`` and its signals, so those paths publish the rows
+they touched with ``publish_appointments``.
+"""
+from django.db import transaction
+from django.utils import timezone
+from carepoint import live
+from .models import Appointment
+
+CLINIC_TOPIC = 'clinic'
+
+
+def doctor_topic(doctor_id):
+    return f'doctor:{doctor_id}'
+
+
+def appointment_event(pk, doctor_id, patient_id, status, appointment_datetime, previous_status=None):
+    return {
+        'id': pk,
+        'doctorId': doctor_id,
+        'patientId': patient_id,
+        'status': status,
+        'previousStatus': previous_status,
+        'appointmentDatetime': timezone.localtime(appointment_datetime).isoformat(),
+    }
+
+
+def publish_appointment(appointment, previous_status=None, previous_doctor_id=None):
+    topics = {CLINIC_TOPIC, doctor_topic(appointment.doctor_id)}
+    if previous_doctor_id and previous_doctor_id != appointment.doctor_id:
+        topics.add(doctor_topic(previous_doctor_id))
+    data = appointment_event(
+        appointment.pk, appointment.doctor_id, appointment.patient_id,
+        appointment.status, appointment.appointment_datetime, previous_status,
+    )
+    transaction.on_commit(lambda: live.publish(topics, data))
+
+
+def publish_appointments(ids, previous_doctor_id=None):
+    """Publish the current state of the appointments with ``ids`` once the transaction commits."""
+    ids = list(ids)
+    if not ids:
+        return
+
+    def send():
+        rows = Appointment.objects.filter(id__in=ids).values_list(
+            'id', 'doctor_id', 'patient_id', 'status', 'appointment_datetime'
+        )
+        for row in rows:
+            topics = {CLINIC_TOPIC, doctor_topic(row[1])}
+            if previous_doctor_id and previous_doctor_id != row[1]:
+                topics.add(doctor_topic(previous_doctor_id))
+            live.publish(topics, appointment_event(*row))
+
+    transaction.on_commit(send)
@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+from datetime import date, datetime, time as clock, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from appointments.availability import find_free_slots
+from appointments.models import Appointment
+from patients.models import Patient
+from userauth.models import Staff, StaffSchedule
+
+SPECIALIZATIONS = ['General Medicine', 'Pediatrics', 'Cardiology', 'Dermatology', 'Orthopedics']
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic doctors and bookings and time clinic-wide availability (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--bookings-per-day', type=int, default=10)
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        start = timezone.localdate() + timedelta(days=1)
+        end = start + timedelta(days=options['days'])
+        with transaction.atomic():
+            self.seed(rng, options['doctors'], start, end, options['bookings_per_day'])
+
+            timings = []
+            for _ in range(options['runs']):
+                began = time.perf_counter()
+                results = find_free_slots(start, end)
+                timings.append((time.perf_counter() - began) * 1000)
+
+            slots = sum(len(free) for _, free in results)
+            self.stdout.write(
+                f"{len(results)} doctors x {options['days']} days, {slots} free slots: "
+                f"p50={statistics.median(timings):.2f}ms max={max(timings):.2f}ms"
+            )
+            transaction.set_rollback(True)
+
+    def seed(self, rng, count, start, end, bookings_per_day):
+        doctors = Staff.objects.bulk_create([
+            Staff(
+                username=f'bench-doctor-{i}', first_name='Bench', last_name=f'Doctor{i:04d}', role='doctor',
+                specialization=rng.choice(SPECIALIZATIONS), status='active',
+            ) for i in range(count)
+        ])
+        StaffSchedule.objects.bulk_create(
+            StaffSchedule(staff=doctor, day_of_week=day, start_time=clock(8), end_time=clock(17))
+            for doctor in doctors for day, _ in StaffSchedule.DAYS_OF_WEEK[:6]
+        )
+        patient = Patient.objects.create(
+            first_name='Bench', last_name='Patient', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='bench-availability@example.com', contact_phone='0700000000', address='Nairobi',
+        )
+        appointments = []
+        day = start
+        while day < end:
+            for doctor in doctors:
+                for slot in rng.sample(range(18), bookings_per_day):
+                    moment = datetime.combine(day, clock(8)) + timedelta(minutes=30 * slot)
+                    appointments.append(Appointment(
+                        patient=patient, doctor=doctor, appointment_type='consultation',
+                        appointment_datetime=timezone.make_aware(moment), reason_for_visit='Benchmark',
+                        status='confirmed',
+                    ))
+            day += timedelta(days=1)
+        Appointment.objects.bulk_create(appointments, batch_size=2000)
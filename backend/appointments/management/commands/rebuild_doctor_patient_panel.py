@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from appointments.models import Appointment, DoctorPatientPanel
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the doctor-patient panel table from existing appointments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pairs = Appointment.objects.values('doctor_id', 'patient_id').annotate(
+            visit_count=Count('id'),
+            first_visit=Min('appointment_datetime'),
+            last_visit=Max('appointment_datetime'),
+        ).order_by()
+
+        created = 0
+        with transaction.atomic():
+            DoctorPatientPanel.objects.all().delete()
+            batch = []
+            for pair in pairs.iterator(chunk_size=batch_size):
+                batch.append(DoctorPatientPanel(**pair))
+                if len(batch) >= batch_size:
+                    DoctorPatientPanel.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                DoctorPatientPanel.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} doctor-patient panel rows'))
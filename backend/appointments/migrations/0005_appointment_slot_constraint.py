@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+SLOT_MINUTES = 30
+
+
+def backfill_slot_start(apps, schema_editor):
+    # The earliest booking keeps an already double-booked slot; later ones stay without a slot key
+    Appointment = apps.get_model('appointments', 'Appointment')
+    taken = set()
+    appointments = Appointment.objects.exclude(status='cancelled').order_by('created_date', 'id')
+    for appointment in appointments.iterator(chunk_size=2000):
+        moment = appointment.appointment_datetime
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        local = timezone.localtime(moment)
+        slot = local.replace(minute=local.minute - local.minute % SLOT_MINUTES, second=0, microsecond=0)
+        if (appointment.doctor_id, slot) in taken:
+            continue
+        taken.add((appointment.doctor_id, slot))
+        Appointment.objects.filter(pk=appointment.pk).update(slot_start=slot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_feed_indexes'),
+        ('patients', '0004_patientsearchtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='slot_start',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_slot_start, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('doctor', 'slot_start'), name='appt_unique_doctor_slot'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_composite_indexes'),
+        ('patients', '0005_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appointment_type', models.CharField(choices=[('initial_visit', 'Initial Visit'), ('follow_up', 'Follow Up'), ('consultation', 'Consultation'), ('procedure', 'Procedure')], default='follow_up', max_length=20)),
+                ('reason_for_visit', models.TextField()),
+                ('frequency', models.CharField(choices=[('weekly', 'Every N Weeks'), ('daily', 'Every N Days')], default='weekly', max_length=10)),
+                ('interval', models.PositiveIntegerField(default=1)),
+                ('start_datetime', models.DateTimeField()),
+                ('until', models.DateField(blank=True, null=True)),
+                ('occurrences', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='patients.patient')),
+            ],
+            options={
+                'verbose_name_plural': 'appointment series',
+            },
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='appointments', to='appointments.appointmentseries'),
+        ),
+    ]
@@ -1,8 +1,22 @@
+from datetime import timedelta
 from django.db import models
 from django.utils import timezone
 from userauth.models import Staff
 from patients.models import Patient
 
+SLOT_MINUTES = 30
+# Appointments in these states no longer hold their slot
+INACTIVE_STATUSES = ('cancelled',)
+
+
+def slot_start_for(moment):
+    """Start of the ``SLOT_MINUTES`` slot, on the local-midnight grid, that ``moment`` falls in."""
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    local = timezone.localtime(moment)
+    return local.replace(minute=local.minute - local.minute % SLOT_MINUTES, second=0, microsecond=0)
+
+
 class Appointment(models.Model):
     APPOINTMENT_TYPES = [
         ('initial_visit', 'Initial Visit'),
@@ -20,6 +34,15 @@ class Appointment(models.Model):
         ('cancelled', 'Cancelled'),
     ]
 
+    # Target status -> statuses it may be reached from in a bulk transition
+    STATUS_TRANSITIONS = {
+        'confirmed': ('pending',),
+        'checked_in': ('pending', 'confirmed'),
+        'in_progress': ('confirmed', 'checked_in'),
+        'completed': ('checked_in', 'in_progress'),
+        'cancelled': ('pending', 'confirmed', 'checked_in'),
+    }
+
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     doctor = models.ForeignKey(Staff, on_delete=models.CASCADE)
     appointment_type = models.CharField(max_length=20, choices=APPOINTMENT_TYPES)
@@ -29,10 +52,72 @@ class Appointment(models.Model):
     cancellation_reason = models.TextField(blank=True, null=True)
     created_date = models.DateTimeField(default=timezone.now)
     updated_date = models.DateTimeField(auto_now=True)
+    # Slot held by an active appointment; NULL once cancelled so the slot can be rebooked
+    slot_start = models.DateTimeField(null=True, blank=True, editable=False)
+    series = models.ForeignKey(
+        'AppointmentSeries', on_delete=models.SET_NULL, null=True, blank=True, related_name='appointments'
+    )
+
+    class Meta:
+        indexes = [
+            # Covers the availability read of a doctor's bookings without touching the table
+            models.Index(fields=['doctor', 'appointment_datetime', 'status'], name='appt_doctor_time_status_idx'),
+            models.Index(fields=['patient', 'appointment_datetime'], name='appt_patient_datetime_idx'),
+            models.Index(fields=['patient', 'status', 'appointment_datetime'], name='appt_patient_status_idx'),
+            models.Index(fields=['status', 'appointment_datetime'], name='appt_status_datetime_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'slot_start'], name='appt_unique_doctor_slot'),
+        ]
 
     def __str__(self):
         return f"{self.patient} - {self.doctor} - {self.appointment_datetime}"
 
+    def save(self, *args, **kwargs):
+        self.slot_start = None if self.status in INACTIVE_STATUSES else slot_start_for(self.appointment_datetime)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'status', 'appointment_datetime'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'slot_start'}
+        super().save(*args, **kwargs)
+
+class AppointmentSeries(models.Model):
+    FREQUENCY_CHOICES = [
+        ('weekly', 'Every N Weeks'),
+        ('daily', 'Every N Days'),
+    ]
+
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    doctor = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    appointment_type = models.CharField(max_length=20, choices=Appointment.APPOINTMENT_TYPES, default='follow_up')
+    reason_for_visit = models.TextField()
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='weekly')
+    interval = models.PositiveIntegerField(default=1)
+    start_datetime = models.DateTimeField()
+    until = models.DateField(null=True, blank=True)
+    occurrences = models.PositiveIntegerField(null=True, blank=True)
+    created_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'appointment series'
+
+    def __str__(self):
+        return f"{self.patient} - {self.doctor} - {self.get_frequency_display()} x{self.interval}"
+
+    def occurrence_datetimes(self, limit):
+        """Expand the rule into at most ``limit`` datetimes, keeping the local wall-clock time."""
+        step = timedelta(days=self.interval * (7 if self.frequency == 'weekly' else 1))
+        start = timezone.localtime(self.start_datetime).replace(tzinfo=None)
+        moments = []
+        moment = start
+        while len(moments) < limit:
+            if self.occurrences is not None and len(moments) >= self.occurrences:
+                break
+            if self.until is not None and moment.date() > self.until:
+                break
+            moments.append(timezone.make_aware(moment))
+            moment += step
+        return moments
+
 class Consultation(models.Model):
     appointment = models.OneToOneField(Appointment, on_delete=models.CASCADE)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
@@ -44,5 +129,41 @@ class Consultation(models.Model):
     follow_up_needed = models.BooleanField(default=False)
     follow_up_date = models.DateField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'consultation_datetime'], name='consult_doctor_datetime_idx'),
+            models.Index(fields=['patient', 'consultation_datetime'], name='consult_patient_datetime_idx'),
+        ]
+
     def __str__(self):
         return f"{self.patient} - {self.doctor} - {self.consultation_datetime}"
+
+class DoctorPatientPanel(models.Model):
+    doctor = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    first_visit = models.DateTimeField()
+    last_visit = models.DateTimeField()
+    visit_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['doctor', 'patient']
+        indexes = [
+            models.Index(fields=['doctor', '-last_visit'], name='panel_doctor_last_visit_idx'),
+        ]
+
+    @classmethod
+    def refresh(cls, doctor_id, patient_id):
+        """Recompute the panel row for one doctor/patient pair from their appointments."""
+        stats = Appointment.objects.filter(doctor_id=doctor_id, patient_id=patient_id).aggregate(
+            visit_count=models.Count('id'),
+            first_visit=models.Min('appointment_datetime'),
+            last_visit=models.Max('appointment_datetime'),
+        )
+        if not stats['visit_count']:
+            cls.objects.filter(doctor_id=doctor_id, patient_id=patient_id).delete()
+            return None
+        panel, _ = cls.objects.update_or_create(doctor_id=doctor_id, patient_id=patient_id, defaults=stats)
+        return panel
+
+    def __str__(self):
+        return f"{self.doctor} - {self.patient}"
@@ -1,21 +1,48 @@
 from rest_framework import serializers
-from .models import Appointment, Consultation
+from carepoint.expansion import ExpandableFieldsMixin
+from .models import Appointment, AppointmentSeries, Consultation
+from .series import MAX_SERIES_OCCURRENCES
 from patients.serializers import PatientSerializer
 from userauth.serializers import StaffSerializer
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     patient_details = PatientSerializer(source='patient', read_only=True)
     doctor_details = StaffSerializer(source='doctor', read_only=True)
+    expandable_fields = ('patient_details', 'doctor_details')
 
     class Meta:
         model = Appointment
         fields = '__all__'
 
-class ConsultationSerializer(serializers.ModelSerializer):
+class ConsultationSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     patient_details = PatientSerializer(source='patient', read_only=True)
     doctor_details = StaffSerializer(source='doctor', read_only=True)
     appointment_details = AppointmentSerializer(source='appointment', read_only=True)
+    expandable_fields = ('patient_details', 'doctor_details', 'appointment_details')
 
     class Meta:
         model = Consultation
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class AppointmentSeriesSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    patient_details = PatientSerializer(source='patient', read_only=True)
+    doctor_details = StaffSerializer(source='doctor', read_only=True)
+    appointments = AppointmentSerializer(many=True, read_only=True)
+    expandable_fields = ('patient_details', 'doctor_details', 'appointments')
+
+    class Meta:
+        model = AppointmentSeries
+        fields = '__all__'
+
+    def validate(self, attrs):
+        until = attrs.get('until')
+        occurrences = attrs.get('occurrences')
+        if (until is None) == (occurrences is None):
+            raise serializers.ValidationError('Set exactly one of until or occurrences.')
+        if occurrences is not None and not 1 <= occurrences <= MAX_SERIES_OCCURRENCES:
+            raise serializers.ValidationError({'occurrences': f'Must be between 1 and {MAX_SERIES_OCCURRENCES}.'})
+        if attrs.get('interval', 1) < 1:
+            raise serializers.ValidationError({'interval': 'Must be at least 1.'})
+        if until is not None and until < attrs['start_datetime'].date():
+            raise serializers.ValidationError({'until': 'Must not be before start_datetime.'})
+        return attrs
@@ -0,0 +1,141 @@
+"""
+Recurring appointment series.
+
+A series is expanded into appointments up front. Conflicts with existing
+bookings are found with one ``slot_start IN (...)`` query and the
+appointments are inserted with ``bulk_create``; "this and following"
+edits and cancellations are applied to the whole tail of the series with
+set-based updates. bulk_create/bulk_update skip ``save()`` and signals, so
+slot keys, doctor panels and live board deltas are maintained here.
+"""
+from datetime import datetime
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from carepoint.transitions import bulk_transition
+from .booking import SlotUnavailable, slot_guard
+from .live import publish_appointments
+from .models import Appointment, DoctorPatientPanel, slot_start_for
+
+MAX_SERIES_OCCURRENCES = 104
+# Occurrences that can still be moved by "this and following" edits
+EDITABLE_STATUSES = ('pending', 'confirmed')
+
+
+def taken_slots(doctor_id, moments, exclude_ids=()):
+    """Slot starts among ``moments`` already held by the doctor's active appointments."""
+    slots = {slot_start_for(moment) for moment in moments}
+    if not slots:
+        return set()
+    taken = Appointment.objects.filter(doctor_id=doctor_id, slot_start__in=slots)
+    if exclude_ids:
+        taken = taken.exclude(id__in=exclude_ids)
+    return set(taken.values_list('slot_start', flat=True))
+
+
+def conflict_error(moments):
+    return SlotUnavailable({
+        'error': 'The doctor already has appointments in some of these slots.',
+        'conflicts': [timezone.localtime(moment).isoformat() for moment in moments],
+    })
+
+
+def create_series(series, skip_conflicts=False):
+    """
+    Save ``series`` and book its occurrences.
+
+    Returns the list of skipped (conflicting) datetimes. Raises
+    ``SlotUnavailable`` listing them when ``skip_conflicts`` is false, and
+    ``ValidationError`` when the rule expands past ``MAX_SERIES_OCCURRENCES``.
+    """
+    moments = series.occurrence_datetimes(MAX_SERIES_OCCURRENCES + 1)
+    if len(moments) > MAX_SERIES_OCCURRENCES:
+        raise ValidationError({'until': f'A series can have at most {MAX_SERIES_OCCURRENCES} occurrences.'})
+    taken = taken_slots(series.doctor_id, moments)
+    conflicts = [moment for moment in moments if slot_start_for(moment) in taken]
+    if conflicts and not skip_conflicts:
+        raise conflict_error(conflicts)
+
+    with slot_guard():
+        series.save()
+        created = Appointment.objects.bulk_create([
+            Appointment(
+                patient_id=series.patient_id,
+                doctor_id=series.doctor_id,
+                appointment_type=series.appointment_type,
+                appointment_datetime=moment,
+                reason_for_visit=series.reason_for_visit,
+                status='pending',
+                slot_start=slot_start_for(moment),
+                series=series,
+            )
+            for moment in moments if slot_start_for(moment) not in taken
+        ])
+    DoctorPatientPanel.refresh(series.doctor_id, series.patient_id)
+    publish_appointments(appointment.id for appointment in created)
+    return conflicts
+
+
+def following(series, pivot):
+    """The occurrences of ``series`` at or after ``pivot``."""
+    return Appointment.objects.filter(series=series, appointment_datetime__gte=pivot)
+
+
+def cancel_following(series, pivot, reason=''):
+    ids = list(following(series, pivot).values_list('id', flat=True))
+    if not ids:
+        return 0, []
+    updated, results = bulk_transition(
+        Appointment.objects.filter(series=series), ids, 'cancelled',
+        {'slot_start': None, 'cancellation_reason': reason},
+    )
+    publish_appointments(result['id'] for result in results if result['outcome'] == 'updated')
+    return updated, results
+
+
+def update_following(series, pivot, doctor=None, at=None, reason_for_visit=None):
+    """
+    Move the editable occurrences from ``pivot`` on to another doctor and/or time of day.
+
+    Conflicts are checked for the whole tail in one query before anything
+    is written. Returns the updated appointments.
+    """
+    appointments = list(
+        following(series, pivot).filter(status__in=EDITABLE_STATUSES).order_by('appointment_datetime')
+    )
+    if not appointments:
+        return []
+
+    previous_doctor_id = series.doctor_id
+    doctor_id = doctor.id if doctor else series.doctor_id
+    now = timezone.now()
+    for appointment in appointments:
+        if at is not None:
+            day = timezone.localtime(appointment.appointment_datetime).date()
+            appointment.appointment_datetime = timezone.make_aware(datetime.combine(day, at))
+        appointment.doctor_id = doctor_id
+        appointment.slot_start = slot_start_for(appointment.appointment_datetime)
+        if reason_for_visit is not None:
+            appointment.reason_for_visit = reason_for_visit
+        appointment.updated_date = now
+
+    moments = [appointment.appointment_datetime for appointment in appointments]
+    taken = taken_slots(doctor_id, moments, exclude_ids=[appointment.id for appointment in appointments])
+    conflicts = [moment for moment in moments if slot_start_for(moment) in taken]
+    if conflicts:
+        raise conflict_error(conflicts)
+
+    with slot_guard():
+        Appointment.objects.bulk_update(appointments, [
+            'doctor', 'appointment_datetime', 'slot_start', 'reason_for_visit', 'updated_date',
+        ])
+        series.doctor_id = doctor_id
+        if reason_for_visit is not None:
+            series.reason_for_visit = reason_for_visit
+        series.save(update_fields=['doctor', 'reason_for_visit'])
+
+    DoctorPatientPanel.refresh(doctor_id, series.patient_id)
+    if previous_doctor_id != doctor_id:
+        DoctorPatientPanel.refresh(previous_doctor_id, series.patient_id)
+    publish_appointments([appointment.id for appointment in appointments], previous_doctor_id)
+    return appointments
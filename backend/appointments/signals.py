@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .live import publish_appointment
+from .models import Appointment, DoctorPatientPanel
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_panel_pair(sender, instance, **kwargs):
+    # Keep the previous doctor/patient so a reassigned appointment leaves the old panel,
+    # and the previous status for the live boards
+    instance._panel_pair = instance._previous_status = None
+    if instance.pk:
+        row = Appointment.objects.filter(pk=instance.pk).values_list(
+            'doctor_id', 'patient_id', 'status'
+        ).first()
+        if row:
+            instance._panel_pair, instance._previous_status = row[:2], row[2]
+
+
+@receiver(post_save, sender=Appointment)
+def update_panel_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pair = (instance.doctor_id, instance.patient_id)
+    DoctorPatientPanel.refresh(*pair)
+    previous = getattr(instance, '_panel_pair', None)
+    if previous and previous != pair:
+        DoctorPatientPanel.refresh(*previous)
+
+
+@receiver(post_save, sender=Appointment)
+def publish_status_change(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_panel_pair', None)
+    previous_status = getattr(instance, '_previous_status', None)
+    previous_doctor_id = previous[0] if previous else None
+    if created or previous_status != instance.status or previous_doctor_id != instance.doctor_id:
+        publish_appointment(instance, previous_status, previous_doctor_id)
+
+
+@receiver(post_delete, sender=Appointment)
+def update_panel_on_delete(sender, instance, **kwargs):
+    DoctorPatientPanel.refresh(instance.doctor_id, instance.patient_id)
@@ -1,3 +1,665 @@
-from django.test import TestCase
+import asyncio
+import re
+import threading
+from unittest import mock
+from io import StringIO
+from datetime import date, datetime, time, timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from carepoint.live import LocalBroker
+from patients.models import Patient
+from userauth.models import Staff, StaffSchedule
+from .availability import find_free_slots
+from .booking import SlotUnavailable, book_appointment
+from .models import Appointment, AppointmentSeries, Consultation, DoctorPatientPanel
 
-# Create your tests here.
+
+class DoctorPatientPanelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='doc', password='pass', role='doctor')
+        cls.other_doctor = Staff.objects.create_user(username='doc2', password='pass', role='doctor')
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+
+    def book(self, days_ago, doctor=None):
+        return Appointment.objects.create(
+            patient=self.patient, doctor=doctor or self.doctor, appointment_type='consultation',
+            appointment_datetime=timezone.now() - timedelta(days=days_ago), reason_for_visit='Review'
+        )
+
+    def test_save_and_delete_maintain_panel(self):
+        oldest = self.book(10)
+        latest = self.book(1)
+        panel = DoctorPatientPanel.objects.get(doctor=self.doctor, patient=self.patient)
+        self.assertEqual(panel.visit_count, 2)
+        self.assertEqual(panel.first_visit, oldest.appointment_datetime)
+        self.assertEqual(panel.last_visit, latest.appointment_datetime)
+
+        latest.delete()
+        panel.refresh_from_db()
+        self.assertEqual(panel.visit_count, 1)
+        self.assertEqual(panel.last_visit, oldest.appointment_datetime)
+
+        oldest.delete()
+        self.assertFalse(DoctorPatientPanel.objects.exists())
+
+    def test_reassigning_doctor_moves_panel_entry(self):
+        appointment = self.book(1)
+        appointment.doctor = self.other_doctor
+        appointment.save()
+        self.assertEqual(
+            list(DoctorPatientPanel.objects.values_list('doctor_id', flat=True)), [self.other_doctor.id]
+        )
+
+    def test_rebuild_command_backfills(self):
+        self.book(3)
+        self.book(2, doctor=self.other_doctor)
+        DoctorPatientPanel.objects.all().delete()
+        call_command('rebuild_doctor_patient_panel', stdout=StringIO())
+        self.assertEqual(DoctorPatientPanel.objects.count(), 2)
+
+    def test_doctor_patients_reads_panel(self):
+        for days_ago in range(5):
+            self.book(days_ago)
+        refresh = RefreshToken.for_user(self.doctor)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = client.get('/api/patients/patients/doctor_patients/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        entry = response.data['results'][0]
+        self.assertEqual(entry['visitCount'], 5)
+        self.assertEqual(entry['age'], self.patient.age)
+
+
+class AppointmentExpansionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        doctor = Staff.objects.create_user(username='doc', password='pass', role='doctor')
+        for i in range(4):
+            patient = Patient.objects.create(
+                first_name=f'Patient{i}', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+                contact_email=f'p{i}@example.com', contact_phone='0712345678', address='Nairobi'
+            )
+            Appointment.objects.create(
+                patient=patient, doctor=doctor, appointment_type='consultation',
+                appointment_datetime=timezone.now() + timedelta(hours=i), reason_for_visit='Review'
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_nested_serializers_are_opt_in(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/appointments/appointments/')
+        row = response.data['results'][0]
+        self.assertNotIn('patient_details', row)
+        self.assertNotIn('doctor_details', row)
+
+    def test_expansion_is_eager_loaded(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/appointments/appointments/', {
+                'expand': 'patient_details.medical_records,doctor_details.schedules'
+            })
+        row = response.data['results'][0]
+        self.assertEqual(row['patient_details']['first_name'], 'Patient0')
+        self.assertEqual(row['patient_details']['medical_records'], [])
+        self.assertEqual(row['doctor_details']['schedules'], [])
+
+    def test_sparse_fieldset(self):
+        response = self.client.get('/api/appointments/appointments/', {
+            'fields': 'id,status,patient_details', 'expand': 'patient_details'
+        })
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'status', 'patient_details'})
+        self.assertNotIn('medical_records', row['patient_details'])
+
+
+class AppointmentFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='doc', password='pass', role='doctor')
+        patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        now = timezone.now()
+        for days in (-400, -2, -1, 0, 1, 2, 400):
+            Appointment.objects.create(
+                patient=patient, doctor=cls.doctor, appointment_type='consultation',
+                appointment_datetime=now + timedelta(days=days), reason_for_visit=f'Visit {days}',
+                status='cancelled' if days == 1 else 'pending'
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.doctor).access_token}'
+        )
+
+    def fetch_all(self, params):
+        reasons = []
+        response = self.client.get('/api/patients/patients/doctor_appointments/', params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            reasons.extend(row['reason'] for row in response.data['results'])
+            if not response.data['next']:
+                return reasons
+            response = self.client.get(response.data['next'])
+
+    def test_default_window_and_cursor_pages(self):
+        self.assertEqual(
+            self.fetch_all({'page_size': 2}),
+            ['Visit -2', 'Visit -1', 'Visit 0', 'Visit 1', 'Visit 2']
+        )
+
+    def test_explicit_window_and_status(self):
+        today = timezone.localdate()
+        params = {'from': str(today - timedelta(days=500)), 'to': str(today), 'status': 'pending'}
+        self.assertEqual(self.fetch_all(params), ['Visit -400', 'Visit -2', 'Visit -1', 'Visit 0'])
+
+    def test_invalid_window(self):
+        response = self.client.get('/api/patients/patients/doctor_appointments/', {'from': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        cls.monday = today + timedelta(days=7 - today.weekday())
+        cls.house = Staff.objects.create_user(
+            username='house', password='pass', first_name='Gregory', last_name='House',
+            role='doctor', specialization='Diagnostics'
+        )
+        cls.wilson = Staff.objects.create_user(
+            username='wilson', password='pass', first_name='James', last_name='Wilson',
+            role='doctor', specialization='Oncology'
+        )
+        StaffSchedule.objects.create(staff=cls.house, day_of_week='Monday', start_time=time(9), end_time=time(11))
+        StaffSchedule.objects.create(staff=cls.house, day_of_week='Wednesday', start_time=time(14), end_time=time(15))
+        StaffSchedule.objects.create(staff=cls.wilson, day_of_week='Monday', start_time=time(9), end_time=time(10))
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        for hour, minute, status in ((9, 30, 'pending'), (10, 0, 'cancelled')):
+            Appointment.objects.create(
+                patient=cls.patient, doctor=cls.house, appointment_type='consultation',
+                appointment_datetime=cls.at(hour, minute), reason_for_visit='Checkup', status=status
+            )
+
+    @classmethod
+    def at(cls, hour, minute=0, day=0):
+        moment = timezone.datetime.combine(cls.monday + timedelta(days=day), time(hour, minute))
+        return timezone.make_aware(moment)
+
+    def test_booked_slots_are_subtracted(self):
+        response = APIClient().get('/api/appointments/appointments/availability/', {
+            'doctor_id': self.house.id, 'from': str(self.monday), 'to': str(self.monday + timedelta(days=6)),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['slotMinutes'], 30)
+        [doctor] = response.data['results']
+        self.assertEqual(doctor['name'], 'Gregory House')
+        self.assertEqual(doctor['slots'], [
+            {'date': str(self.monday), 'times': ['09:00', '10:00', '10:30']},
+            {'date': str(self.monday + timedelta(days=2)), 'times': ['14:00', '14:30']},
+        ])
+
+    def test_unaligned_booking_blocks_overlapping_slots(self):
+        Appointment.objects.create(
+            patient=self.patient, doctor=self.wilson, appointment_type='consultation',
+            appointment_datetime=self.at(9, 10), reason_for_visit='Checkup', status='confirmed'
+        )
+        [(doctor, slots)] = find_free_slots(self.monday, self.monday + timedelta(days=1), doctor_ids=[self.wilson.id])
+        self.assertEqual(slots, [])
+
+    def test_bookings_are_placed_on_the_local_grid(self):
+        with timezone.override('Africa/Nairobi'):
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.wilson, appointment_type='consultation',
+                appointment_datetime=self.at(9, 30), reason_for_visit='Checkup', status='confirmed'
+            )
+            [(doctor, slots)] = find_free_slots(self.monday, self.monday + timedelta(days=1), doctor_ids=[self.wilson.id])
+            self.assertEqual([timezone.localtime(slot).time() for slot in slots], [time(9)])
+
+    def test_specialization_filter_and_clinic_batch(self):
+        response = APIClient().get('/api/appointments/appointments/availability/', {
+            'specialization': 'Oncology', 'from': str(self.monday), 'to': str(self.monday),
+        })
+        self.assertEqual([row['doctorId'] for row in response.data['results']], [self.wilson.id])
+
+        with self.assertNumQueries(3):
+            results = find_free_slots(self.monday, self.monday + timedelta(days=7))
+        self.assertEqual([doctor.id for doctor, _ in results], [self.house.id, self.wilson.id])
+
+    def test_invalid_range(self):
+        client = APIClient()
+        url = '/api/appointments/appointments/availability/'
+        self.assertEqual(client.get(url, {'from': 'monday'}).status_code, 400)
+        self.assertEqual(client.get(url, {'from': str(self.monday), 'to': str(self.monday - timedelta(days=1))}).status_code, 400)
+        self.assertEqual(client.get(url, {'from': str(self.monday), 'to': str(self.monday + timedelta(days=40))}).status_code, 400)
+
+    def test_booking_uses_requested_doctor(self):
+        refresh = RefreshToken()
+        refresh['user_id'] = self.patient.id
+        refresh['user_type'] = 'patient'
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = client.post('/api/patients/patients/book_appointment/', {
+            'doctor': 'James Wilson', 'appointmentDate': str(self.monday),
+            'appointmentTime': '09:00', 'reasonForVisit': 'Follow-up',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Appointment.objects.get(id=response.data['appointment_id']).doctor, self.wilson)
+
+        response = client.post('/api/patients/patients/book_appointment/', {
+            'doctor': 'Nobody', 'appointmentDate': str(self.monday), 'appointmentTime': '09:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SlotBookingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(
+            username='house', password='pass', first_name='Gregory', last_name='House', role='doctor'
+        )
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        cls.day = timezone.localdate() + timedelta(days=3)
+
+    def setUp(self):
+        refresh = RefreshToken()
+        refresh['user_id'] = self.patient.id
+        refresh['user_type'] = 'patient'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def book(self, at='09:00'):
+        return self.client.post('/api/patients/patients/book_appointment/', {
+            'doctor': str(self.doctor.id), 'appointmentDate': str(self.day),
+            'appointmentTime': at, 'reasonForVisit': 'Checkup',
+        }, format='json')
+
+    def test_second_booking_in_slot_conflicts(self):
+        self.assertEqual(self.book('09:00').status_code, 201)
+        response = self.book('09:15')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('error', response.data)
+        self.assertEqual(self.book('09:30').status_code, 201)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 2)
+
+    def test_cancelling_frees_the_slot(self):
+        appointment = Appointment.objects.get(id=self.book('09:00').data['appointment_id'])
+        self.assertEqual(self.client.post(f'/api/appointments/appointments/{appointment.id}/cancel/').status_code, 200)
+        appointment.refresh_from_db()
+        self.assertIsNone(appointment.slot_start)
+        self.assertEqual(self.book('09:00').status_code, 201)
+
+        # Reinstating the cancelled booking would double-book the slot
+        response = self.client.patch(
+            f'/api/appointments/appointments/{appointment.id}/', {'status': 'pending'}, format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_status_endpoint_refuses_taken_slots_and_unknown_statuses(self):
+        appointment = Appointment.objects.get(id=self.book('09:00').data['appointment_id'])
+        self.client.post(f'/api/appointments/appointments/{appointment.id}/cancel/')
+        self.assertEqual(self.book('09:00').status_code, 201)
+
+        url = '/api/patients/patients/update_appointment_status/'
+        response = self.client.post(url, {'appointment_id': appointment.id, 'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(url, {'appointment_id': appointment.id, 'status': 'in-progress'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        appointment.refresh_from_db()
+        self.assertEqual((appointment.status, appointment.slot_start), ('cancelled', None))
+
+    def test_consultation_conflict_leaves_no_rows(self):
+        self.assertEqual(self.book('10:00').status_code, 201)
+        doctor_client = APIClient()
+        doctor_client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.doctor).access_token}'
+        )
+        response = doctor_client.post('/api/appointments/consultations/create_consultation/', {
+            'patient_id': self.patient.id, 'date': str(self.day), 'time': '10:10', 'notes': 'Review',
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertFalse(Consultation.objects.exists())
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    def setUp(self):
+        self.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        self.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_one_booking_wins_each_slot(self):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        slots = [start + timedelta(minutes=30 * index) for index in range(4)]
+        outcomes = []
+        barrier = threading.Barrier(16)
+
+        def attempt(slot):
+            barrier.wait()
+            try:
+                book_appointment(
+                    patient=self.patient, doctor=self.doctor, appointment_type='consultation',
+                    appointment_datetime=slot, reason_for_visit='Rush', status='pending'
+                )
+                outcomes.append(('booked', slot))
+            except SlotUnavailable:
+                outcomes.append(('conflict', slot))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(slots[index % 4],)) for index in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        booked = sorted(slot for outcome, slot in outcomes if outcome == 'booked')
+        self.assertEqual(len(outcomes), 16)
+        self.assertEqual(booked, slots)
+        self.assertEqual(Appointment.objects.count(), 4)
+
+
+class BulkStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        start = timezone.now() + timedelta(days=1)
+        cls.appointments = {
+            status: Appointment.objects.create(
+                patient=patient, doctor=cls.doctor, appointment_type='consultation',
+                appointment_datetime=start + timedelta(hours=index), reason_for_visit='Checkup', status=status
+            )
+            for index, status in enumerate(['pending', 'confirmed', 'completed', 'cancelled'])
+        }
+
+    def test_cancel_many(self):
+        ids = [appointment.id for appointment in self.appointments.values()] + [999999]
+        before = Appointment.objects.get(id=self.appointments['pending'].id).updated_date
+        with self.assertNumQueries(2):
+            response = APIClient().post('/api/appointments/appointments/bulk_status/', {
+                'ids': ids, 'status': 'cancelled', 'reason': 'Doctor unavailable',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            [(row['outcome'], row['status']) for row in response.data['results']],
+            [('updated', 'cancelled'), ('updated', 'cancelled'), ('invalid_transition', 'completed'),
+             ('unchanged', 'cancelled'), ('not_found', None)]
+        )
+
+        pending = Appointment.objects.get(id=self.appointments['pending'].id)
+        self.assertEqual(pending.cancellation_reason, 'Doctor unavailable')
+        self.assertIsNone(pending.slot_start)
+        self.assertGreater(pending.updated_date, before)
+
+    def test_rejects_unknown_status_and_bad_ids(self):
+        client = APIClient()
+        url = '/api/appointments/appointments/bulk_status/'
+        self.assertEqual(client.post(url, {'ids': [1], 'status': 'pending'}, format='json').status_code, 400)
+        self.assertEqual(client.post(url, {'ids': 'all', 'status': 'cancelled'}, format='json').status_code, 400)
+        self.assertEqual(client.post(url, {'ids': ['x'], 'status': 'cancelled'}, format='json').status_code, 400)
+
+
+class AppointmentSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.house = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.wilson = Staff.objects.create_user(username='wilson', password='pass', role='doctor')
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        day = timezone.localdate() + timedelta(days=1)
+        cls.start = timezone.make_aware(datetime.combine(day, time(9)))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.house)
+
+    def create(self, **overrides):
+        data = {
+            'patient': self.patient.id, 'doctor': self.house.id, 'reason_for_visit': 'Dialysis',
+            'frequency': 'weekly', 'interval': 1, 'start_datetime': self.start.isoformat(), 'occurrences': 6,
+        }
+        data.update(overrides)
+        return self.client.post('/api/appointments/series/', data, format='json')
+
+    def test_expands_into_appointments(self):
+        response = self.create(frequency='daily', interval=2, occurrences=None, until=str(self.start.date() + timedelta(days=6)))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [row['appointment_datetime'] for row in response.data['appointments']],
+            [self.start + timedelta(days=days) for days in (0, 2, 4, 6)]
+        )
+        self.assertEqual(set(Appointment.objects.values_list('slot_start', flat=True)), {
+            self.start + timedelta(days=days) for days in (0, 2, 4, 6)
+        })
+        panel = DoctorPatientPanel.objects.get(doctor=self.house, patient=self.patient)
+        self.assertEqual(panel.visit_count, 4)
+
+    def test_conflicts_reject_or_skip(self):
+        Appointment.objects.create(
+            patient=self.patient, doctor=self.house, appointment_type='consultation',
+            appointment_datetime=self.start + timedelta(weeks=2, minutes=10), reason_for_visit='Other'
+        )
+        response = self.create()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(response.data['conflicts']), 1)
+        self.assertFalse(AppointmentSeries.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.create(skip_conflicts=True)
+        self.assertEqual(response.status_code, 201)
+        inserts = [q for q in queries.captured_queries if re.match(r'INSERT INTO [`"]appointments_appointment[`"]', q['sql'])]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(response.data['appointments']), 5)
+        self.assertEqual(len(response.data['skipped']), 1)
+
+    def test_rule_validation(self):
+        self.assertEqual(self.create(until=str(self.start.date() + timedelta(days=30))).status_code, 400)
+        self.assertEqual(self.create(occurrences=None).status_code, 400)
+        self.assertEqual(self.create(occurrences=500).status_code, 400)
+        self.assertEqual(self.create(occurrences=None, frequency='daily', until=str(self.start.date() + timedelta(days=400))).status_code, 400)
+
+    def test_this_and_following(self):
+        series_id = self.create().data['id']
+        appointments = list(Appointment.objects.filter(series_id=series_id).order_by('appointment_datetime'))
+        url = f'/api/appointments/series/{series_id}/'
+
+        response = self.client.post(f'{url}update_following/', {
+            'appointment_id': appointments[2].id, 'doctor': str(self.wilson.id), 'time': '14:30',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 4)
+        moved = Appointment.objects.filter(series_id=series_id, doctor=self.wilson).order_by('appointment_datetime')
+        self.assertEqual([a.id for a in moved], [a.id for a in appointments[2:]])
+        self.assertTrue(all(timezone.localtime(a.appointment_datetime).time() == time(14, 30) for a in moved))
+        self.assertTrue(all(a.slot_start == a.appointment_datetime for a in moved))
+        self.assertEqual(DoctorPatientPanel.objects.get(doctor=self.wilson, patient=self.patient).visit_count, 4)
+        self.assertEqual(DoctorPatientPanel.objects.get(doctor=self.house, patient=self.patient).visit_count, 2)
+
+        response = self.client.post(f'{url}cancel_following/', {
+            'appointment_id': appointments[4].id, 'reason': 'Transferred',
+        }, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            list(Appointment.objects.filter(series_id=series_id).order_by('appointment_datetime').values_list('status', flat=True)),
+            ['pending'] * 4 + ['cancelled'] * 2
+        )
+
+    def test_moving_onto_a_booked_slot_conflicts(self):
+        series_id = self.create(occurrences=2).data['id']
+        Appointment.objects.create(
+            patient=self.patient, doctor=self.wilson, appointment_type='consultation',
+            appointment_datetime=self.start + timedelta(weeks=1), reason_for_visit='Other'
+        )
+        response = self.client.post(f'/api/appointments/series/{series_id}/update_following/', {
+            'from': str(self.start.date()), 'doctor': str(self.wilson.id),
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Appointment.objects.filter(series_id=series_id, doctor=self.wilson).exists())
+
+
+class LiveBoardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.other = Staff.objects.create_user(username='wilson', password='pass', role='doctor')
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        cls.appointment = Appointment.objects.create(
+            patient=cls.patient, doctor=cls.doctor, appointment_type='consultation',
+            appointment_datetime=timezone.now() + timedelta(hours=1), reason_for_visit='Checkup', status='confirmed'
+        )
+
+    def setUp(self):
+        self.broker = LocalBroker()
+        patcher = mock.patch('carepoint.live._broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self):
+        return [(sorted(topics), data) for _, topics, data in self.broker.recent]
+
+    def test_status_change_is_published_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.appointment.status = 'checked_in'
+            self.appointment.save()
+            self.appointment.reason_for_visit = 'Checkup and bloods'
+            self.appointment.save()
+        self.assertEqual(self.published(), [])
+
+        for callback in callbacks:
+            callback()
+        [(topics, data)] = self.published()
+        self.assertEqual(topics, ['clinic', f'doctor:{self.doctor.id}'])
+        self.assertEqual(data['id'], self.appointment.id)
+        self.assertEqual((data['previousStatus'], data['status']), ('confirmed', 'checked_in'))
+
+    def test_reassignment_reaches_both_doctors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.doctor = self.other
+            self.appointment.save()
+        [(topics, _)] = self.published()
+        self.assertEqual(topics, ['clinic', f'doctor:{self.doctor.id}', f'doctor:{self.other.id}'])
+
+    def test_bulk_status_publishes_updated_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().post('/api/appointments/appointments/bulk_status/', {
+                'ids': [self.appointment.id, 999999], 'status': 'checked_in',
+            }, format='json')
+        self.assertEqual([data['status'] for _, data in self.published()], ['checked_in'])
+
+    def test_series_publishes_booked_occurrences(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        start = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time(9)))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/appointments/series/', {
+                'patient': self.patient.id, 'doctor': self.doctor.id, 'reason_for_visit': 'Dialysis',
+                'frequency': 'weekly', 'interval': 1, 'start_datetime': start.isoformat(), 'occurrences': 3,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        published = self.published()
+        self.assertEqual(
+            sorted(data['id'] for _, data in published),
+            sorted(row['id'] for row in response.data['appointments'])
+        )
+        self.assertEqual({tuple(topics) for topics, _ in published}, {('clinic', f'doctor:{self.doctor.id}')})
+
+    def test_subscribers_receive_their_topics_and_replay(self):
+        async def scenario():
+            doctor = await self.broker.subscribe(['doctor:1'])
+            clinic = await self.broker.subscribe(['clinic'])
+            # Published from another thread, as the sync views do
+            await asyncio.to_thread(self.broker.publish, {'doctor:2', 'clinic'}, {'id': 1})
+            await asyncio.to_thread(self.broker.publish, {'doctor:1', 'clinic'}, {'id': 2})
+            received = [(await doctor.get(1))[2], (await clinic.get(1))[2], (await clinic.get(1))[2]]
+            idle = await doctor.get(0.01)
+            replay = await self.broker.subscribe(['doctor:2'], last_event_id=0)
+            replayed = (await replay.get(1))[2]
+            for subscription in (doctor, clinic, replay):
+                subscription.close()
+            return received, idle, replayed
+
+        received, idle, replayed = asyncio.run(scenario())
+        self.assertEqual(received, [{'id': 2}, {'id': 1}, {'id': 2}])
+        self.assertIsNone(idle)
+        self.assertEqual(replayed, {'id': 1})
+        self.assertEqual(self.broker.subscriptions, set())
+
+    async def ticket(self, token):
+        return await self.async_client.post(
+            '/api/appointments/appointments/live_ticket/', headers={'Authorization': f'Bearer {token}'}
+        )
+
+    async def test_stream_sends_events_for_the_doctor(self):
+        response = await self.ticket(RefreshToken.for_user(self.doctor).access_token)
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/appointments/live/', {'ticket': response.json()['ticket']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        next_event = asyncio.ensure_future(anext(stream))
+        while not self.broker.subscriptions:
+            await asyncio.sleep(0)
+        self.broker.publish({f'doctor:{self.other.id}'}, {'id': 1})
+        self.broker.publish({f'doctor:{self.doctor.id}'}, {'id': 2})
+        chunk = (await next_event).decode()
+        self.assertTrue(chunk.startswith('id: 2\nevent: appointment\n'))
+        self.assertIn('"id": 2', chunk)
+        await stream.aclose()
+
+    async def test_stream_requires_a_staff_ticket(self):
+        response = await self.async_client.get('/api/appointments/live/')
+        self.assertEqual(response.status_code, 401)
+        patient_token = RefreshToken()
+        patient_token['user_id'] = self.patient.id
+        patient_token['user_type'] = 'patient'
+        self.assertEqual((await self.ticket(patient_token.access_token)).status_code, 401)
+
+        # Access tokens are not accepted in the URL, and tickets are signed and short-lived
+        access_token = str(RefreshToken.for_user(self.doctor).access_token)
+        response = await self.async_client.get('/api/appointments/live/', {'token': access_token, 'ticket': access_token})
+        self.assertEqual(response.status_code, 401)
+        ticket = (await self.ticket(access_token)).json()['ticket']
+        with mock.patch('carepoint.live.STREAM_TICKET_SECONDS', -1):
+            response = await self.async_client.get('/api/appointments/live/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_is_refused_outside_asgi(self):
+        # Under WSGI a stream would hold a worker thread without ever flushing
+        self.assertEqual(self.client.get('/api/appointments/live/').status_code, 501)
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        self.assertEqual(client.post('/api/appointments/appointments/live_ticket/').status_code, 501)
@@ -1,11 +1,13 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import AppointmentViewSet, ConsultationViewSet
+from .views import AppointmentSeriesViewSet, AppointmentViewSet, ConsultationViewSet, appointment_stream
 
 router = DefaultRouter()
 router.register('appointments', AppointmentViewSet)
 router.register('consultations', ConsultationViewSet)
+router.register('series', AppointmentSeriesViewSet)
 
 urlpatterns = [
+    path('live/', appointment_stream, name='appointment-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,21 +1,52 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from carepoint.conditional import ConditionalGetMixin
+from carepoint.expansion import ExpansionQuerysetMixin
+from carepoint.filters import DateRangeFilter
+from carepoint.transitions import bulk_transition, parse_ids
+from carepoint.feeds import ConsultationFeedPagination, apply_feed_filters, parse_window_bound
+from carepoint.live import (
+    STREAM_TICKET_SECONDS, event_stream, is_asgi_request, issue_stream_ticket, read_stream_ticket
+)
+from userauth.authentication import get_principal, get_request_doctor, load_principal_row
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from .models import Appointment, Consultation
-from .serializers import AppointmentSerializer, ConsultationSerializer
+from django.utils.dateparse import parse_date, parse_time
+from .availability import MAX_RANGE_DAYS, SLOT_MINUTES, find_free_slots, resolve_doctor
+from .booking import SlotUnavailable, book_appointment, slot_guard
+from .live import CLINIC_TOPIC, doctor_topic, publish_appointments
+from .models import Appointment, AppointmentSeries, Consultation
+from .serializers import AppointmentSerializer, AppointmentSeriesSerializer, ConsultationSerializer
+from .series import cancel_following, create_series, update_following
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+LIVE_NEEDS_ASGI = 'Live updates need the ASGI server (uvicorn carepoint.asgi:application)'
+
+class AppointmentViewSet(ConditionalGetMixin, ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
+    last_modified_field = 'updated_date'
     permission_classes = [permissions.AllowAny]
+    filter_backends = [DateRangeFilter]
+    date_range_field = 'appointment_datetime'
+    expand_select_related = {
+        'patient_details': ['patient'],
+        'doctor_details': ['doctor'],
+    }
+    expand_prefetch_related = {
+        'patient_details.medical_records': ['patient__medicalrecord_set__recorded_by'],
+        'doctor_details.schedules': ['doctor__staffschedule_set'],
+    }
 
     def get_queryset(self):
         queryset = Appointment.objects.all()
         status = self.request.query_params.get('status', None)
         doctor_id = self.request.query_params.get('doctor_id', None)
         patient_id = self.request.query_params.get('patient_id', None)
-        date = self.request.query_params.get('date', None)
 
         if status:
             queryset = queryset.filter(status=status)
@@ -23,10 +54,65 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(doctor_id=doctor_id)
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id)
-        if date:
-            queryset = queryset.filter(appointment_datetime__date=date)
 
-        return queryset.order_by('appointment_datetime')
+        return self.expand_queryset(queryset.order_by('appointment_datetime'))
+
+    def perform_create(self, serializer):
+        with slot_guard():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with slot_guard():
+            serializer.save()
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def availability(self, request):
+        # Free slots for one or more doctors, or the whole clinic when no doctor is given
+        start = request.query_params.get('from', None)
+        end = request.query_params.get('to', None)
+        try:
+            start = parse_date(start) if start else timezone.localdate()
+            if start:
+                end = parse_date(end) if end else start + timedelta(days=6)
+        except ValueError:
+            start = None
+        if start is None or end is None:
+            return Response({'error': 'Use YYYY-MM-DD for from and to'}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start or (end - start).days >= MAX_RANGE_DAYS:
+            return Response(
+                {'error': f'to must be on or after from and at most {MAX_RANGE_DAYS} days later'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        doctor_ids = [value for value in request.query_params.get('doctor_id', '').split(',') if value]
+        if not all(value.isdigit() for value in doctor_ids):
+            return Response({'error': 'doctor_id must be a comma-separated list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+        free_slots = find_free_slots(
+            start, end + timedelta(days=1),
+            doctor_ids=[int(value) for value in doctor_ids],
+            specialization=request.query_params.get('specialization', None),
+        )
+
+        results = []
+        for doctor, slots in free_slots:
+            days = {}
+            for slot in slots:
+                slot = timezone.localtime(slot)
+                days.setdefault(slot.date().isoformat(), []).append(slot.strftime('%H:%M'))
+            results.append({
+                'doctorId': doctor.id,
+                'name': doctor.get_full_name(),
+                'specialization': doctor.specialization,
+                'slots': [{'date': day, 'times': times} for day, times in days.items()],
+            })
+
+        return Response({
+            'from': start,
+            'to': end,
+            'slotMinutes': SLOT_MINUTES,
+            'results': results,
+        })
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -43,53 +129,77 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-class ConsultationViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        ids = parse_ids(request.data.get('ids'))
+        new_status = request.data.get('status')
+        updates = {}
+        if new_status == 'cancelled':
+            # The update bypasses save(), so release the slot key here
+            updates = {'slot_start': None, 'cancellation_reason': request.data.get('reason', '')}
+        updated, results = bulk_transition(Appointment.objects.all(), ids, new_status, updates)
+        publish_appointments(result['id'] for result in results if result['outcome'] == 'updated')
+        return Response({'status': new_status, 'updated': updated, 'results': results})
+
+    @action(detail=False, methods=['post'])
+    def live_ticket(self, request):
+        # EventSource cannot send the bearer token, so boards trade it for a ticket to the stream
+        if not is_asgi_request(request):
+            return Response({'error': LIVE_NEEDS_ASGI}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        principal = get_principal(request)
+        if principal is None or not principal.is_staff:
+            return Response({'error': 'Staff token required'}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({'ticket': issue_stream_ticket(principal.user.id), 'expiresIn': STREAM_TICKET_SECONDS})
+
+class ConsultationViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = Consultation.objects.all()
     serializer_class = ConsultationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DateRangeFilter]
+    date_range_field = 'consultation_datetime'
+    expand_select_related = {
+        'patient_details': ['patient'],
+        'doctor_details': ['doctor'],
+        'appointment_details': ['appointment'],
+        'appointment_details.patient_details': ['appointment__patient'],
+        'appointment_details.doctor_details': ['appointment__doctor'],
+    }
+    expand_prefetch_related = {
+        'patient_details.medical_records': ['patient__medicalrecord_set__recorded_by'],
+        'doctor_details.schedules': ['doctor__staffschedule_set'],
+        'appointment_details.patient_details.medical_records': ['appointment__patient__medicalrecord_set__recorded_by'],
+        'appointment_details.doctor_details.schedules': ['appointment__doctor__staffschedule_set'],
+    }
 
     def get_queryset(self):
         queryset = Consultation.objects.all()
         doctor_id = self.request.query_params.get('doctor_id', None)
         patient_id = self.request.query_params.get('patient_id', None)
-        date = self.request.query_params.get('date', None)
 
         if doctor_id:
             queryset = queryset.filter(doctor_id=doctor_id)
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id)
-        if date:
-            queryset = queryset.filter(consultation_datetime__date=date)
 
-        return queryset.order_by('-consultation_datetime')
+        return self.expand_queryset(queryset.order_by('-consultation_datetime'))
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def doctor_consultations(self, request):
-        from userauth.models import Staff
-        
         # Get doctor from token or use first doctor for testing
-        try:
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                import jwt
-                from django.conf import settings
-                
-                token = auth_header.split(' ')[1]
-                decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-                user_id = decoded_token.get('user_id')
-                doctor = Staff.objects.get(id=user_id, role='doctor')
-            else:
-                doctor = Staff.objects.filter(role='doctor').first()
-        except:
-            doctor = Staff.objects.filter(role='doctor').first()
+        doctor = get_request_doctor(request)
         
         if not doctor:
             return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        consultations = Consultation.objects.filter(doctor=doctor).order_by('-consultation_datetime')
+        consultations = apply_feed_filters(
+            Consultation.objects.filter(doctor=doctor).select_related('patient'),
+            request, 'consultation_datetime', status_field=None
+        )
+        paginator = ConsultationFeedPagination()
+        page = paginator.paginate_queryset(consultations, request, view=self)
         
         consultation_data = []
-        for cons in consultations:
+        for cons in page:
             consultation_data.append({
                 'id': f'CONS-{cons.id:03d}',
                 'patientName': f'{cons.patient.first_name} {cons.patient.last_name}',
@@ -101,28 +211,17 @@ class ConsultationViewSet(viewsets.ModelViewSet):
                 'prescription': cons.diagnosis if cons.diagnosis else None
             })
         
-        return Response({'results': consultation_data})
+        return paginator.get_paginated_response(consultation_data)
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def create_consultation(self, request):
-        from userauth.models import Staff
         from patients.models import Patient
         from datetime import datetime
         
+        # A token that is not a doctor's is refused here, not recorded under another doctor
+        doctor = get_request_doctor(request)
+        
         try:
-            # Get doctor
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                import jwt
-                from django.conf import settings
-                
-                token = auth_header.split(' ')[1]
-                decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-                user_id = decoded_token.get('user_id')
-                doctor = Staff.objects.get(id=user_id, role='doctor')
-            else:
-                doctor = Staff.objects.filter(role='doctor').first()
-            
             # Get patient
             patient_id = request.data.get('patient_id')
             patient = Patient.objects.get(id=patient_id)
@@ -130,33 +229,38 @@ class ConsultationViewSet(viewsets.ModelViewSet):
             # Create appointment first
             consultation_date = request.data.get('date')
             consultation_time = request.data.get('time')
-            consultation_datetime = datetime.strptime(f"{consultation_date} {consultation_time}", "%Y-%m-%d %H:%M")
-            
-            appointment = Appointment.objects.create(
-                patient=patient,
-                doctor=doctor,
-                appointment_type='consultation',
-                appointment_datetime=consultation_datetime,
-                reason_for_visit=request.data.get('notes', ''),
-                status='pending'
+            consultation_datetime = timezone.make_aware(
+                datetime.strptime(f"{consultation_date} {consultation_time}", "%Y-%m-%d %H:%M")
             )
             
-            # Create consultation
-            consultation = Consultation.objects.create(
-                appointment=appointment,
-                patient=patient,
-                doctor=doctor,
-                chief_complaint=request.data.get('notes', ''),
-                diagnosis='',
-                notes='',
-                consultation_datetime=consultation_datetime
-            )
+            with transaction.atomic():
+                appointment = book_appointment(
+                    patient=patient,
+                    doctor=doctor,
+                    appointment_type='consultation',
+                    appointment_datetime=consultation_datetime,
+                    reason_for_visit=request.data.get('notes', ''),
+                    status='pending'
+                )
+                
+                # Create consultation
+                consultation = Consultation.objects.create(
+                    appointment=appointment,
+                    patient=patient,
+                    doctor=doctor,
+                    chief_complaint=request.data.get('notes', ''),
+                    diagnosis='',
+                    notes='',
+                    consultation_datetime=consultation_datetime
+                )
             
             return Response({
                 'message': 'Consultation scheduled successfully',
                 'consultation_id': consultation.id
             }, status=status.HTTP_201_CREATED)
             
+        except SlotUnavailable as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -179,3 +283,130 @@ class ConsultationViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Consultation not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class AppointmentSeriesViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
+    queryset = AppointmentSeries.objects.all()
+    serializer_class = AppointmentSeriesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # Occurrences are changed through cancel_following/update_following
+    http_method_names = ['get', 'post', 'head', 'options']
+    expand_select_related = {
+        'patient_details': ['patient'],
+        'doctor_details': ['doctor'],
+    }
+    expand_prefetch_related = {
+        'appointments': ['appointments'],
+    }
+
+    def get_queryset(self):
+        queryset = AppointmentSeries.objects.all()
+        patient_id = self.request.query_params.get('patient_id', None)
+        doctor_id = self.request.query_params.get('doctor_id', None)
+
+        if patient_id:
+            queryset = queryset.filter(patient_id=patient_id)
+        if doctor_id:
+            queryset = queryset.filter(doctor_id=doctor_id)
+
+        return self.expand_queryset(queryset.order_by('-created_date'))
+
+    def occurrences(self, series):
+        return list(series.appointments.order_by('appointment_datetime').values('id', 'appointment_datetime', 'status'))
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        series = AppointmentSeries(**serializer.validated_data)
+        skip_conflicts = str(request.data.get('skip_conflicts', '')).lower() in ('1', 'true')
+        skipped = create_series(series, skip_conflicts=skip_conflicts)
+        return Response({
+            **self.get_serializer(series).data,
+            'appointments': self.occurrences(series),
+            'skipped': [timezone.localtime(moment).isoformat() for moment in skipped],
+        }, status=status.HTTP_201_CREATED)
+
+    def get_pivot(self, request, series):
+        # "This and following" starts at an occurrence or at a date/datetime
+        appointment_id = request.data.get('appointment_id')
+        if appointment_id:
+            pivot = series.appointments.filter(id=appointment_id).values_list('appointment_datetime', flat=True).first()
+            if pivot is None:
+                raise NotFound('Appointment is not part of this series')
+            return pivot
+        value = request.data.get('from')
+        return parse_window_bound(value, 'from') if value else timezone.now()
+
+    @action(detail=True, methods=['post'])
+    def cancel_following(self, request, pk=None):
+        series = self.get_object()
+        pivot = self.get_pivot(request, series)
+        updated, results = cancel_following(series, pivot, request.data.get('reason', ''))
+        return Response({'updated': updated, 'results': results})
+
+    @action(detail=True, methods=['post'])
+    def update_following(self, request, pk=None):
+        series = self.get_object()
+        pivot = self.get_pivot(request, series)
+
+        doctor = None
+        if request.data.get('doctor'):
+            doctor = resolve_doctor(request.data.get('doctor'))
+            if not doctor:
+                return Response({'error': 'Doctor not found'}, status=status.HTTP_400_BAD_REQUEST)
+        at = None
+        if request.data.get('time'):
+            try:
+                at = parse_time(request.data.get('time'))
+            except ValueError:
+                at = None
+            if at is None:
+                return Response({'error': 'Use HH:MM for time'}, status=status.HTTP_400_BAD_REQUEST)
+
+        appointments = update_following(
+            series, pivot, doctor=doctor, at=at, reason_for_visit=request.data.get('reason_for_visit')
+        )
+        return Response({'updated': len(appointments), 'appointments': self.occurrences(series)})
+
+
+def stream_staff(ticket):
+    staff_id = read_stream_ticket(ticket) if ticket else None
+    staff = load_principal_row('staff', staff_id) if isinstance(staff_id, int) else None
+    return staff if staff is not None and staff.is_active else None
+
+
+async def appointment_stream(request):
+    """
+    Server-sent appointment status deltas for the live boards.
+
+    Opened with ``?ticket=`` from ``live_ticket``. ``?doctor_id=`` follows one
+    doctor, ``?scope=clinic`` the whole clinic; a doctor defaults to their own
+    board. Only served through the ASGI app.
+    """
+    if not is_asgi_request(request):
+        return JsonResponse({'error': LIVE_NEEDS_ASGI}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    staff = await sync_to_async(stream_staff)(request.GET.get('ticket', None))
+    if staff is None:
+        return JsonResponse({'error': 'A valid stream ticket is required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    doctor_id = request.GET.get('doctor_id', None)
+    if request.GET.get('scope', None) == 'clinic':
+        topic = CLINIC_TOPIC
+    elif doctor_id:
+        if not doctor_id.isdigit():
+            return JsonResponse({'error': 'doctor_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        topic = doctor_topic(int(doctor_id))
+    elif staff.role == 'doctor':
+        topic = doctor_topic(staff.id)
+    else:
+        topic = CLINIC_TOPIC
+
+    # Browsers resend the last id they saw when they reconnect
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id', None)
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    response = StreamingHttpResponse(
+        event_stream([topic], 'appointment', last_event_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+    return response
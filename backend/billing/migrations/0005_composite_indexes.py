@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_composite_indexes'),
+        ('billing', '0004_initial'),
+        ('patients', '0005_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['patient', 'issued_date'], name='bill_patient_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['status', 'issued_date'], name='bill_status_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['bill', 'payment_date'], name='payment_bill_date_idx'),
+        ),
+    ]
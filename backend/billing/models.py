@@ -32,6 +32,12 @@ class Bill(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'issued_date'], name='bill_patient_issued_idx'),
+            models.Index(fields=['status', 'issued_date'], name='bill_status_issued_idx'),
+        ]
+
     def __str__(self):
         return f"{self.patient} - ${self.total_amount} - {self.status}"
 
@@ -63,5 +69,10 @@ class Payment(models.Model):
     received_by = models.ForeignKey(Staff, on_delete=models.CASCADE)
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['bill', 'payment_date'], name='payment_bill_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.bill.patient} - ${self.amount_paid} - {self.payment_method}"
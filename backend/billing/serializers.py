@@ -1,30 +1,33 @@
 from rest_framework import serializers
+from carepoint.expansion import ExpandableFieldsMixin
 from .models import ServicePrice, Bill, BillDetail, Payment
 
-class ServicePriceSerializer(serializers.ModelSerializer):
+class ServicePriceSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ServicePrice
         fields = '__all__'
 
-class BillDetailSerializer(serializers.ModelSerializer):
+class BillDetailSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     service_details = ServicePriceSerializer(source='service', read_only=True)
+    expandable_fields = ('service_details',)
 
     class Meta:
         model = BillDetail
         fields = '__all__'
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     received_by_name = serializers.CharField(source='received_by.get_full_name', read_only=True)
 
     class Meta:
         model = Payment
         fields = '__all__'
 
-class BillSerializer(serializers.ModelSerializer):
+class BillSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     details = BillDetailSerializer(many=True, read_only=True, source='billdetail_set')
     payments = PaymentSerializer(many=True, read_only=True, source='payment_set')
     patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
     remaining_amount = serializers.SerializerMethodField()
+    expandable_fields = ('details', 'payments')
 
     class Meta:
         model = Bill
@@ -2,6 +2,8 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Sum
+from carepoint.expansion import ExpansionQuerysetMixin
+from carepoint.filters import DateRangeFilter
 from .models import ServicePrice, Bill, BillDetail, Payment
 from .serializers import (
     ServicePriceSerializer, BillSerializer,
@@ -20,33 +22,36 @@ class ServicePriceViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(service_name__icontains=search)
         return queryset
 
-class BillViewSet(viewsets.ModelViewSet):
+class BillViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = Bill.objects.all()
     serializer_class = BillSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DateRangeFilter]
+    date_range_field = 'issued_date'
+    select_related_always = ('patient',)
+    prefetch_related_always = ('payment_set',)
+    expand_prefetch_related = {
+        'details': ['billdetail_set'],
+        'details.service_details': ['billdetail_set__service'],
+        'payments': ['payment_set__received_by'],
+    }
 
     def get_queryset(self):
         queryset = Bill.objects.all()
         status = self.request.query_params.get('status', None)
         patient_id = self.request.query_params.get('patient_id', None)
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
 
         if status:
             queryset = queryset.filter(status=status)
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id)
-        if date_from:
-            queryset = queryset.filter(issued_date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(issued_date__lte=date_to)
 
-        return queryset.order_by('-issued_date')
+        return self.expand_queryset(queryset.order_by('-issued_date'))
 
     @action(detail=True)
     def payments(self, request, pk=None):
         bill = self.get_object()
-        payments = Payment.objects.filter(bill=bill)
+        payments = Payment.objects.filter(bill=bill).select_related('received_by')
         total_paid = payments.aggregate(total=Sum('amount_paid'))['total'] or 0
         remaining = bill.total_amount - total_paid
         
@@ -57,37 +62,37 @@ class BillViewSet(viewsets.ModelViewSet):
             'payments': PaymentSerializer(payments, many=True).data
         })
 
-class BillDetailViewSet(viewsets.ModelViewSet):
+class BillDetailViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = BillDetail.objects.all()
     serializer_class = BillDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_select_related = {
+        'service_details': ['service'],
+    }
 
     def get_queryset(self):
         queryset = BillDetail.objects.all()
         bill_id = self.request.query_params.get('bill_id', None)
         if bill_id:
             queryset = queryset.filter(bill_id=bill_id)
-        return queryset
+        return self.expand_queryset(queryset)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DateRangeFilter]
+    date_range_field = 'payment_date'
+    select_related_always = ('received_by',)
 
     def get_queryset(self):
         queryset = Payment.objects.all()
         bill_id = self.request.query_params.get('bill_id', None)
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
 
         if bill_id:
             queryset = queryset.filter(bill_id=bill_id)
-        if date_from:
-            queryset = queryset.filter(payment_date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(payment_date__lte=date_to)
 
-        return queryset.order_by('-payment_date')
+        return self.expand_queryset(queryset.order_by('-payment_date'))
 
     def perform_create(self, serializer):
         payment = serializer.save(received_by=self.request.user)
@@ -0,0 +1,90 @@
+"""
+Sparse fieldsets and opt-in expansion for API responses.
+
+``?fields=id,status`` limits the top-level fields of a response and
+``?expand=patient_details,patient_details.medical_records`` switches on
+nested serializers, which are otherwise left out. Viewsets map each
+expansion to the select_related/prefetch_related it needs.
+"""
+
+
+def _query_param_set(request, name):
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+def requested_expansions(request):
+    """The requested expansion paths, including the parents of dotted paths."""
+    expansions = set()
+    for path in _query_param_set(request, 'expand'):
+        parts = path.split('.')
+        expansions.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    return expansions
+
+
+class ExpandableFieldsMixin:
+    """
+    Serializer mixin honouring ``?fields=`` and ``?expand=``.
+
+    Fields named in ``expandable_fields`` are only serialized when their path
+    (e.g. ``patient_details`` or ``request_details.patient_details``) is in
+    ``?expand=``. ``?fields=`` applies to the top-level object on reads.
+    """
+    expandable_fields = ()
+
+    def _field_path(self):
+        parts = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                parts.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(parts))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        path = self._field_path()
+        prefix = f'{path}.' if path else ''
+
+        expansions = requested_expansions(request)
+        for name in self.expandable_fields:
+            if f'{prefix}{name}' not in expansions:
+                fields.pop(name, None)
+
+        only = _query_param_set(request, 'fields')
+        if only and not path and request.method == 'GET':
+            for name in list(fields):
+                if name not in only:
+                    fields.pop(name)
+
+        return fields
+
+
+class ExpansionQuerysetMixin:
+    """
+    Viewset mixin that eager-loads only what the requested expansions need.
+
+    ``select_related_always``/``prefetch_related_always`` cover fields that
+    are always serialized; ``expand_select_related``/``expand_prefetch_related``
+    map an expansion path to the relations it reads.
+    """
+    select_related_always = ()
+    prefetch_related_always = ()
+    expand_select_related = {}
+    expand_prefetch_related = {}
+
+    def expand_queryset(self, queryset):
+        expansions = requested_expansions(self.request)
+        select = list(self.select_related_always)
+        prefetch = list(self.prefetch_related_always)
+        for path in sorted(expansions):
+            select.extend(self.expand_select_related.get(path, ()))
+            prefetch.extend(self.expand_prefetch_related.get(path, ()))
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
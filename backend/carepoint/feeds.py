@@ -0,0 +1,74 @@
+"""
+Cursor pagination and date windows for per-user feeds (appointments, consultations).
+
+Feeds accept ``from`` and ``to`` (``YYYY-MM-DD`` or ISO datetimes) and
+default to today ± ``FEED_WINDOW_DAYS``. Windows are half-open
+``[start, end)`` so the range filter stays index-friendly.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+FEED_WINDOW_DAYS = 30
+
+
+class FeedPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class AppointmentFeedPagination(FeedPagination):
+    ordering = ('appointment_datetime', 'id')
+
+
+class ConsultationFeedPagination(FeedPagination):
+    ordering = ('-consultation_datetime', '-id')
+
+
+def parse_window_bound(value, param, end=False):
+    """Parse a date or datetime query value; a bare ``to`` date includes that whole day."""
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    if moment is None:
+        raise ValidationError({param: 'Use YYYY-MM-DD or an ISO 8601 datetime.'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def feed_window(request, days=FEED_WINDOW_DAYS):
+    """Return the ``(start, end)`` window requested by ``?from=`` / ``?to=``."""
+    span = timedelta(days=2 * days + 1)
+    start = request.query_params.get('from', None)
+    end = request.query_params.get('to', None)
+    start = parse_window_bound(start, 'from') if start else None
+    end = parse_window_bound(end, 'to', end=True) if end else None
+
+    # A single bound keeps the default window width; no bounds centre it on today
+    if start is None and end is None:
+        start = timezone.make_aware(datetime.combine(timezone.localdate(), time.min) - timedelta(days=days))
+    if start is None:
+        start = end - span
+    if end is None:
+        end = start + span
+    if end <= start:
+        raise ValidationError({'to': 'Must be after from.'})
+    return start, end
+
+
+def apply_feed_filters(queryset, request, date_field, status_field='status'):
+    start, end = feed_window(request)
+    queryset = queryset.filter(**{f'{date_field}__gte': start, f'{date_field}__lt': end})
+    statuses = [value for value in request.query_params.get('status', '').split(',') if value]
+    if statuses and status_field:
+        queryset = queryset.filter(**{f'{status_field}__in': statuses})
+    return queryset
@@ -0,0 +1,212 @@
+"""
+Push channel for live boards (waiting room, check-in desk, doctor dashboard).
+
+Changes are published to topics such as ``doctor:<id>`` and ``clinic`` and
+streamed to browsers as server-sent events from an async view, so boards
+patch their rows in place instead of re-polling the whole day. Streams hold
+a connection open and need the ASGI application behind an ASGI server
+(``uvicorn carepoint.asgi:application``); under WSGI a stream would tie up a
+worker thread and never flush, so streaming views refuse WSGI requests.
+
+``EventSource`` cannot send an Authorization header, so a stream is opened
+with a ticket instead of the access token: a signed staff id that only the
+stream accepts and that expires after ``STREAM_TICKET_SECONDS``, so nothing
+reusable lands in access logs.
+
+``CAREPOINT_LIVE_BROKER`` picks the broker by dotted path. The default
+``LocalBroker`` fans out inside one process. ``CacheBroker`` shares events
+through the Django cache, which must then be a shared backend (Redis,
+Memcached) reachable from every node.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.module_loading import import_string
+
+DEFAULT_BROKER = 'carepoint.live.LocalBroker'
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+REPLAY_EVENTS = 500  # recent events kept for reconnecting clients (Last-Event-ID)
+STREAM_TICKET_SECONDS = 60
+STREAM_TICKET_SALT = 'carepoint.live.stream'
+
+
+class Subscription:
+    """Events for a set of topics, delivered to one stream's event loop."""
+
+    def __init__(self, broker, topics):
+        self.broker = broker
+        self.topics = frozenset(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def push(self, entry):
+        # Called from whichever thread published the event
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, entry)
+
+    async def get(self, timeout):
+        """The next ``(event_id, topics, data)`` entry, or None after ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process fan-out for single-node deployments."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counter = itertools.count(1)
+        self.recent = deque(maxlen=REPLAY_EVENTS)
+        self.subscriptions = set()
+
+    def publish(self, topics, data):
+        topics = frozenset(topics)
+        with self.lock:
+            entry = (next(self.counter), topics, data)
+            self.recent.append(entry)
+            subscriptions = [sub for sub in self.subscriptions if sub.topics & topics]
+        for subscription in subscriptions:
+            subscription.push(entry)
+
+    async def subscribe(self, topics, last_event_id=None):
+        subscription = Subscription(self, topics)
+        with self.lock:
+            self.subscriptions.add(subscription)
+            if last_event_id is not None:
+                for entry in self.recent:
+                    if entry[0] > last_event_id and entry[1] & subscription.topics:
+                        subscription.queue.put_nowait(entry)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+
+class CacheSubscription(Subscription):
+    def __init__(self, broker, topics, cursor):
+        super().__init__(broker, topics)
+        self.cursor = cursor
+
+    async def get(self, timeout):
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        deadline = self.loop.time() + timeout
+        while True:
+            for entry in await asyncio.to_thread(self.broker.read_after, self.cursor):
+                self.cursor = entry[0]
+                if entry[1] & self.topics:
+                    self.queue.put_nowait(entry)
+            if not self.queue.empty():
+                return self.queue.get_nowait()
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(self.broker.poll_interval, remaining))
+
+
+class CacheBroker:
+    """
+    Multi-node broker on the shared Django cache.
+
+    Events are numbered with an atomic ``incr`` and stored under one key
+    each; every stream reads the keys after its cursor with one
+    ``get_many`` per poll, so the database is never touched.
+    """
+    poll_interval = 0.5
+    sequence_key = 'live:sequence'
+    event_timeout = 300
+
+    def event_key(self, event_id):
+        return f'live:event:{event_id}'
+
+    def publish(self, topics, data):
+        cache.add(self.sequence_key, 0, timeout=None)
+        event_id = cache.incr(self.sequence_key)
+        cache.set(self.event_key(event_id), (list(topics), data), self.event_timeout)
+
+    def read_after(self, cursor):
+        last = cache.get(self.sequence_key) or 0
+        if last <= cursor:
+            return []
+        first = max(cursor + 1, last - REPLAY_EVENTS + 1)
+        keys = [self.event_key(event_id) for event_id in range(first, last + 1)]
+        found = cache.get_many(keys)
+        return [
+            (event_id, frozenset(found[key][0]), found[key][1])
+            for event_id, key in zip(range(first, last + 1), keys) if key in found
+        ]
+
+    async def subscribe(self, topics, last_event_id=None):
+        cursor = last_event_id
+        if cursor is None:
+            cursor = await asyncio.to_thread(cache.get, self.sequence_key) or 0
+        return CacheSubscription(self, topics, cursor)
+
+    def unsubscribe(self, subscription):
+        pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'CAREPOINT_LIVE_BROKER', DEFAULT_BROKER))()
+        return _broker
+
+
+def publish(topics, data):
+    """Send ``data`` once to every subscriber of any of ``topics``."""
+    get_broker().publish(topics, data)
+
+
+def is_asgi_request(request):
+    """Whether the request came through the ASGI application, where streams can be served."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def issue_stream_ticket(staff_id):
+    return signing.dumps(staff_id, salt=STREAM_TICKET_SALT)
+
+
+def read_stream_ticket(ticket):
+    """The staff id a ticket was issued to, or None if it is forged or expired."""
+    try:
+        return signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_SECONDS)
+    except signing.BadSignature:
+        return None
+
+
+def format_event(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+async def event_stream(topics, event, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    """Yield server-sent events for ``topics``, with comment heartbeats while idle."""
+    subscription = await get_broker().subscribe(topics, last_event_id)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while True:
+            entry = await subscription.get(heartbeat)
+            if entry is None:
+                yield ': keepalive\n\n'
+            else:
+                yield format_event(entry[0], event, entry[2])
+    finally:
+        subscription.close()
@@ -0,0 +1,73 @@
+"""
+Mergeable quantile sketch for precomputed percentiles.
+
+Values are counted in logarithmic buckets whose width grows with the
+value (as in DDSketch), so any quantile is answered within a fixed
+relative error and two sketches merge by adding bucket counts. That lets
+per-day rollups be combined over any date range without the raw values.
+"""
+import math
+from collections import Counter
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# Values at or below this are counted as zero
+MIN_VALUE = 1e-9
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, bins=None, zero_count=0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = Counter(bins or {})
+        self.zero_count = zero_count
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value, count=1):
+        if value <= MIN_VALUE:
+            self.zero_count += count
+        else:
+            self.bins[math.ceil(math.log(value) / self.log_gamma)] += count
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different accuracies')
+        self.bins.update(other.bins)
+        self.zero_count += other.zero_count
+        return self
+
+    def quantile(self, q):
+        """The value at quantile ``q`` (0–1), or None for an empty sketch."""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            'accuracy': self.relative_accuracy,
+            'zero': self.zero_count,
+            'bins': {str(index): count for index, count in self.bins.items() if count},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(
+            relative_accuracy=data.get('accuracy', DEFAULT_RELATIVE_ACCURACY),
+            bins={int(index): count for index, count in data.get('bins', {}).items()},
+            zero_count=data.get('zero', 0),
+        )
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -57,7 +58,7 @@ AUTH_USER_MODEL = 'userauth.Staff'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'userauth.authentication.PrincipalJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -73,6 +74,30 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Broker for the live board streams (carepoint.live). LocalBroker fans out within
+# one process; use carepoint.live.CacheBroker with a shared cache when running
+# several ASGI workers or nodes. Streams are only served by the ASGI app:
+#   uvicorn carepoint.asgi:application
+CAREPOINT_LIVE_BROKER = 'carepoint.live.LocalBroker'
+
+# Cache for authenticated principals (userauth.authentication) and CacheBroker.
+# LocMemCache is per process: with several workers, a deactivated account or a
+# role change only reaches the worker that saved it until the entry expires.
+# Point every worker at one Redis instead (needs `pip install redis`):
+#   CAREPOINT_REDIS_URL=redis://localhost:6379/0
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.environ.get('CAREPOINT_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CAREPOINT_REDIS_URL'],
+        }
+    }
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # Next.js development server
@@ -92,11 +117,17 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'if-modified-since',
+    'if-none-match',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'last-modified',
+]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -147,6 +178,16 @@ DATABASES = {
     }
 }
 
+# Local SQLite database for running tests and benchmarks without MySQL:
+#   CAREPOINT_DB=sqlite python manage.py test
+if os.environ.get('CAREPOINT_DB') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('CAREPOINT_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
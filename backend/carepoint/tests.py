@@ -0,0 +1,277 @@
+import random
+from datetime import date, datetime, time, timedelta
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from appointments.models import Appointment, Consultation
+from appointments.views import AppointmentViewSet, ConsultationViewSet
+from billing.models import Bill, Payment
+from billing.views import BillViewSet, PaymentViewSet
+from laboratory.models import LabRequest
+from laboratory.views import LabRequestViewSet
+from patients.models import MedicalRecord, Patient
+from patients.views import MedicalRecordViewSet
+from pharmacy.models import Prescription
+from pharmacy.views import PrescriptionViewSet
+from userauth.models import Staff
+from .quantiles import QuantileSketch
+
+# (viewset, query params, index the plan must use); ids are filled in from the seeded rows.
+# A tuple lists equally good indexes the planner may pick between.
+HOT_QUERIES = [
+    (AppointmentViewSet, {'doctor_id': 'doctor'}, 'appt_doctor_time_status_idx'),
+    (AppointmentViewSet, {'patient_id': 'patient'}, 'appt_patient_datetime_idx'),
+    (AppointmentViewSet, {'patient_id': 'patient', 'status': 'pending'}, 'appt_patient_status_idx'),
+    (AppointmentViewSet, {'status': 'pending'}, 'appt_status_datetime_idx'),
+    (AppointmentViewSet, {'doctor_id': 'doctor', 'date': 'today'}, 'appt_doctor_time_status_idx'),
+    (ConsultationViewSet, {'doctor_id': 'doctor'}, 'consult_doctor_datetime_idx'),
+    (ConsultationViewSet, {'patient_id': 'patient'}, 'consult_patient_datetime_idx'),
+    (ConsultationViewSet, {'doctor_id': 'doctor', 'date': 'today'}, 'consult_doctor_datetime_idx'),
+    (LabRequestViewSet, {'doctor_id': 'doctor'}, 'lab_req_doctor_date_idx'),
+    (LabRequestViewSet, {'patient_id': 'patient'}, 'lab_req_patient_date_idx'),
+    (LabRequestViewSet, {'status': 'requested'}, 'lab_req_worklist_idx'),
+    (PrescriptionViewSet, {'patient_id': 'patient'}, 'rx_patient_date_idx'),
+    (PrescriptionViewSet, {'doctor_id': 'doctor'}, 'rx_doctor_date_idx'),
+    (PrescriptionViewSet, {'status': 'pending'}, 'rx_status_date_idx'),
+    (BillViewSet, {'patient_id': 'patient'}, 'bill_patient_issued_idx'),
+    (BillViewSet, {'status': 'pending'}, 'bill_status_issued_idx'),
+    (BillViewSet, {'patient_id': 'patient', 'date_from': 'today', 'date_to': 'today'}, 'bill_patient_issued_idx'),
+    (PaymentViewSet, {'bill_id': 'bill'}, 'payment_bill_date_idx'),
+    (PaymentViewSet, {'bill_id': 'bill', 'date_from': 'today'}, 'payment_bill_date_idx'),
+    (MedicalRecordViewSet, {'patient_id': 'patient'}, 'record_patient_date_idx'),
+    (
+        MedicalRecordViewSet, {'patient_id': 'patient', 'record_type': 'diagnosis'},
+        ('record_patient_type_date_idx', 'record_patient_date_idx'),
+    ),
+]
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN each viewset's hot list filters and require the composite index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        doctors = Staff.objects.bulk_create([
+            Staff(username=f'doc{i}', first_name='Doc', last_name=f'Tor{i}', role='doctor') for i in range(5)
+        ])
+        patients = Patient.objects.bulk_create([
+            Patient(
+                first_name='Pat', last_name=f'Ient{i}', date_of_birth=date(1990, 1, 1), gender='F',
+                contact_email=f'patient{i}@example.com', contact_phone=f'07{i:08d}', address='Nairobi'
+            ) for i in range(50)
+        ])
+        statuses = ['pending', 'confirmed', 'completed', 'cancelled']
+        appointments = Appointment.objects.bulk_create([
+            Appointment(
+                patient=patients[i % 50], doctor=doctors[i % 5], appointment_type='consultation',
+                appointment_datetime=now - timedelta(hours=i), reason_for_visit='Review',
+                status=statuses[i % 4]
+            ) for i in range(500)
+        ])
+        consultations = Consultation.objects.bulk_create([
+            Consultation(
+                appointment=appointment, patient=appointment.patient, doctor=appointment.doctor,
+                chief_complaint='Cough', diagnosis='Flu', notes='', consultation_datetime=appointment.appointment_datetime
+            ) for appointment in appointments[:250]
+        ])
+        Prescription.objects.bulk_create([
+            Prescription(
+                consultation=consultation, patient=consultation.patient, doctor=consultation.doctor,
+                prescribed_date=consultation.consultation_datetime, status=['pending', 'dispensed'][i % 2]
+            ) for i, consultation in enumerate(consultations)
+        ])
+        LabRequest.objects.bulk_create([
+            LabRequest(
+                patient=patients[i % 50], doctor=doctors[i % 5], test_name='CBC',
+                priority=['routine', 'urgent', 'emergency'][i % 3],
+                status=['requested', 'in_progress', 'completed'][i % 3],
+                request_date=now - timedelta(hours=i)
+            ) for i in range(300)
+        ])
+        bills = Bill.objects.bulk_create([
+            Bill(
+                patient=patients[i % 50], total_amount=100, patient_responsibility=100,
+                issued_date=now - timedelta(days=i), due_date=date.today(), status=['pending', 'paid'][i % 2]
+            ) for i in range(300)
+        ])
+        Payment.objects.bulk_create([
+            Payment(
+                bill=bills[i % 300], payment_date=now - timedelta(days=i), payment_method='cash',
+                amount_paid=50, received_by=doctors[0]
+            ) for i in range(600)
+        ])
+        MedicalRecord.objects.bulk_create([
+            MedicalRecord(
+                patient=patients[i % 50], record_type=['diagnosis', 'procedure', 'lab_result'][i % 3],
+                record_date=now - timedelta(hours=i), description='Note', recorded_by=doctors[0]
+            ) for i in range(600)
+        ])
+        cls.ids = {
+            'doctor': doctors[0].id, 'patient': patients[0].id, 'bill': bills[0].id,
+            'today': str(timezone.localdate()),
+        }
+
+    def viewset_queryset(self, viewset_class, params):
+        params = {key: self.ids.get(value, value) for key, value in params.items()}
+        request = Request(APIRequestFactory().get('/', params))
+        view = viewset_class(request=request, format_kwarg=None, action='list', args=(), kwargs={})
+        return view.filter_queryset(view.get_queryset())
+
+    def test_hot_queries_use_composite_indexes(self):
+        for viewset_class, params, index_names in HOT_QUERIES:
+            if isinstance(index_names, str):
+                index_names = (index_names,)
+            with self.subTest(viewset=viewset_class.__name__, params=params):
+                plan = self.viewset_queryset(viewset_class, params).explain()
+                self.assertTrue(
+                    any(name in plan for name in index_names),
+                    f'Expected one of {index_names} in the query plan:\n{plan}'
+                )
+
+
+class DateRangeFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Staff.objects.create_user(username='cashier', password='pass', role='admin')
+        patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        cls.today = timezone.localdate()
+        midnight = timezone.make_aware(datetime.combine(cls.today, time.min))
+        for label, moment in (
+            ('yesterday', midnight - timedelta(minutes=1)),
+            ('morning', midnight),
+            ('night', midnight + timedelta(hours=23, minutes=59)),
+            ('tomorrow', midnight + timedelta(days=1)),
+        ):
+            Bill.objects.create(
+                patient=patient, total_amount=10, patient_responsibility=10,
+                issued_date=moment, due_date=cls.today, notes=label
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def notes(self, params):
+        response = self.client.get('/api/billing/bills/', params)
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return sorted(row['notes'] for row in rows)
+
+    def test_single_day(self):
+        self.assertEqual(self.notes({'date': str(self.today)}), ['morning', 'night'])
+
+    def test_date_to_includes_the_whole_day(self):
+        self.assertEqual(
+            self.notes({'date_from': str(self.today), 'date_to': str(self.today)}), ['morning', 'night']
+        )
+        self.assertEqual(self.notes({'date_to': str(self.today)}), ['morning', 'night', 'yesterday'])
+
+    def test_invalid_dates(self):
+        self.assertEqual(self.client.get('/api/billing/bills/', {'date': 'today'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/billing/bills/', {'date_from': '2024-13-01'}).status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        start = timezone.now() + timedelta(days=1)
+        cls.appointments = [
+            Appointment.objects.create(
+                patient=cls.patient, doctor=cls.doctor, appointment_type='consultation',
+                appointment_datetime=start + timedelta(hours=i), reason_for_visit='Checkup'
+            ) for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = '/api/appointments/appointments/'
+
+    def revalidate(self, url, response, params=None):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_list_costs_one_query(self):
+        first = self.client.get(self.url, {'doctor_id': self.doctor.id})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+
+        with self.assertNumQueries(1):
+            second = self.revalidate(self.url, first, {'doctor_id': self.doctor.id})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        # Other filters and pages are separate representations
+        self.assertEqual(self.revalidate(self.url, first, {'doctor_id': self.doctor.id, 'page': 1}).status_code, 200)
+
+    def test_list_changes_invalidate(self):
+        params = {'doctor_id': self.doctor.id}
+        first = self.client.get(self.url, params)
+        self.appointments[0].status = 'confirmed'
+        self.appointments[0].save()
+        second = self.revalidate(self.url, first, params)
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+        Appointment.objects.filter(id=self.appointments[1].id).delete()
+        self.assertEqual(self.revalidate(self.url, second, params).status_code, 200)
+
+    def test_detail_etag_and_last_modified(self):
+        url = f'/api/patients/patients/{self.patient.id}/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        self.patient.address = 'Mombasa'
+        self.patient.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+        self.assertEqual(self.client.get('/api/patients/patients/999999/').status_code, 404)
+
+    def test_expanded_responses_are_always_rendered(self):
+        first = self.client.get(self.url, {'expand': 'patient_details'})
+        self.assertNotIn('ETag', first)
+        self.assertEqual(self.revalidate(self.url, {'ETag': '"x"'}, {'expand': 'patient_details'}).status_code, 200)
+
+
+class QuantileSketchTests(SimpleTestCase):
+    def exact(self, values, q):
+        values = sorted(values)
+        return values[int(q * (len(values) - 1))]
+
+    def test_quantiles_are_within_relative_accuracy(self):
+        rng = random.Random(7)
+        values = [rng.lognormvariate(8, 1) for _ in range(5000)]
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.add(value)
+        for q in (0.5, 0.9, 0.99):
+            exact = self.exact(values, q)
+            self.assertAlmostEqual(sketch.quantile(q) / exact, 1, delta=0.011)
+
+    def test_merged_sketches_match_one_sketch_and_round_trip(self):
+        rng = random.Random(11)
+        values = [rng.uniform(0, 7200) for _ in range(2000)] + [0] * 10
+        whole, merged = QuantileSketch(), QuantileSketch()
+        for chunk in range(0, len(values), 300):
+            part = QuantileSketch()
+            for value in values[chunk:chunk + 300]:
+                part.add(value)
+                whole.add(value)
+            merged.merge(QuantileSketch.from_dict(part.to_dict()))
+        self.assertEqual((merged.count, merged.bins, merged.zero_count), (whole.count, whole.bins, whole.zero_count))
+        self.assertEqual(merged.quantile(0), 0.0)
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+        with self.assertRaises(ValueError):
+            merged.merge(QuantileSketch(relative_accuracy=0.05))
@@ -0,0 +1,71 @@
+"""
+Bulk status transitions.
+
+Models declare ``STATUS_TRANSITIONS`` as ``{target: (allowed source statuses)}``.
+A bulk transition reads the current statuses of the requested ids once and
+applies the change with a single guarded
+``UPDATE ... WHERE id IN (...) AND status IN (...)``, so a row changed by
+someone else in between is left alone and reported as a conflict.
+"""
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+BULK_TRANSITION_MAX_IDS = 500
+
+
+def parse_ids(value):
+    """Validate the ``ids`` list of a bulk request, dropping duplicates but keeping order."""
+    if not isinstance(value, list) or not value:
+        raise ValidationError({'ids': 'Provide a non-empty list of ids.'})
+    if len(value) > BULK_TRANSITION_MAX_IDS:
+        raise ValidationError({'ids': f'At most {BULK_TRANSITION_MAX_IDS} ids per request.'})
+    try:
+        ids = [int(pk) for pk in value]
+    except (TypeError, ValueError):
+        raise ValidationError({'ids': 'Ids must be integers.'})
+    return list(dict.fromkeys(ids))
+
+
+def bulk_transition(queryset, ids, target, updates=None):
+    """
+    Move the rows of ``queryset`` with ``ids`` to status ``target``.
+
+    ``updates`` holds extra column values written with the status. Returns
+    ``(updated_count, results)`` where results has one
+    ``{'id', 'outcome', 'status'}`` entry per id, in request order.
+    """
+    model = queryset.model
+    allowed = model.STATUS_TRANSITIONS.get(target)
+    if allowed is None:
+        raise ValidationError({'status': f'Cannot bulk-move to {target!r}.'})
+
+    updates = dict(updates or {})
+    if any(field.name == 'updated_date' for field in model._meta.concrete_fields):
+        updates['updated_date'] = timezone.now()
+
+    before = dict(queryset.filter(id__in=ids).values_list('id', 'status'))
+    eligible = [pk for pk in ids if before.get(pk) in allowed]
+    updated = 0
+    if eligible:
+        updated = queryset.filter(id__in=eligible, status__in=allowed).update(status=target, **updates)
+
+    after = {}
+    if updated != len(eligible):
+        # Some rows changed between the read and the update
+        after = dict(queryset.filter(id__in=eligible).values_list('id', 'status'))
+
+    results = []
+    for pk in ids:
+        current = before.get(pk)
+        if current is None:
+            outcome = 'not_found'
+        elif current == target:
+            outcome = 'unchanged'
+        elif current not in allowed:
+            outcome = 'invalid_transition'
+        elif after.get(pk, target) == target:
+            outcome, current = 'updated', target
+        else:
+            outcome, current = 'conflict', after[pk]
+        results.append({'id': pk, 'outcome': outcome, 'status': current})
+    return updated, results
@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import LabRequest, LabResult
+from .models import LabRequest, LabResult, LabTest, LabTurnaroundRollup
 
 class LabResultInline(admin.StackedInline):
     model = LabResult
     extra = 0
 
+@admin.register(LabTest)
+class LabTestAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name', 'unit', 'reference_low', 'reference_high')
+    search_fields = ('code', 'name')
+
 @admin.register(LabRequest)
 class LabRequestAdmin(admin.ModelAdmin):
     list_display = ('id', 'patient', 'doctor', 'test_name', 'priority', 'status', 'request_date')
@@ -15,7 +20,15 @@ class LabRequestAdmin(admin.ModelAdmin):
 
 @admin.register(LabResult)
 class LabResultAdmin(admin.ModelAdmin):
-    list_display = ('id', 'request', 'is_abnormal', 'performed_by', 'verified_by', 'result_date')
+    list_display = ('id', 'request', 'test_value', 'numeric_value', 'is_abnormal', 'performed_by', 'verified_by', 'result_date')
     list_filter = ('is_abnormal', 'result_date')
     search_fields = ('request__patient__first_name', 'request__patient__last_name', 'test_value', 'notes')
     date_hierarchy = 'result_date'
+
+@admin.register(LabTurnaroundRollup)
+class LabTurnaroundRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'test_name', 'priority', 'count', 'total_seconds')
+    list_filter = ('priority', 'day')
+    search_fields = ('test_name',)
+    date_hierarchy = 'day'
+    readonly_fields = ('sketch',)
@@ -0,0 +1,182 @@
+"""
+Bulk ingestion of analyzer result files.
+
+Files are delimited text with a header row naming at least ``request_id``
+and ``test_value``; ``is_abnormal``, ``notes`` and ``result_date`` are
+optional. Rows are read one at a time and handled in batches: each batch
+looks its request ids up in one query, then inserts its results with
+``bulk_create`` and marks the requests completed with one ``UPDATE``
+inside a single transaction. Numeric values, abnormal flags and
+turnaround rollups are filled in as saving results one by one would.
+Only the current batch and a capped list of rejects are held in memory,
+whatever the file size.
+
+Batches commit independently, so re-running a partly ingested file just
+rejects the rows that already have results.
+"""
+import csv
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import LabRequest, LabResult, LabTest
+from .turnaround import record_turnarounds, turnaround_sample
+
+INGEST_BATCH_SIZE = 500
+MAX_REPORTED_REJECTS = 1000
+REQUIRED_COLUMNS = ('request_id', 'test_value')
+REQUEST_ID_PREFIX = 'LAB-REQ-'
+ABNORMAL_FLAGS = {'1', 'true', 'yes', 'y', 'a', 'h', 'hh', 'l', 'll'}
+NORMAL_FLAGS = {'', '0', 'false', 'no', 'n'}
+DELIMITERS = {',': ',', 'comma': ',', '\t': '\t', 'tab': '\t', ';': ';', '|': '|', 'pipe': '|'}
+
+
+class IngestError(ValueError):
+    """The file as a whole cannot be ingested (bad header or delimiter)."""
+
+
+class IngestReport:
+    def __init__(self):
+        self.created = 0
+        self.rejected = 0
+        self.rejects = []
+
+    def reject(self, line, request_id, reason):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append({'line': line, 'request_id': request_id, 'reason': reason})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'rejected': self.rejected,
+            'rejects': self.rejects,
+            'rejects_truncated': self.rejected > len(self.rejects),
+        }
+
+
+def parse_request_id(value):
+    value = value.strip()
+    if value.upper().startswith(REQUEST_ID_PREFIX):
+        value = value[len(REQUEST_ID_PREFIX):]
+    return int(value)
+
+
+def parse_flag(value):
+    flag = value.strip().lower()
+    if flag in ABNORMAL_FLAGS:
+        return True
+    if flag in NORMAL_FLAGS:
+        return False
+    raise ValueError(f'Unknown abnormal flag {value!r}')
+
+
+def parse_row(row, now):
+    """Turn a CSV row dict into LabResult fields; raises ValueError with the reason."""
+    try:
+        request_id = parse_request_id(row.get('request_id') or '')
+    except ValueError:
+        raise ValueError('Invalid request_id')
+    test_value = (row.get('test_value') or '').strip()
+    if not test_value:
+        raise ValueError('Missing test_value')
+    if len(test_value) > LabResult._meta.get_field('test_value').max_length:
+        raise ValueError('test_value is too long')
+
+    result_date = now
+    if (row.get('result_date') or '').strip():
+        try:
+            result_date = parse_datetime(row['result_date'].strip())
+        except ValueError:
+            result_date = None
+        if result_date is None:
+            raise ValueError('Invalid result_date')
+        if timezone.is_naive(result_date):
+            result_date = timezone.make_aware(result_date)
+
+    return {
+        'request_id': request_id,
+        'test_value': test_value,
+        'is_abnormal': parse_flag(row.get('is_abnormal') or ''),
+        'notes': (row.get('notes') or '').strip() or None,
+        'result_date': result_date,
+    }
+
+
+def ingest_batch(batch, performed_by, report, catalog):
+    """Insert one batch of ``(line, fields)`` pairs and complete their requests."""
+    ids = {fields['request_id'] for _, fields in batch}
+    with transaction.atomic():
+        # Locking the requests keeps a concurrent import of the same ids out of this batch
+        rows = LabRequest.objects.select_for_update().filter(id__in=ids).annotate(
+            has_result=Exists(LabResult.objects.filter(request=OuterRef('pk')))
+        ).values('id', 'status', 'has_result', 'patient_id', 'test_id', 'test_name', 'priority', 'request_date')
+        requests = {row['id']: row for row in rows}
+        results = []
+        turnarounds = []
+        for line, fields in batch:
+            request_id = fields['request_id']
+            lab_request = requests.get(request_id)
+            if lab_request is None:
+                report.reject(line, request_id, 'Unknown lab request')
+            elif lab_request['status'] == 'cancelled':
+                report.reject(line, request_id, 'Lab request is cancelled')
+            elif lab_request['has_result']:
+                report.reject(line, request_id, 'Lab request already has a result')
+            else:
+                test = catalog.get(lab_request['test_id'])
+                result = LabResult(performed_by=performed_by, **fields)
+                result.apply_catalog(lab_request['patient_id'], test)
+                results.append(result)
+                turnarounds.append(turnaround_sample(
+                    lab_request['request_date'], result.result_date,
+                    test.name if test else lab_request['test_name'], lab_request['priority'],
+                ))
+                # A second row for the same request in this file is a duplicate
+                lab_request['has_result'] = True
+
+        if results:
+            LabResult.objects.bulk_create(results)
+            LabRequest.objects.filter(id__in=[result.request_id for result in results]).update(
+                status='completed', updated_date=timezone.now()
+            )
+            record_turnarounds(turnarounds)
+    report.created += len(results)
+
+
+def ingest_results(lines, performed_by, delimiter=',', batch_size=INGEST_BATCH_SIZE):
+    """
+    Ingest the result file read from ``lines`` (an iterable of text lines).
+
+    Returns an ``IngestReport``; raises ``IngestError`` when the header is
+    missing a required column.
+    """
+    delimiter = DELIMITERS.get(delimiter)
+    if delimiter is None:
+        raise IngestError('Unsupported delimiter')
+    reader = csv.DictReader(lines, delimiter=delimiter)
+    columns = [name.strip().lower() for name in reader.fieldnames or []]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise IngestError(f'Missing column(s): {", ".join(missing)}')
+    reader.fieldnames = columns
+
+    report = IngestReport()
+    catalog = LabTest.objects.in_bulk()
+    now = timezone.now()
+    batch = []
+    for row in reader:
+        line = reader.line_num
+        try:
+            fields = parse_row(row, now)
+        except ValueError as error:
+            report.reject(line, (row.get('request_id') or '').strip(), str(error))
+            continue
+        batch.append((line, fields))
+        if len(batch) >= batch_size:
+            ingest_batch(batch, performed_by, report, catalog)
+            batch = []
+    if batch:
+        ingest_batch(batch, performed_by, report, catalog)
+    return report
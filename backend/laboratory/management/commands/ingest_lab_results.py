@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from laboratory.ingest import INGEST_BATCH_SIZE, IngestError, ingest_results
+from userauth.models import Staff
+
+
+class Command(BaseCommand):
+    help = 'Ingest an analyzer result file (delimited text with request_id and test_value columns)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--performed-by', required=True, help='Username of the lab technician')
+        parser.add_argument('--delimiter', default=',', help='comma, tab, pipe or ;')
+        parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        technician = Staff.objects.filter(username=options['performed_by']).first()
+        if technician is None:
+            raise CommandError(f'No staff member named {options["performed_by"]!r}')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+                report = ingest_results(
+                    lines, technician, delimiter=options['delimiter'], batch_size=options['batch_size']
+                )
+        except (OSError, IngestError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        for reject in report.rejects:
+            self.stderr.write(f'line {reject["line"]}: {reject["request_id"]}: {reject["reason"]}')
+        if report.rejected > len(report.rejects):
+            self.stderr.write(f'... {report.rejected - len(report.rejects)} more rejects not shown')
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingested {report.created} results, rejected {report.rejected}'
+        ))
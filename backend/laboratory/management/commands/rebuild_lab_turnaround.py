@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from laboratory.models import LabResult
+from laboratory.turnaround import rebuild_turnarounds
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the lab turnaround rollups from existing results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        recorded = rebuild_turnarounds(LabResult.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt turnaround rollups from {recorded} results'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_composite_indexes'),
+        ('laboratory', '0002_initial'),
+        ('patients', '0005_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='labrequest',
+            index=models.Index(fields=['doctor', 'request_date'], name='lab_req_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='labrequest',
+            index=models.Index(fields=['patient', 'request_date'], name='lab_req_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='labrequest',
+            index=models.Index(fields=['status', 'priority', 'request_date'], name='lab_req_status_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:24
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+NUMERIC_VALUE = re.compile(r'^\s*[<>]?=?\s*(-?\d+(?:\.\d+)?)')
+
+
+def backfill_results(apps, schema_editor):
+    LabRequest = apps.get_model('laboratory', 'LabRequest')
+    LabResult = apps.get_model('laboratory', 'LabResult')
+    LabResult.objects.update(
+        patient_id=Subquery(LabRequest.objects.filter(pk=OuterRef('request_id')).values('patient_id')[:1])
+    )
+    batch = []
+    for result in LabResult.objects.only('id', 'test_value').iterator(chunk_size=2000):
+        match = NUMERIC_VALUE.match(result.test_value or '')
+        if match:
+            result.numeric_value = float(match.group(1))
+            batch.append(result)
+        if len(batch) >= 2000:
+            LabResult.objects.bulk_update(batch, ['numeric_value'])
+            batch = []
+    LabResult.objects.bulk_update(batch, ['numeric_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0004_updated_date'),
+        ('patients', '0005_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabTest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('unit', models.CharField(blank=True, max_length=20)),
+                ('reference_low', models.FloatField(blank=True, null=True)),
+                ('reference_high', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='labresult',
+            name='numeric_value',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='labresult',
+            name='patient',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='patients.patient'),
+        ),
+        migrations.AddField(
+            model_name='labrequest',
+            name='test',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='laboratory.labtest'),
+        ),
+        migrations.AddField(
+            model_name='labresult',
+            name='test',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='laboratory.labtest'),
+        ),
+        migrations.AddIndex(
+            model_name='labresult',
+            index=models.Index(fields=['patient', 'test', 'result_date'], name='lab_result_trend_idx'),
+        ),
+        migrations.RunPython(backfill_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+PRIORITY_RANKS = {'emergency': 0, 'urgent': 1, 'routine': 2}
+
+
+def backfill_priority_rank(apps, schema_editor):
+    LabRequest = apps.get_model('laboratory', 'LabRequest')
+    LabRequest.objects.update(priority_rank=Case(
+        *[When(priority=priority, then=Value(rank)) for priority, rank in PRIORITY_RANKS.items()],
+        default=Value(PRIORITY_RANKS['routine']),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_appointmentseries'),
+        ('laboratory', '0005_lab_test_catalog'),
+        ('patients', '0005_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='labrequest',
+            name='lab_req_status_priority_idx',
+        ),
+        migrations.AddField(
+            model_name='labrequest',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='labrequest',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_lab_requests', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='labrequest',
+            name='priority_rank',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.RunPython(backfill_priority_rank, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='labrequest',
+            index=models.Index(fields=['status', 'priority_rank', 'request_date'], name='lab_req_worklist_idx'),
+        ),
+    ]
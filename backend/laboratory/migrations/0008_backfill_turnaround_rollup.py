@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:05
+
+from django.db import migrations
+
+
+def backfill_rollups(apps, schema_editor):
+    from laboratory.turnaround import rebuild_turnarounds
+    LabResult = apps.get_model('laboratory', 'LabResult')
+    LabTurnaroundRollup = apps.get_model('laboratory', 'LabTurnaroundRollup')
+    rebuild_turnarounds(LabResult.objects.all(), LabTurnaroundRollup)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0007_turnaround_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
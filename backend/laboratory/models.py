@@ -1,9 +1,72 @@
+import re
+
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from userauth.models import Staff
 from patients.models import Patient
 from appointments.models import Appointment
 
+# Leading number of a result such as "4.5", "4.5 mg/dL" or "<0.5"
+NUMERIC_VALUE = re.compile(r'^\s*[<>]?=?\s*(-?\d+(?:\.\d+)?)')
+
+
+def parse_numeric_value(text):
+    match = NUMERIC_VALUE.match(text or '')
+    return float(match.group(1)) if match else None
+
+
+class LabTest(models.Model):
+    """Catalog entry for an orderable test, with the unit and reference range its results use."""
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=100, unique=True)
+    unit = models.CharField(max_length=20, blank=True)
+    reference_low = models.FloatField(null=True, blank=True)
+    reference_high = models.FloatField(null=True, blank=True)
+
+    @classmethod
+    def match(cls, text):
+        """The catalog test whose code or name is ``text`` (case-insensitive), if any."""
+        text = (text or '').strip()
+        if not text:
+            return None
+        return cls.objects.filter(Q(code__iexact=text) | Q(name__iexact=text)).first()
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            self.link_existing()
+
+    def link_existing(self):
+        """Attach earlier free-text orders naming this test, and flag their numeric results."""
+        requests = LabRequest.objects.filter(test__isnull=True).filter(
+            Q(test_name__iexact=self.code) | Q(test_name__iexact=self.name)
+        )
+        results = LabResult.objects.filter(test__isnull=True, request__in=requests)
+        if self.reference_low is not None or self.reference_high is not None:
+            out_of_range = Q(pk__in=[])
+            if self.reference_low is not None:
+                out_of_range |= Q(numeric_value__lt=self.reference_low)
+            if self.reference_high is not None:
+                out_of_range |= Q(numeric_value__gt=self.reference_high)
+            results.filter(out_of_range).update(is_abnormal=True)
+            results.filter(numeric_value__isnull=False).exclude(out_of_range).update(is_abnormal=False)
+        results.update(test=self)
+        requests.update(test=self)
+
+    def is_out_of_range(self, value):
+        """True/False for a numeric value, or None when there is nothing to compare against."""
+        if value is None or (self.reference_low is None and self.reference_high is None):
+            return None
+        return (
+            (self.reference_low is not None and value < self.reference_low)
+            or (self.reference_high is not None and value > self.reference_high)
+        )
+
+    def __str__(self):
+        return f"{self.name} ({self.unit})" if self.unit else self.name
+
 class LabRequest(models.Model):
     PRIORITY_CHOICES = [
         ('routine', 'Routine'),
@@ -19,25 +82,99 @@ class LabRequest(models.Model):
         ('cancelled', 'Cancelled'),
     ]
 
+    # Worklist order: lower ranks are worked first
+    PRIORITY_RANKS = {'emergency': 0, 'urgent': 1, 'routine': 2}
+
+    # Target status -> statuses it may be reached from in a bulk transition
+    STATUS_TRANSITIONS = {
+        'sample_collected': ('requested',),
+        'in_progress': ('requested', 'sample_collected'),
+        'completed': ('sample_collected', 'in_progress'),
+        'cancelled': ('requested', 'sample_collected', 'in_progress'),
+    }
+
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     doctor = models.ForeignKey(Staff, on_delete=models.CASCADE)
     test_name = models.CharField(max_length=100)
+    test = models.ForeignKey(LabTest, on_delete=models.SET_NULL, null=True, blank=True)
     appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, null=True)
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='routine')
+    priority_rank = models.PositiveSmallIntegerField(default=2, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='requested')
     request_date = models.DateTimeField(default=timezone.now)
+    updated_date = models.DateTimeField(auto_now=True)
+    claimed_by = models.ForeignKey(
+        Staff, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_lab_requests'
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'request_date'], name='lab_req_doctor_date_idx'),
+            models.Index(fields=['patient', 'request_date'], name='lab_req_patient_date_idx'),
+            models.Index(fields=['status', 'priority_rank', 'request_date'], name='lab_req_worklist_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.priority_rank = self.PRIORITY_RANKS.get(self.priority, self.PRIORITY_RANKS['routine'])
+        # Link free-text orders to the catalog so their results can be trended
+        if self.test_id is None:
+            self.test = LabTest.match(self.test_name)
+        elif not self.test_name:
+            self.test_name = self.test.name
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.patient} - {self.test_name} - {self.request_date}"
 
 class LabResult(models.Model):
     request = models.OneToOneField(LabRequest, on_delete=models.CASCADE)
+    # Copied from the request at write time so trends read one index
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, null=True, editable=False)
+    test = models.ForeignKey(LabTest, on_delete=models.SET_NULL, null=True, editable=False)
     test_value = models.CharField(max_length=100)
+    numeric_value = models.FloatField(null=True, editable=False)
     is_abnormal = models.BooleanField(default=False)
     notes = models.TextField(blank=True, null=True)
     performed_by = models.ForeignKey(Staff, on_delete=models.CASCADE, related_name='lab_tests_performed')
     verified_by = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True, related_name='lab_tests_verified')
     result_date = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'test', 'result_date'], name='lab_result_trend_idx'),
+        ]
+
+    def apply_catalog(self, patient_id, test):
+        """Fill the derived columns; ``is_abnormal`` is computed when the test has a reference range."""
+        self.patient_id = patient_id
+        self.test = test
+        self.numeric_value = parse_numeric_value(self.test_value)
+        out_of_range = test.is_out_of_range(self.numeric_value) if test else None
+        if out_of_range is not None:
+            self.is_abnormal = out_of_range
+
+    def save(self, *args, **kwargs):
+        self.apply_catalog(self.request.patient_id, self.request.test)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.request.patient} - {self.request.test_name} - {self.result_date}"
+
+class LabTurnaroundRollup(models.Model):
+    """Request-to-result turnaround for one day × test × priority, kept current as results are saved."""
+    day = models.DateField()
+    test_name = models.CharField(max_length=100)
+    priority = models.CharField(max_length=20, choices=LabRequest.PRIORITY_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    # carepoint.quantiles.QuantileSketch.to_dict()
+    sketch = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'test_name', 'priority'], name='lab_tat_rollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.test_name} - {self.priority} ({self.count})"
@@ -1,21 +1,69 @@
 from rest_framework import serializers
-from .models import LabRequest, LabResult
+from carepoint.expansion import ExpandableFieldsMixin
+from .models import LabRequest, LabResult, LabTest
 from patients.serializers import PatientSerializer
 from userauth.serializers import StaffSerializer
 
-class LabRequestSerializer(serializers.ModelSerializer):
+class LabTestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LabTest
+        fields = '__all__'
+
+    def validate(self, data):
+        low = data.get('reference_low', getattr(self.instance, 'reference_low', None))
+        high = data.get('reference_high', getattr(self.instance, 'reference_high', None))
+        if low is not None and high is not None and low > high:
+            raise serializers.ValidationError({'reference_low': 'Must not be above reference_high.'})
+        return data
+
+class LabRequestSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     patient_details = PatientSerializer(source='patient', read_only=True)
     doctor_details = StaffSerializer(source='doctor', read_only=True)
+    expandable_fields = ('patient_details', 'doctor_details')
 
     class Meta:
         model = LabRequest
         fields = '__all__'
+        # Claims go through the claim/release actions
+        read_only_fields = ('claimed_by', 'claimed_at')
 
-class LabResultSerializer(serializers.ModelSerializer):
+class LabResultSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     request_details = LabRequestSerializer(source='request', read_only=True)
     performed_by_details = StaffSerializer(source='performed_by', read_only=True)
     verified_by_details = StaffSerializer(source='verified_by', read_only=True)
+    expandable_fields = ('request_details', 'performed_by_details', 'verified_by_details')
+
+    class Meta:
+        model = LabResult
+        fields = '__all__'
+
+class LabRequestWorklistSerializer(serializers.ModelSerializer):
+    """Flat worklist row; expects patient/doctor/claimed_by selected and ``result_available`` annotated."""
+    patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
+    doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
+    claimed_by_name = serializers.CharField(source='claimed_by.get_full_name', read_only=True, default=None)
+    result_available = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = LabRequest
+        fields = (
+            'id', 'patient', 'patient_name', 'doctor', 'doctor_name', 'test_name',
+            'priority', 'status', 'request_date', 'claimed_by', 'claimed_by_name', 'claimed_at',
+            'result_available',
+        )
+
+class LabResultWorklistSerializer(serializers.ModelSerializer):
+    """Flat result row; expects the request's patient and both staff members selected."""
+    test_name = serializers.CharField(source='request.test_name', read_only=True)
+    priority = serializers.CharField(source='request.priority', read_only=True)
+    patient = serializers.IntegerField(source='request.patient_id', read_only=True)
+    patient_name = serializers.CharField(source='request.patient.get_full_name', read_only=True)
+    performed_by_name = serializers.CharField(source='performed_by.get_full_name', read_only=True)
+    verified_by_name = serializers.CharField(source='verified_by.get_full_name', read_only=True, default=None)
 
     class Meta:
         model = LabResult
-        fields = '__all__'
\ No newline at end of file
+        fields = (
+            'id', 'request', 'test_name', 'priority', 'patient', 'patient_name', 'test_value',
+            'is_abnormal', 'result_date', 'performed_by', 'performed_by_name', 'verified_by', 'verified_by_name',
+        )
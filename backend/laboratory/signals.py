@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import LabResult
+from .turnaround import record_turnarounds, sample_for
+
+
+@receiver(post_save, sender=LabResult)
+def record_turnaround_on_create(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not created:
+        return
+    record_turnarounds([sample_for(instance, instance.request)])
@@ -1,3 +1,486 @@
-from django.test import TestCase
+import io
+import os
+import random
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from importlib import import_module
+from django.apps import apps as django_apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from appointments.models import Appointment
+from patients.models import Patient
+from userauth.models import Staff
+from .ingest import IngestError, ingest_results
+from .models import LabRequest, LabResult, LabTest, LabTurnaroundRollup
+from .worklist import claim_next
+from .turnaround import turnaround_summary
 
-# Create your tests here.
+
+class LabRequestBulkStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        cls.requests = [
+            LabRequest.objects.create(patient=patient, doctor=cls.doctor, test_name='CBC', status=status)
+            for status in ('requested', 'sample_collected', 'completed')
+        ]
+
+    def test_collect_samples(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        response = client.post('/api/laboratory/requests/bulk_status/', {
+            'ids': [lab_request.id for lab_request in self.requests], 'status': 'in_progress',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['outcome'] for row in response.data['results']],
+            ['updated', 'updated', 'invalid_transition']
+        )
+        self.assertEqual(
+            list(LabRequest.objects.order_by('id').values_list('status', flat=True)),
+            ['in_progress', 'in_progress', 'completed']
+        )
+
+
+class LabWorklistQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor', first_name='Greg', last_name='House')
+        cls.tech = Staff.objects.create_user(username='tech', password='pass', role='lab_technician')
+        cls.requests = []
+        for i in range(6):
+            patient = Patient.objects.create(
+                first_name=f'Patient{i}', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+                contact_email=f'p{i}@example.com', contact_phone='0712345678', address='Nairobi'
+            )
+            appointment = Appointment.objects.create(
+                patient=patient, doctor=cls.doctor, appointment_type='consultation',
+                appointment_datetime=timezone.now() + timedelta(hours=i), reason_for_visit=f'Visit {i}'
+            )
+            cls.requests.append(LabRequest.objects.create(
+                patient=patient, doctor=cls.doctor, appointment=appointment if i % 2 else None,
+                test_name='CBC', request_date=timezone.now() - timedelta(hours=i)
+            ))
+        for lab_request in cls.requests[:3]:
+            LabResult.objects.create(
+                request=lab_request, test_value='4.5', performed_by=cls.tech,
+                verified_by=cls.doctor if lab_request.id % 2 else None
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.tech)
+
+    def test_doctor_requests(self):
+        # Resolving the doctor plus one joined query, however many rows
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/laboratory/requests/doctor_requests/')
+        rows = response.data['results']
+        self.assertEqual(len(rows), 6)
+        self.assertEqual([row['resultAvailable'] for row in rows], [True] * 3 + [False] * 3)
+        self.assertEqual(rows[0]['reason'], 'General request')
+        self.assertEqual(rows[1]['reason'], 'Visit 1')
+        self.assertEqual(rows[0]['patientName'], 'Patient0 Otieno')
+
+    def test_request_worklist(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/laboratory/requests/worklist/', {'doctor_id': self.doctor.id})
+        # Equal priorities, so oldest first
+        row = response.data['results'][0]
+        self.assertEqual(response.data['count'], 6)
+        self.assertEqual(row['patient_name'], 'Patient5 Otieno')
+        self.assertEqual(row['doctor_name'], 'Greg House')
+        self.assertFalse(row['result_available'])
+        self.assertTrue(response.data['results'][-1]['result_available'])
+
+    def test_result_worklist(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/laboratory/results/worklist/')
+        rows = response.data['results']
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row['test_name'] for row in rows}, {'CBC'})
+        self.assertEqual(
+            sorted(row['verified_by_name'] is None for row in rows),
+            sorted(lab_request.id % 2 == 0 for lab_request in self.requests[:3])
+        )
+
+
+class LabResultIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.tech = Staff.objects.create_user(username='tech', password='pass', role='lab_technician')
+        patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        cls.requests = [
+            LabRequest.objects.create(patient=patient, doctor=cls.doctor, test_name='CBC', status=status)
+            for status in ('requested', 'in_progress', 'sample_collected', 'cancelled', 'in_progress')
+        ]
+        LabResult.objects.create(request=cls.requests[4], test_value='1', performed_by=cls.tech)
+
+    def result_file(self, delimiter=','):
+        ok, progress, collected, cancelled, done = (lab_request.id for lab_request in self.requests)
+        rows = [
+            ['request_id', 'test_value', 'is_abnormal', 'result_date'],
+            [str(ok), '4.5', 'N', '2025-01-02T10:00:00'],
+            [f'LAB-REQ-{progress:03d}', '12.1', 'H', ''],
+            [str(collected), '7', '', ''],
+            [str(collected), '8', '', ''],
+            [str(cancelled), '1', '', ''],
+            [str(done), '1', '', ''],
+            ['999999', '1', '', ''],
+            ['abc', '1', '', ''],
+            [str(ok), '', '', ''],
+            [str(ok), '1', 'maybe', ''],
+        ]
+        return ''.join(delimiter.join(row) + '\n' for row in rows)
+
+    def test_ingest_reports_rejects(self):
+        report = ingest_results(io.StringIO(self.result_file()), self.tech, batch_size=3)
+        self.assertEqual(report.created, 3)
+        self.assertEqual(
+            sorted((reject['line'], reject['reason']) for reject in report.rejects),
+            [(5, 'Lab request already has a result'), (6, 'Lab request is cancelled'),
+             (7, 'Lab request already has a result'), (8, 'Unknown lab request'),
+             (9, 'Invalid request_id'), (10, 'Missing test_value'), (11, "Unknown abnormal flag 'maybe'")]
+        )
+        self.assertEqual(
+            list(LabRequest.objects.order_by('id').values_list('status', flat=True)),
+            ['completed', 'completed', 'completed', 'cancelled', 'in_progress']
+        )
+        result = LabResult.objects.get(request=self.requests[1])
+        self.assertTrue(result.is_abnormal)
+        self.assertEqual(result.performed_by, self.tech)
+        self.assertEqual(
+            LabResult.objects.get(request=self.requests[0]).result_date,
+            timezone.make_aware(datetime(2025, 1, 2, 10))
+        )
+
+    def test_one_lookup_per_batch(self):
+        with CaptureQueriesContext(connection) as queries:
+            ingest_results(io.StringIO(self.result_file('\t')), self.tech, delimiter='tab', batch_size=3)
+        lookups = [query for query in queries if query['sql'].startswith('SELECT') and 'laboratory_labrequest' in query['sql']]
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "laboratory_labresult"')]
+        # Seven parseable rows in batches of three; only the first batch has new results
+        self.assertEqual((len(lookups), len(inserts)), (3, 1))
+
+    def test_rejects_bad_header(self):
+        with self.assertRaises(IngestError):
+            ingest_results(io.StringIO('id,value\n1,2\n'), self.tech)
+
+    def test_upload_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.tech)
+        upload = SimpleUploadedFile('results.csv', ('﻿' + self.result_file()).encode())
+        response = client.post('/api/laboratory/results/ingest/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['rejected']), (3, 7))
+        self.assertFalse(response.data['rejects_truncated'])
+        self.assertEqual(client.post('/api/laboratory/results/ingest/', {}).status_code, 400)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(self.result_file('|'))
+        self.addCleanup(os.remove, handle.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('ingest_lab_results', handle.name, performed_by='tech', delimiter='pipe', stdout=out, stderr=err)
+        self.assertIn('Ingested 3 results, rejected 7', out.getvalue())
+        self.assertIn('Unknown lab request', err.getvalue())
+
+
+class LabCatalogTrendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.tech = Staff.objects.create_user(username='tech', password='pass', role='lab_technician')
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        cls.creatinine = LabTest.objects.create(
+            code='CREA', name='Creatinine', unit='mg/dL', reference_low=0.6, reference_high=1.2
+        )
+
+    def add_result(self, value, when, test_name='creatinine'):
+        lab_request = LabRequest.objects.create(patient=self.patient, doctor=self.doctor, test_name=test_name)
+        return LabResult.objects.create(request=lab_request, test_value=value, performed_by=self.tech, result_date=when)
+
+    def test_numeric_value_and_flag_are_derived(self):
+        now = timezone.now()
+        high = self.add_result('1.9 mg/dL', now)
+        self.assertEqual((high.patient, high.test, high.numeric_value, high.is_abnormal),
+                         (self.patient, self.creatinine, 1.9, True))
+        self.assertFalse(self.add_result('<0.9', now).is_abnormal)
+        # Without a number or a range the entered flag is kept
+        self.assertIsNone(self.add_result('haemolysed', now).numeric_value)
+        free_text = self.add_result('7', now, test_name='Urine MCS')
+        self.assertEqual((free_text.test, free_text.numeric_value, free_text.is_abnormal), (None, 7.0, False))
+
+    def test_new_catalog_entries_link_earlier_orders(self):
+        result = self.add_result('180', timezone.now(), test_name='GLU')
+        glucose = LabTest.objects.create(code='GLU', name='Glucose', unit='mg/dL', reference_high=140)
+        result.refresh_from_db()
+        self.assertEqual((result.test, result.is_abnormal), (glucose, True))
+        self.assertEqual(result.request.test, glucose)
+
+    def test_ingested_results_use_the_catalog(self):
+        lab_request = LabRequest.objects.create(patient=self.patient, doctor=self.doctor, test_name='CREA')
+        ingest_results(io.StringIO(f'request_id,test_value\n{lab_request.id},0.3\n'), self.tech)
+        result = LabResult.objects.get(request=lab_request)
+        self.assertEqual((result.patient, result.numeric_value, result.is_abnormal), (self.patient, 0.3, True))
+
+    def trend(self, params):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        return client.get('/api/laboratory/results/trend/', {'patient_id': self.patient.id, **params})
+
+    def test_short_trend_is_returned_point_by_point(self):
+        start = timezone.now() - timedelta(days=10)
+        for day, value in enumerate(['0.8', '1.0', '1.4']):
+            self.add_result(value, start + timedelta(days=day))
+        with self.assertNumQueries(3):
+            response = self.trend({'test': 'CREA'})
+        self.assertEqual(response.data['resolution'], 'raw')
+        self.assertEqual([point['value'] for point in response.data['points']], [0.8, 1.0, 1.4])
+        self.assertEqual([point['abnormal'] for point in response.data['points']], [0, 0, 1])
+        self.assertEqual(response.data['test']['unit'], 'mg/dL')
+
+    def test_long_trend_is_bucketed_in_the_database(self):
+        start = timezone.make_aware(datetime(2025, 1, 1, 8))
+        for day in range(30):
+            for hour, value in ((0, 1.0), (6, 2.0)):
+                self.add_result(str(value), start + timedelta(days=day, hours=hour))
+        response = self.trend({'test': self.creatinine.id, 'points': 40, 'from': '2025-01-01', 'to': '2025-01-30'})
+        self.assertEqual(response.data['resolution'], 'day')
+        points = response.data['points']
+        self.assertEqual(len(points), 30)
+        self.assertEqual(
+            (points[0]['value'], points[0]['min'], points[0]['max'], points[0]['count'], points[0]['abnormal']),
+            (1.5, 1.0, 2.0, 2, 1)
+        )
+
+    def test_trend_requires_patient_and_known_test(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        self.assertEqual(client.get('/api/laboratory/results/trend/', {'test': 'CREA'}).status_code, 400)
+        self.assertEqual(self.trend({'test': 'Unknown'}).status_code, 404)
+
+
+class LabWorklistClaimTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.benches = [
+            Staff.objects.create_user(username=f'bench{i}', password='pass', role='lab_technician') for i in range(2)
+        ]
+        patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        now = timezone.now()
+        cls.requests = {
+            label: LabRequest.objects.create(
+                patient=patient, doctor=cls.doctor, test_name=test_name, priority=priority,
+                request_date=now - timedelta(minutes=age)
+            )
+            for label, priority, age, test_name in (
+                ('old_routine', 'routine', 90, 'CBC'),
+                ('new_emergency', 'emergency', 5, 'CBC'),
+                ('old_urgent', 'urgent', 60, 'U&E'),
+                ('new_urgent', 'urgent', 10, 'CBC'),
+                ('new_routine', 'routine', 1, 'CBC'),
+            )
+        }
+
+    def client_for(self, staff):
+        client = APIClient()
+        client.force_authenticate(staff)
+        return client
+
+    def test_priority_rank_orders_the_worklist(self):
+        response = self.client_for(self.benches[0]).get('/api/laboratory/requests/worklist/')
+        ids = [row['id'] for row in response.data['results']]
+        expected = ['new_emergency', 'old_urgent', 'new_urgent', 'old_routine', 'new_routine']
+        self.assertEqual(ids, [self.requests[label].id for label in expected])
+
+    def test_benches_claim_disjoint_items_in_priority_order(self):
+        first = self.client_for(self.benches[0]).post('/api/laboratory/requests/claim/', {'count': 2}, format='json')
+        second = self.client_for(self.benches[1]).post(
+            '/api/laboratory/requests/claim/', {'count': 2, 'status': 'sample_collected'}, format='json'
+        )
+        self.assertEqual(
+            [row['id'] for row in first.data['claimed']],
+            [self.requests['new_emergency'].id, self.requests['old_urgent'].id]
+        )
+        self.assertEqual(
+            [row['id'] for row in second.data['claimed']],
+            [self.requests['new_urgent'].id, self.requests['old_routine'].id]
+        )
+        self.assertEqual(second.data['claimed'][0]['status'], 'sample_collected')
+        self.assertEqual(second.data['claimed'][0]['claimed_by'], self.benches[1].id)
+
+        # Claimed rows stay with their bench until released
+        third = self.client_for(self.benches[0]).post('/api/laboratory/requests/claim/', {'count': 5}, format='json')
+        self.assertEqual([row['id'] for row in third.data['claimed']], [self.requests['new_routine'].id])
+        released = self.client_for(self.benches[1]).post('/api/laboratory/requests/release/', {
+            'ids': [self.requests['new_urgent'].id, self.requests['new_emergency'].id],
+        }, format='json')
+        self.assertEqual(released.data['released'], 1)
+        retry = self.client_for(self.benches[0]).post('/api/laboratory/requests/claim/', {}, format='json')
+        self.assertEqual([row['id'] for row in retry.data['claimed']], [self.requests['new_urgent'].id])
+
+    def test_claim_filters_and_validation(self):
+        client = self.client_for(self.benches[0])
+        response = client.post('/api/laboratory/requests/claim/', {'count': 3, 'test_name': 'u&e'}, format='json')
+        self.assertEqual([row['id'] for row in response.data['claimed']], [self.requests['old_urgent'].id])
+        self.assertEqual(client.post('/api/laboratory/requests/claim/', {'count': 0}, format='json').status_code, 400)
+        self.assertEqual(
+            client.post('/api/laboratory/requests/claim/', {'status': 'completed'}, format='json').status_code, 400
+        )
+
+
+class LabTurnaroundTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.tech = Staff.objects.create_user(username='tech', password='pass', role='lab_technician')
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        LabTest.objects.create(code='CBC', name='Full Blood Count')
+
+    def add_result(self, minutes, result_date, test_name='CBC', priority='routine'):
+        lab_request = LabRequest.objects.create(
+            patient=self.patient, doctor=self.doctor, test_name=test_name, priority=priority,
+            request_date=result_date - timedelta(minutes=minutes)
+        )
+        return LabResult.objects.create(
+            request=lab_request, test_value='ok', performed_by=self.tech, result_date=result_date
+        )
+
+    def summary(self, params):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        return client.get('/api/laboratory/results/turnaround/', params)
+
+    def test_saving_a_result_updates_its_rollup(self):
+        day = timezone.make_aware(datetime(2025, 3, 3, 10))
+        self.add_result(30, day)
+        self.add_result(90, day + timedelta(hours=1), test_name='full blood count')
+        self.add_result(15, day, priority='emergency')
+        rollup = LabTurnaroundRollup.objects.get(day=date(2025, 3, 3), test_name='Full Blood Count', priority='routine')
+        self.assertEqual((rollup.count, rollup.total_seconds), (2, 7200))
+        # Editing a result does not count it twice
+        LabResult.objects.filter(request__priority='emergency').get().save()
+        self.assertEqual(LabTurnaroundRollup.objects.get(priority='emergency').count, 1)
+
+    def test_ingested_results_are_rolled_up(self):
+        requested = timezone.now() - timedelta(minutes=45)
+        lab_requests = [
+            LabRequest.objects.create(
+                patient=self.patient, doctor=self.doctor, test_name='U&E', priority='urgent', request_date=requested
+            )
+            for _ in range(3)
+        ]
+        rows = ''.join(f'{lab_request.id},4.1\n' for lab_request in lab_requests)
+        ingest_results(io.StringIO('request_id,test_value\n' + rows), self.tech)
+        [row] = turnaround_summary(test_name='u&e')
+        self.assertEqual((row['priority'], row['count']), ('urgent', 3))
+        self.assertAlmostEqual(row['p50_minutes'], 45, delta=0.5)
+
+    def test_percentiles_merge_across_days(self):
+        rng = random.Random(3)
+        start = timezone.make_aware(datetime(2025, 4, 1, 9))
+        minutes = []
+        for day in range(10):
+            for _ in range(30):
+                minutes.append(rng.uniform(5, 240))
+                self.add_result(minutes[-1], start + timedelta(days=day))
+        self.add_result(600, start + timedelta(days=20))
+
+        with self.assertNumQueries(1):
+            response = self.summary({'from': '2025-04-01', 'to': '2025-04-10', 'group_by': 'test_name'})
+        [row] = response.data['results']
+        self.assertEqual((row['test_name'], row['count']), ('Full Blood Count', 300))
+        self.assertNotIn('priority', row)
+        self.assertAlmostEqual(row['mean_minutes'], sum(minutes) / len(minutes), delta=0.1)
+        minutes.sort()
+        for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            exact = minutes[int(q * (len(minutes) - 1))]
+            self.assertAlmostEqual(row[f'{name}_minutes'] / exact, 1, delta=0.02)
+
+        self.assertAlmostEqual(self.summary({'from': '2025-04-21'}).data['results'][0]['p50_minutes'], 600, delta=6)
+        self.assertEqual(self.summary({'from': 'April'}).status_code, 400)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        start = timezone.make_aware(datetime(2025, 5, 1, 8))
+        for index in range(12):
+            self.add_result(10 + index * 7, start + timedelta(days=index % 3), priority=('routine', 'urgent')[index % 2])
+        incremental = turnaround_summary()
+        LabTurnaroundRollup.objects.update(count=0, total_seconds=0, sketch={})
+        call_command('rebuild_lab_turnaround', batch_size=5, stdout=io.StringIO())
+        self.assertEqual(turnaround_summary(), incremental)
+        self.assertEqual(LabTurnaroundRollup.objects.count(), 6)
+
+    def test_migration_backfills_existing_results(self):
+        start = timezone.make_aware(datetime(2025, 6, 2, 8))
+        for index in range(4):
+            self.add_result(30 + index * 15, start + timedelta(days=index % 2))
+        incremental = turnaround_summary()
+        LabTurnaroundRollup.objects.all().delete()
+        migration = import_module('laboratory.migrations.0008_backfill_turnaround_rollup')
+        migration.backfill_rollups(django_apps, None)
+        self.assertEqual(turnaround_summary(), incremental)
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    def setUp(self):
+        doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        self.benches = [
+            Staff.objects.create_user(username=f'bench{i}', password='pass', role='lab_technician') for i in range(8)
+        ]
+        patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        LabRequest.objects.bulk_create([
+            LabRequest(patient=patient, doctor=doctor, test_name='CBC') for _ in range(40)
+        ])
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_no_request_is_claimed_twice(self):
+        claims = []
+        barrier = threading.Barrier(len(self.benches))
+
+        def pull(bench):
+            barrier.wait()
+            try:
+                for _ in range(3):
+                    claims.extend((bench.id, pk) for pk in claim_next(bench, 2))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=pull, args=(bench,)) for bench in self.benches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        claimed_ids = [pk for _, pk in claims]
+        self.assertEqual(len(claimed_ids), len(set(claimed_ids)))
+        self.assertEqual(
+            sorted(claims), sorted(LabRequest.objects.exclude(claimed_by=None).values_list('claimed_by', 'id'))
+        )
@@ -0,0 +1,62 @@
+"""
+Per-patient trends of numeric lab results for charting.
+
+Series are read through ``lab_result_trend_idx`` (patient, test,
+result_date). Short series are returned point by point; longer ones are
+downsampled in the database by grouping on the coarsest-needed calendar
+bucket (hour, day, week, month, year) with AVG/MIN/MAX, so no rows are
+walked in Python.
+"""
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+from .models import LabResult
+
+TREND_DEFAULT_POINTS = 200
+TREND_MAX_POINTS = 1000
+RESOLUTIONS = (
+    ('hour', TruncHour, timedelta(hours=1)),
+    ('day', TruncDay, timedelta(days=1)),
+    ('week', TruncWeek, timedelta(weeks=1)),
+    ('month', TruncMonth, timedelta(days=31)),
+    ('year', TruncYear, timedelta(days=366)),
+)
+
+
+def pick_resolution(span, points):
+    """The finest bucket that keeps ``span`` within ``points`` buckets."""
+    for resolution in RESOLUTIONS:
+        if span / resolution[2] + 1 <= points:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def trend_series(patient_id, test, start=None, end=None, points=TREND_DEFAULT_POINTS):
+    """Return ``(resolution, rows)`` for the patient's numeric results of ``test``."""
+    results = LabResult.objects.filter(patient_id=patient_id, test=test, numeric_value__isnull=False)
+    if start:
+        results = results.filter(result_date__gte=start)
+    if end:
+        results = results.filter(result_date__lt=end)
+
+    stats = results.aggregate(count=Count('id'), first=Min('result_date'), last=Max('result_date'))
+    if stats['count'] <= points:
+        rows = results.order_by('result_date').values_list('result_date', 'numeric_value', 'is_abnormal')
+        return 'raw', [
+            {'date': timezone.localtime(moment), 'value': value, 'min': value, 'max': value,
+             'count': 1, 'abnormal': int(abnormal)}
+            for moment, value, abnormal in rows
+        ]
+
+    name, trunc, _ = pick_resolution(stats['last'] - stats['first'], points)
+    rows = results.annotate(bucket=trunc('result_date')).values('bucket').annotate(
+        value=Avg('numeric_value'), low=Min('numeric_value'), high=Max('numeric_value'),
+        total=Count('id'), abnormal=Count('id', filter=Q(is_abnormal=True)),
+    ).order_by('bucket')
+    return name, [
+        {'date': timezone.localtime(row['bucket']), 'value': row['value'], 'min': row['low'],
+         'max': row['high'], 'count': row['total'], 'abnormal': row['abnormal']}
+        for row in rows
+    ]
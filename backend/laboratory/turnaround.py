@@ -0,0 +1,114 @@
+"""
+Lab turnaround time (request → result) rollups.
+
+Each new result adds its turnaround to the ``LabTurnaroundRollup`` row for
+its result day, test and priority: a count, a sum and a quantile sketch.
+Percentiles over any date range are answered by merging those rows, so
+reports never scan raw results. Tests linked to the catalog are rolled up
+under their catalog name, so "crea" and "Creatinine" orders land together.
+
+Edits to an existing result's date and deleted results are not
+subtracted; ``rebuild_lab_turnaround`` recomputes everything from the raw
+rows, as migration 0008 does once for results saved before the rollups
+existed.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from carepoint.quantiles import QuantileSketch
+from .models import LabTurnaroundRollup
+
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+GROUP_FIELDS = ('test_name', 'priority')
+
+
+def turnaround_sample(request_date, result_date, test_name, priority):
+    """``((day, test_name, priority), seconds)`` for one result."""
+    seconds = max((result_date - request_date).total_seconds(), 0)
+    return (timezone.localdate(result_date), test_name, priority), seconds
+
+
+def sample_for(result, lab_request):
+    test_name = lab_request.test.name if lab_request.test_id else lab_request.test_name
+    return turnaround_sample(lab_request.request_date, result.result_date, test_name, lab_request.priority)
+
+
+def record_turnarounds(samples, rollup_model=LabTurnaroundRollup):
+    """Add ``(key, seconds)`` samples to their rollup rows, one locked read-modify-write per key."""
+    grouped = defaultdict(list)
+    for key, seconds in samples:
+        grouped[key].append(seconds)
+
+    with transaction.atomic():
+        # Sorted keys give concurrent writers the same lock order
+        for (day, test_name, priority), values in sorted(grouped.items()):
+            rollup, _ = rollup_model.objects.select_for_update().get_or_create(
+                day=day, test_name=test_name, priority=priority
+            )
+            sketch = QuantileSketch.from_dict(rollup.sketch)
+            for seconds in values:
+                sketch.add(seconds)
+            rollup.count += len(values)
+            rollup.total_seconds += sum(values)
+            rollup.sketch = sketch.to_dict()
+            rollup.save()
+
+
+def rebuild_turnarounds(results, rollup_model=LabTurnaroundRollup, batch_size=2000):
+    """
+    Replace every rollup with one recomputed from the ``results`` queryset.
+
+    Returns the number of results recorded. ``rollup_model`` lets data
+    migrations pass their historical model.
+    """
+    rows = results.values_list(
+        'result_date', 'request__request_date', 'request__test__name', 'request__test_name', 'request__priority'
+    ).order_by()
+
+    recorded = 0
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        batch = []
+        for result_date, request_date, catalog_name, test_name, priority in rows.iterator(chunk_size=batch_size):
+            batch.append(turnaround_sample(request_date, result_date, catalog_name or test_name, priority))
+            if len(batch) >= batch_size:
+                record_turnarounds(batch, rollup_model)
+                recorded += len(batch)
+                batch = []
+        if batch:
+            record_turnarounds(batch, rollup_model)
+            recorded += len(batch)
+    return recorded
+
+
+def turnaround_summary(start=None, end=None, test_name=None, priority=None, group_by=GROUP_FIELDS):
+    """Merge the rollups for ``[start, end)`` (dates) into per-group count, mean and percentiles, in minutes."""
+    rollups = LabTurnaroundRollup.objects.all()
+    if start:
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        rollups = rollups.filter(day__lt=end)
+    if test_name:
+        rollups = rollups.filter(test_name__iexact=test_name)
+    if priority:
+        rollups = rollups.filter(priority=priority)
+
+    groups = {}
+    for rollup in rollups.only('test_name', 'priority', 'count', 'total_seconds', 'sketch').iterator():
+        key = tuple(getattr(rollup, field) for field in group_by)
+        group = groups.setdefault(key, {'count': 0, 'total': 0.0, 'sketch': QuantileSketch()})
+        group['count'] += rollup.count
+        group['total'] += rollup.total_seconds
+        group['sketch'].merge(QuantileSketch.from_dict(rollup.sketch))
+
+    summary = []
+    for key, group in sorted(groups.items()):
+        row = dict(zip(group_by, key))
+        row['count'] = group['count']
+        row['mean_minutes'] = round(group['total'] / group['count'] / 60, 1) if group['count'] else None
+        for name, q in QUANTILES.items():
+            value = group['sketch'].quantile(q)
+            row[f'{name}_minutes'] = round(value / 60, 1) if value is not None else None
+        summary.append(row)
+    return summary
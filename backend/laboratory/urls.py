@@ -1,10 +1,11 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import LabRequestViewSet, LabResultViewSet
+from .views import LabRequestViewSet, LabResultViewSet, LabTestViewSet
 
 router = DefaultRouter()
 router.register('requests', LabRequestViewSet)
 router.register('results', LabResultViewSet)
+router.register('tests', LabTestViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,13 +1,47 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import LabRequest, LabResult
-from .serializers import LabRequestSerializer, LabResultSerializer
+from django.db.models import Exists, OuterRef
+from carepoint.conditional import ConditionalGetMixin
+from carepoint.expansion import ExpansionQuerysetMixin
+from carepoint.feeds import parse_window_bound
+from carepoint.filters import DateRangeFilter
+from carepoint.transitions import bulk_transition, parse_ids
+from userauth.authentication import get_request_doctor
+from .ingest import IngestError, ingest_results
+from .models import LabRequest, LabResult, LabTest
+from .serializers import (
+    LabRequestSerializer, LabRequestWorklistSerializer, LabResultSerializer, LabResultWorklistSerializer,
+    LabTestSerializer,
+)
+from .trends import TREND_DEFAULT_POINTS, TREND_MAX_POINTS, trend_series
+from .turnaround import GROUP_FIELDS, turnaround_summary
+from .worklist import WORKLIST_ORDER, claim_next, release
 
-class LabRequestViewSet(viewsets.ModelViewSet):
+
+def with_result_available(queryset):
+    return queryset.annotate(result_available=Exists(LabResult.objects.filter(request=OuterRef('pk'))))
+
+class LabTestViewSet(viewsets.ModelViewSet):
+    queryset = LabTest.objects.order_by('name')
+    serializer_class = LabTestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+class LabRequestViewSet(ConditionalGetMixin, ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = LabRequest.objects.all()
     serializer_class = LabRequestSerializer
+    last_modified_field = 'updated_date'
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DateRangeFilter]
+    date_range_field = 'request_date'
+    expand_select_related = {
+        'patient_details': ['patient'],
+        'doctor_details': ['doctor'],
+    }
+    expand_prefetch_related = {
+        'patient_details.medical_records': ['patient__medicalrecord_set__recorded_by'],
+        'doctor_details.schedules': ['doctor__staffschedule_set'],
+    }
 
     def get_queryset(self):
         queryset = LabRequest.objects.all()
@@ -22,38 +56,26 @@ class LabRequestViewSet(viewsets.ModelViewSet):
         if doctor_id:
             queryset = queryset.filter(doctor_id=doctor_id)
 
-        return queryset.order_by('-request_date')
+        return self.expand_queryset(queryset.order_by('-request_date'))
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def doctor_requests(self, request):
-        from userauth.models import Staff
-        
         # Get doctor from token or use first doctor for testing
-        try:
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                import jwt
-                from django.conf import settings
-                
-                token = auth_header.split(' ')[1]
-                decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-                user_id = decoded_token.get('user_id')
-                doctor = Staff.objects.get(id=user_id, role='doctor')
-            else:
-                doctor = Staff.objects.filter(role='doctor').first()
-        except:
-            doctor = Staff.objects.filter(role='doctor').first()
+        doctor = get_request_doctor(request)
         
         if not doctor:
             return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        lab_requests = LabRequest.objects.filter(doctor=doctor).order_by('-request_date')
+        # One query: patient and appointment joined, result existence annotated
+        lab_requests = with_result_available(
+            LabRequest.objects.filter(doctor=doctor).select_related('patient', 'appointment').only(
+                'id', 'test_name', 'request_date', 'status',
+                'patient__first_name', 'patient__last_name', 'appointment__reason_for_visit',
+            )
+        ).order_by('-request_date')
         
         request_data = []
         for req in lab_requests:
-            # Check if result exists
-            result_available = hasattr(req, 'labresult')
-            
             request_data.append({
                 'id': f'LAB-REQ-{req.id:03d}',
                 'patientName': f'{req.patient.first_name} {req.patient.last_name}',
@@ -61,30 +83,49 @@ class LabRequestViewSet(viewsets.ModelViewSet):
                 'requestDate': req.request_date.date(),
                 'status': req.status,
                 'reason': req.appointment.reason_for_visit if req.appointment else 'General request',
-                'resultAvailable': result_available
+                'resultAvailable': req.result_available
             })
         
         return Response({'results': request_data})
 
+    @action(detail=False, methods=['get'])
+    def worklist(self, request):
+        # Same filters as the list, most urgent first, rendered flat: one page query plus the count
+        queryset = with_result_available(
+            self.filter_queryset(self.get_queryset()).select_related('patient', 'doctor', 'claimed_by')
+        ).order_by(*WORKLIST_ORDER)
+        page = self.paginate_queryset(queryset)
+        serializer = LabRequestWorklistSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            return Response({'error': 'count must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = claim_next(
+            request.user, count, target=request.data.get('status', 'in_progress'),
+            test_name=request.data.get('test_name'),
+        )
+        claimed = with_result_available(
+            LabRequest.objects.filter(id__in=ids).select_related('patient', 'doctor', 'claimed_by')
+        ).order_by(*WORKLIST_ORDER)
+        return Response({'claimed': LabRequestWorklistSerializer(claimed, many=True).data})
+
+    @action(detail=False, methods=['post'])
+    def release(self, request):
+        ids = parse_ids(request.data.get('ids'))
+        return Response({'released': release(request.user, ids)})
+
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def create_request(self, request):
-        from userauth.models import Staff
         from patients.models import Patient
         
+        # A token that is not a doctor's is refused here, not recorded under another doctor
+        doctor = get_request_doctor(request)
+        
         try:
-            # Get doctor
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                import jwt
-                from django.conf import settings
-                
-                token = auth_header.split(' ')[1]
-                decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-                user_id = decoded_token.get('user_id')
-                doctor = Staff.objects.get(id=user_id, role='doctor')
-            else:
-                doctor = Staff.objects.filter(role='doctor').first()
-            
             # Get patient
             patient_id = request.data.get('patient_id')
             patient = Patient.objects.get(id=patient_id)
@@ -119,10 +160,32 @@ class LabRequestViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-class LabResultViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        ids = parse_ids(request.data.get('ids'))
+        new_status = request.data.get('status')
+        updated, results = bulk_transition(LabRequest.objects.all(), ids, new_status)
+        return Response({'status': new_status, 'updated': updated, 'results': results})
+
+class LabResultViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = LabResult.objects.all()
     serializer_class = LabResultSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DateRangeFilter]
+    date_range_field = 'result_date'
+    expand_select_related = {
+        'request_details': ['request'],
+        'request_details.patient_details': ['request__patient'],
+        'request_details.doctor_details': ['request__doctor'],
+        'performed_by_details': ['performed_by'],
+        'verified_by_details': ['verified_by'],
+    }
+    expand_prefetch_related = {
+        'request_details.patient_details.medical_records': ['request__patient__medicalrecord_set__recorded_by'],
+        'request_details.doctor_details.schedules': ['request__doctor__staffschedule_set'],
+        'performed_by_details.schedules': ['performed_by__staffschedule_set'],
+        'verified_by_details.schedules': ['verified_by__staffschedule_set'],
+    }
 
     def get_queryset(self):
         queryset = LabResult.objects.all()
@@ -133,11 +196,89 @@ class LabResultViewSet(viewsets.ModelViewSet):
         if request_id:
             queryset = queryset.filter(request_id=request_id)
         if patient_id:
-            queryset = queryset.filter(request__patient_id=patient_id)
+            queryset = queryset.filter(patient_id=patient_id)
         if is_abnormal is not None:
             queryset = queryset.filter(is_abnormal=is_abnormal)
 
-        return queryset.order_by('-result_date')
+        return self.expand_queryset(queryset.order_by('-result_date'))
+
+    @action(detail=False, methods=['get'])
+    def worklist(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).select_related(
+            'request__patient', 'performed_by', 'verified_by'
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = LabResultWorklistSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def ingest(self, request):
+        import io
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a result file as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Read the upload line by line; large files stay on disk as temporary files
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            report = ingest_results(lines, request.user, delimiter=request.data.get('delimiter', ','))
+        except (IngestError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict())
+
+    @action(detail=False, methods=['get'])
+    def trend(self, request):
+        patient_id = request.query_params.get('patient_id', None)
+        test_param = request.query_params.get('test', None)
+        if not patient_id or not test_param:
+            return Response({'error': 'patient_id and test are required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        test = LabTest.objects.filter(id=test_param).first() if test_param.isdigit() else LabTest.match(test_param)
+        if not test:
+            return Response({'error': 'Test not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            points = min(int(request.query_params.get('points', TREND_DEFAULT_POINTS)), TREND_MAX_POINTS)
+        except ValueError:
+            return Response({'error': 'points must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        start = request.query_params.get('from', None)
+        end = request.query_params.get('to', None)
+        start = parse_window_bound(start, 'from') if start else None
+        end = parse_window_bound(end, 'to', end=True) if end else None
+        
+        resolution, series = trend_series(patient_id, test, start, end, max(points, 2))
+        return Response({
+            'test': LabTestSerializer(test).data,
+            'resolution': resolution,
+            'points': series,
+        })
+
+    @action(detail=False, methods=['get'])
+    def turnaround(self, request):
+        from datetime import timedelta
+        from django.utils.dateparse import parse_date
+        
+        bounds = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param, None)
+            try:
+                bounds[param] = parse_date(value) if value else None
+            except ValueError:
+                bounds[param] = None
+            if value and bounds[param] is None:
+                return Response({'error': f'Use YYYY-MM-DD for {param}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        group_by = request.query_params.get('group_by', ','.join(GROUP_FIELDS))
+        group_by = tuple(field for field in GROUP_FIELDS if field in group_by.split(','))
+        summary = turnaround_summary(
+            start=bounds['from'],
+            end=bounds['to'] + timedelta(days=1) if bounds['to'] else None,
+            test_name=request.query_params.get('test_name', None),
+            priority=request.query_params.get('priority', None),
+            group_by=group_by,
+        )
+        return Response({'group_by': group_by, 'results': summary})
 
     @action(detail=True, methods=['post'])
     def verify(self, request, pk=None):
@@ -0,0 +1,70 @@
+"""
+Shared lab worklist: priority ordering and concurrent claiming.
+
+Open requests are worked emergency → urgent → routine, oldest first,
+read straight off ``lab_req_worklist_idx`` (status, priority_rank,
+request_date). Benches claim the next N unclaimed requests with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent claims pass over
+each other's rows instead of queueing on them. Backends without SKIP
+LOCKED (SQLite) pick candidates without locks and claim them with a
+guarded ``UPDATE ... WHERE claimed_by IS NULL``; a row lost to another
+bench is replaced in the next round.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import LabRequest
+
+WORKLIST_ORDER = ('priority_rank', 'request_date', 'id')
+MAX_CLAIM = 50
+CLAIM_ROUNDS = 3
+# Claim target -> statuses a request can be claimed from
+CLAIM_SOURCES = {
+    'sample_collected': ('requested',),
+    'in_progress': ('requested', 'sample_collected', 'in_progress'),
+}
+
+
+def open_requests(statuses):
+    return LabRequest.objects.filter(status__in=statuses, claimed_by__isnull=True).order_by(*WORKLIST_ORDER)
+
+
+def claim_next(technician, count=1, target='in_progress', test_name=None):
+    """Claim up to ``count`` of the most urgent unclaimed requests; returns their ids in worklist order."""
+    sources = CLAIM_SOURCES.get(target)
+    if sources is None:
+        raise ValidationError({'status': f'Claims move requests to one of {", ".join(CLAIM_SOURCES)}.'})
+    if not 1 <= count <= MAX_CLAIM:
+        raise ValidationError({'count': f'Claim between 1 and {MAX_CLAIM} requests.'})
+
+    candidates = open_requests(sources)
+    if test_name:
+        candidates = candidates.filter(test_name__iexact=test_name)
+
+    now = timezone.now()
+    changes = {'status': target, 'claimed_by': technician, 'claimed_at': now, 'updated_date': now}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(candidates.select_for_update(skip_locked=True).values_list('id', flat=True)[:count])
+            LabRequest.objects.filter(id__in=ids).update(**changes)
+        return ids
+
+    claimed = []
+    for _ in range(CLAIM_ROUNDS):
+        ids = list(candidates.exclude(id__in=claimed).values_list('id', flat=True)[:count - len(claimed)])
+        if not ids:
+            break
+        LabRequest.objects.filter(id__in=ids, status__in=sources, claimed_by__isnull=True).update(**changes)
+        claimed += LabRequest.objects.filter(id__in=ids, claimed_by=technician, claimed_at=now).values_list(
+            'id', flat=True
+        )
+        if len(claimed) >= count:
+            break
+    return list(LabRequest.objects.filter(id__in=claimed).order_by(*WORKLIST_ORDER).values_list('id', flat=True))
+
+
+def release(technician, ids):
+    """Hand the technician's unfinished claims back to the pool, where they keep their status."""
+    return LabRequest.objects.filter(
+        id__in=ids, claimed_by=technician, status__in=('sample_collected', 'in_progress', 'requested')
+    ).update(claimed_by=None, claimed_at=None, updated_date=timezone.now())
@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from patients.models import Patient, PatientSearchToken
+from patients.search import patient_tokens, search_patients
+
+FIRST_NAMES = ['james', 'mary', 'john', 'grace', 'peter', 'faith', 'david', 'mercy', 'brian', 'joy',
+               'kevin', 'ann', 'dennis', 'esther', 'victor', 'lucy', 'samuel', 'ruth', 'paul', 'irene']
+LAST_NAMES = ['otieno', 'kamau', 'wanjiru', 'mwangi', 'njoroge', 'achieng', 'kiptoo', 'mutua',
+              'odhiambo', 'wambui', 'chebet', 'kariuki', 'omondi', 'nyambura', 'kibet', 'muthoni']
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic patients and time patient search queries (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            self.seed(rng, options['patients'], options['batch_size'])
+            samples = [self.sample_query(rng) for _ in range(options['queries'])]
+
+            timings = []
+            for query in samples:
+                start = time.perf_counter()
+                search_patients(query)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            timings.sort()
+            self.stdout.write(
+                f"{len(timings)} queries over {options['patients']} patients: "
+                f"p50={statistics.median(timings):.2f}ms "
+                f"p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms "
+                f"max={timings[-1]:.2f}ms"
+            )
+            transaction.set_rollback(True)
+
+    def seed(self, rng, count, batch_size):
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            patients = Patient.objects.bulk_create([
+                Patient(
+                    first_name=rng.choice(FIRST_NAMES).title(),
+                    last_name=f'{rng.choice(LAST_NAMES).title()}{rng.randrange(1000)}',
+                    date_of_birth=date(1950 + rng.randrange(70), 1 + rng.randrange(12), 1 + rng.randrange(28)),
+                    gender=rng.choice('MF'),
+                    contact_email=f'bench{created + i}@example.com',
+                    contact_phone=f'07{rng.randrange(10 ** 8):08d}',
+                    address='Nairobi',
+                ) for i in range(size)
+            ])
+            PatientSearchToken.objects.bulk_create(
+                PatientSearchToken(patient=patient, token=token)
+                for patient in patients for token in patient_tokens(patient)
+            )
+            created += size
+
+    def sample_query(self, rng):
+        kind = rng.randrange(3)
+        if kind == 0:
+            return f'{rng.choice(FIRST_NAMES)[:3]} {rng.choice(LAST_NAMES)[:4]}'
+        if kind == 1:
+            return f'{rng.choice(LAST_NAMES)}{rng.randrange(1000)}'
+        return f'07{rng.randrange(10 ** 4):04d}'
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from patients.models import Patient, PatientSearchToken
+from patients.search import patient_tokens
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the patient search token index from existing patients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        patients = Patient.objects.only('id', 'first_name', 'last_name', 'contact_email', 'contact_phone')
+
+        created = 0
+        with transaction.atomic():
+            PatientSearchToken.objects.all().delete()
+            batch = []
+            for patient in patients.iterator(chunk_size=batch_size):
+                batch.extend(PatientSearchToken(patient=patient, token=token) for token in patient_tokens(patient))
+                if len(batch) >= batch_size:
+                    PatientSearchToken.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                PatientSearchToken.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {created} patient search tokens'))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patientsearchtoken',
+            index=models.Index(fields=['patient', 'token'], name='patient_search_patient_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from datetime import date
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
@@ -28,6 +29,15 @@ class Patient(models.Model):
     def check_password(self, raw_password):
         return check_password(raw_password, self.password)
 
+    @property
+    def age(self):
+        today = date.today()
+        born = self.date_of_birth
+        return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+    def get_full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
@@ -46,5 +56,26 @@ class MedicalRecord(models.Model):
     description = models.TextField()
     recorded_by = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'record_date'], name='record_patient_date_idx'),
+            models.Index(fields=['patient', 'record_type', 'record_date'], name='record_patient_type_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.patient} - {self.record_type} - {self.record_date.date()}"
+
+class PatientSearchToken(models.Model):
+    """Normalized name, email and phone tokens used for prefix search of patients."""
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=254)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'patient'], name='patient_search_token_idx'),
+            # Checks the other terms of a multi-term search for one patient
+            models.Index(fields=['patient', 'token'], name='patient_search_patient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.patient_id} - {self.token}"
@@ -0,0 +1,121 @@
+import re
+import unicodedata
+
+from django.db.models import Exists, OuterRef, Q
+
+from .models import PatientSearchToken
+
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+MIN_TERM_LENGTH = 2
+MAX_TERMS = 4
+# Multi-term searches check at most this many driver-token rows, so a rare
+# combination of terms costs the same as a common one
+MAX_SCAN_ROWS = 2000
+# Phones are also indexed by their national number, with and without the trunk 0,
+# so local and international formats both match
+NATIONAL_NUMBER_DIGITS = 9
+# Upper bound for a prefix range scan: token >= term AND token < term + TOKEN_END
+TOKEN_END = '\uffff'
+
+PHONE_QUERY = re.compile(r'[\d\s+()\-.]+')
+
+
+def normalize_text(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in value if not unicodedata.combining(c)).lower().strip()
+
+
+def digits_only(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def split_words(value):
+    return [word for word in re.split(r'[^0-9a-z]+', normalize_text(value)) if word]
+
+
+def patient_tokens(patient):
+    tokens = set(split_words(f'{patient.first_name} {patient.last_name}'))
+    email = normalize_text(patient.contact_email)
+    if email:
+        tokens.add(email)
+    phone = digits_only(patient.contact_phone)
+    if phone:
+        tokens.add(phone)
+        if len(phone) >= NATIONAL_NUMBER_DIGITS:
+            national = phone[-NATIONAL_NUMBER_DIGITS:]
+            tokens.update((national, f'0{national}'))
+    return tokens
+
+
+def index_patient(patient):
+    PatientSearchToken.objects.filter(patient=patient).delete()
+    PatientSearchToken.objects.bulk_create(
+        PatientSearchToken(patient=patient, token=token) for token in patient_tokens(patient)
+    )
+
+
+def query_terms(query):
+    query = normalize_text(query)
+    if PHONE_QUERY.fullmatch(query or ' ') and digits_only(query):
+        terms = [digits_only(query)]
+    else:
+        terms = []
+        for word in query.split():
+            for term in ([word] if '@' in word else split_words(word)):
+                if term not in terms:
+                    terms.append(term)
+    return [term for term in terms if len(term) >= MIN_TERM_LENGTH][:MAX_TERMS]
+
+
+def has_token_prefix(term):
+    return Exists(PatientSearchToken.objects.filter(
+        patient_id=OuterRef('patient_id'), token__gte=term, token__lt=term + TOKEN_END
+    ))
+
+
+def search_patients(query, limit=SEARCH_LIMIT):
+    """
+    Return up to ``limit`` patient ids whose tokens start with every term of ``query``.
+
+    The longest term drives an ordered range scan of the (token, patient) index,
+    so exact and closest token matches come first and the scan stops as soon as
+    ``limit`` patients are found. The other terms are checked in the same query
+    with ``EXISTS`` probes of the (patient, token) index, over at most the first
+    ``MAX_SCAN_ROWS`` driver rows; matches beyond that window are not returned.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    driver = max(terms, key=len)
+    others = [term for term in terms if term != driver]
+    order = ('token', 'patient_id')
+    scans = [PatientSearchToken.objects.filter(token__gte=driver, token__lt=driver + TOKEN_END).order_by(*order)]
+
+    if others:
+        edge = list(scans[0].values_list(*order)[MAX_SCAN_ROWS - 1:MAX_SCAN_ROWS])
+        if edge:
+            # Two ordered index ranges ending at the window edge, so a token shared
+            # by many patients is cut off too and each query can stop at the limit
+            edge_token, edge_patient = edge[0]
+            scans = [
+                PatientSearchToken.objects.filter(token__gte=driver, token__lt=edge_token).order_by(*order),
+                PatientSearchToken.objects.filter(token=edge_token, patient_id__lte=edge_patient).order_by(*order),
+            ]
+        scans = [scan.filter(*(has_token_prefix(term) for term in others)) for scan in scans]
+
+    found = []
+    for scan in scans:
+        offset = 0
+        while len(found) < limit:
+            # A patient can hold more than one token under the driver prefix, so a
+            # page can hold repeats; the next page is only read when that happens
+            page = list(scan.values_list('patient_id', flat=True)[offset:offset + limit])
+            found.extend(patient_id for patient_id in dict.fromkeys(page) if patient_id not in found)
+            if len(page) < limit:
+                break
+            offset += limit
+        if len(found) >= limit:
+            break
+    return found[:limit]
@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from carepoint.expansion import ExpandableFieldsMixin
 from .models import Patient, MedicalRecord
 
-class MedicalRecordSerializer(serializers.ModelSerializer):
+class MedicalRecordSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     patient = serializers.SerializerMethodField()
     recorded_by = serializers.SerializerMethodField()
     
@@ -27,10 +28,11 @@ class MedicalRecordSerializer(serializers.ModelSerializer):
             }
         return None
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     medical_records = MedicalRecordSerializer(many=True, read_only=True, source='medicalrecord_set')
     age = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True, required=False)
+    expandable_fields = ('medical_records',)
 
     class Meta:
         model = Patient
@@ -48,7 +50,4 @@ class PatientSerializer(serializers.ModelSerializer):
         return patient
 
     def get_age(self, obj):
-        from datetime import date
-        today = date.today()
-        born = obj.date_of_birth
-        return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
\ No newline at end of file
+        return obj.age
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Patient
+from .search import index_patient
+
+SEARCH_FIELDS = {'first_name', 'last_name', 'contact_email', 'contact_phone'}
+
+
+@receiver(post_save, sender=Patient)
+def reindex_patient(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    index_patient(instance)
@@ -1,3 +1,234 @@
+from datetime import date, timedelta
+from unittest import mock
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from appointments.models import Appointment, Consultation
+from billing.models import Bill, BillDetail, ServicePrice
+from pharmacy.models import Inventory, Prescription, PrescriptionDetail
+from userauth.models import Staff
+from .models import Patient, MedicalRecord, PatientSearchToken
+from .search import search_patients
 
-# Create your tests here.
+
+class MedicalRecordTimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.doctor = Staff.objects.create_user(
+            username='doc', password='pass', first_name='Gregory', last_name='House', role='doctor'
+        )
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        cls.other = Patient.objects.create(
+            first_name='Ben', last_name='Kamau', date_of_birth=date(1985, 1, 1), gender='M',
+            contact_email='ben@example.com', contact_phone='0722345678', address='Mombasa'
+        )
+        for days in range(3):
+            MedicalRecord.objects.create(
+                patient=cls.patient, record_type='diagnosis', description=f'Diagnosis {days}',
+                record_date=now - timedelta(days=days * 3), recorded_by=cls.doctor
+            )
+        MedicalRecord.objects.create(
+            patient=cls.other, record_type='diagnosis', description='Other patient',
+            record_date=now, recorded_by=None
+        )
+        appointment = Appointment.objects.create(
+            patient=cls.patient, doctor=cls.doctor, appointment_type='consultation',
+            appointment_datetime=now - timedelta(days=1), reason_for_visit='Cough'
+        )
+        consultation = Consultation.objects.create(
+            appointment=appointment, patient=cls.patient, doctor=cls.doctor,
+            chief_complaint='Cough', diagnosis='Flu', notes='',
+            consultation_datetime=now - timedelta(days=1)
+        )
+        medication = Inventory.objects.create(
+            item_name='Paracetamol', category='medicine', quantity_in_stock=100,
+            unit_price=5, reorder_level=10
+        )
+        prescription = Prescription.objects.create(
+            consultation=consultation, patient=cls.patient, doctor=cls.doctor,
+            prescribed_date=now - timedelta(days=2)
+        )
+        PrescriptionDetail.objects.create(
+            prescription=prescription, medication=medication, dosage='500mg',
+            frequency='TDS', duration='5 days', quantity=15
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_merges_sources_newest_first(self):
+        response = self.client.get('/api/patients/medical-records/', {'patient_id': self.patient.id})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(
+            [entry['source'] for entry in results],
+            ['medical_record', 'consultation', 'prescription', 'medical_record', 'medical_record']
+        )
+        self.assertEqual(results[1]['description'], 'Consultation: Cough. Diagnosis: Flu')
+        self.assertEqual(results[2]['description'], 'Prescription: Paracetamol - 500mg TDS')
+        self.assertEqual(results[0]['recorded_by']['last_name'], 'House')
+        self.assertIsNone(response.data['next'])
+
+    def test_record_type_filter_applies_to_every_source(self):
+        response = self.client.get('/api/patients/medical-records/', {'record_type': 'consultation'})
+        self.assertEqual([entry['source'] for entry in response.data['results']], ['consultation'])
+
+    def test_keyset_pagination_walks_whole_timeline(self):
+        seen = []
+        url = '/api/patients/medical-records/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(entry['id'] for entry in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_page_runs_constant_queries(self):
+        # One UNION query plus one for the prescription lines on the page
+        with self.assertNumQueries(2):
+            self.client.get('/api/patients/medical-records/')
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/patients/medical-records/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class PatientPortalQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.doctor = Staff.objects.create_user(
+            username='doc', password='pass', first_name='Gregory', last_name='House',
+            role='doctor', specialization='Diagnostics'
+        )
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+        cls.service = ServicePrice.objects.create(service_name='Consultation fee', price=50)
+        cls.medication = Inventory.objects.create(
+            item_name='Amoxicillin', category='medicine', quantity_in_stock=100,
+            unit_price=5, reorder_level=10
+        )
+
+    def setUp(self):
+        cache.clear()
+        refresh = RefreshToken()
+        refresh['user_id'] = self.patient.id
+        refresh['user_type'] = 'patient'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def add_history(self, visits):
+        now = timezone.now()
+        # Each batch books a different hour so the doctor's slots never collide
+        hour = timedelta(hours=Appointment.objects.count())
+        for i in range(visits):
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, appointment_type='consultation',
+                appointment_datetime=now - timedelta(days=i) - hour, reason_for_visit='Review'
+            )
+            MedicalRecord.objects.create(
+                patient=self.patient, record_type='prescription', description='Amoxicillin - 250mg',
+                record_date=now - timedelta(days=i), recorded_by=self.doctor
+            )
+            bill = Bill.objects.create(
+                patient=self.patient, total_amount=60, patient_responsibility=60,
+                due_date=date.today()
+            )
+            BillDetail.objects.create(bill=bill, service=self.service, unit_price=50, total=50)
+            BillDetail.objects.create(bill=bill, item=self.medication, unit_price=10, total=10)
+
+    def assertConstantQueries(self, url, expected):
+        # Warm the principal cache so only the action's own queries are counted
+        self.client.get(url)
+        for visits in (1, 5):
+            self.add_history(visits)
+            with self.assertNumQueries(expected):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_my_appointments(self):
+        response = self.assertConstantQueries('/api/patients/patients/my_appointments/', 1)
+        self.assertEqual(response.data['results'][0]['specialty'], 'Diagnostics')
+
+    def test_my_records(self):
+        response = self.assertConstantQueries('/api/patients/patients/my_records/?page_size=50', 2)
+        self.assertEqual(len(response.data['results']), 12)
+
+    def test_my_records_merges_pages_newest_first(self):
+        self.add_history(7)
+        ids, dates = [], []
+        url = '/api/patients/patients/my_records/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            ids.extend(row['id'] for row in response.data['results'])
+            dates.extend(row['date'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(ids), 14)
+        self.assertEqual(len(set(ids)), 14)
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_my_prescriptions(self):
+        response = self.assertConstantQueries('/api/patients/patients/my_prescriptions/', 1)
+        self.assertEqual(response.data['results'][0]['medication'], 'Amoxicillin')
+
+    def test_my_billing(self):
+        response = self.assertConstantQueries('/api/patients/patients/my_billing/', 2)
+        self.assertEqual(response.data['results'][0]['items'], ['Consultation fee', 'Amoxicillin'])
+
+
+class PatientSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def register(first_name, last_name, email, phone):
+            return Patient.objects.create(
+                first_name=first_name, last_name=last_name, date_of_birth=date(1990, 1, 1), gender='F',
+                contact_email=email, contact_phone=phone, address='Nairobi'
+            )
+        cls.ann = register('Ann', 'Otieno', 'ann@example.com', '+254 712 345 678')
+        cls.anne = register('Anne-Marie', 'Kamau', 'amk@example.com', '0722 000 111')
+        cls.joan = register('Joan', 'Annan', 'joan@example.com', '0733 222 333')
+
+    def test_tokens_follow_saves(self):
+        self.ann.last_name = 'Wanjiru'
+        self.ann.save()
+        tokens = set(PatientSearchToken.objects.filter(patient=self.ann).values_list('token', flat=True))
+        self.assertIn('wanjiru', tokens)
+        self.assertNotIn('otieno', tokens)
+
+    def test_prefix_search_ranks_closest_tokens_first(self):
+        self.assertEqual(search_patients('ann'), [self.ann.id, self.joan.id, self.anne.id])
+        self.assertEqual(search_patients('ann ot'), [self.ann.id])
+        self.assertEqual(search_patients('marie'), [self.anne.id])
+
+    def test_phone_search_ignores_formatting(self):
+        self.assertEqual(search_patients('0712-345'), [self.ann.id])
+        self.assertEqual(search_patients('254712'), [self.ann.id])
+
+    def test_multi_term_search_checks_a_fixed_window(self):
+        # Driver rows for 'ann' in order: ann, ann@example.com (Ann), annan (Joan), anne (Anne-Marie)
+        with mock.patch('patients.search.MAX_SCAN_ROWS', 3):
+            self.assertEqual(search_patients('ann ot'), [self.ann.id])
+            self.assertEqual(search_patients('ann jo'), [self.joan.id])
+            self.assertEqual(search_patients('ann ka'), [])
+        self.assertEqual(search_patients('ann ka'), [self.anne.id])
+
+    def test_limit_and_short_queries(self):
+        self.assertEqual(len(search_patients('ann', limit=1)), 1)
+        self.assertEqual(search_patients('a'), [])
+
+    def test_list_and_typeahead_endpoints(self):
+        client = APIClient()
+        response = client.get('/api/patients/patients/', {'search': 'ann'})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.ann.id, self.joan.id, self.anne.id])
+        response = client.get('/api/patients/patients/typeahead/', {'q': 'joa', 'limit': 5})
+        self.assertEqual(response.data['results'][0]['name'], 'Joan Annan')
@@ -0,0 +1,200 @@
+import base64
+import binascii
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from django.db import connection
+from django.db.models import CharField, F, Q, TextField, Value
+from django.db.models.functions import Concat
+from rest_framework.exceptions import NotFound
+
+from appointments.models import Consultation
+from pharmacy.models import Prescription, PrescriptionDetail
+from .models import MedicalRecord
+
+# Columns shared by every branch of the timeline UNION, in SELECT order
+TIMELINE_COLUMNS = (
+    't_record_date', 't_source', 't_id', 't_record_type', 't_description',
+    't_patient_id', 't_patient_first_name', 't_patient_last_name',
+    't_staff_id', 't_staff_first_name', 't_staff_last_name',
+)
+
+
+def encode_cursor(key):
+    record_date, source, pk = key
+    raw = f'{record_date.isoformat()}|{source}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        record_date, source, pk = raw.split('|')
+        return datetime.fromisoformat(record_date), source, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise NotFound('Invalid cursor')
+
+
+def older_than(source, date_field, key):
+    """Filter for rows of ``source`` that sort after ``key`` in (date, source, id) descending order."""
+    record_date, cursor_source, pk = key
+    if source == cursor_source:
+        return Q(**{f'{date_field}__lt': record_date}) | Q(**{date_field: record_date, 'id__lt': pk})
+    if source < cursor_source:
+        return Q(**{f'{date_field}__lte': record_date})
+    return Q(**{f'{date_field}__lt': record_date})
+
+
+def _stream(source, date_field, queryset, chunk_size):
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield getattr(obj, date_field), source, obj.pk, obj
+
+
+def merge_newest_first(sources, after=None, limit=10):
+    """
+    Stream-merge already ordered querysets into one newest-first page.
+
+    ``sources`` is a list of ``(source, date_field, queryset)``. Each queryset
+    is read through a chunked iterator of at most ``limit + 1`` rows past the
+    cursor, and the streams are combined with ``heapq.merge``, so memory is
+    bounded by the page size rather than the length of the history.
+    Returns ``(items, next_key)`` where items are ``(date, source, id, obj)``.
+    """
+    streams = []
+    for source, date_field, queryset in sources:
+        if after:
+            queryset = queryset.filter(older_than(source, date_field, after))
+        queryset = queryset.order_by(f'-{date_field}', '-id')[:limit + 1]
+        streams.append(_stream(source, date_field, queryset, limit + 1))
+
+    items = list(islice(heapq.merge(*streams, key=lambda item: item[:3], reverse=True), limit + 1))
+    if len(items) > limit:
+        return items[:limit], items[limit - 1][:3]
+    return items, None
+
+
+class ClinicalTimeline:
+    """
+    Newest-first timeline of medical records, consultations and prescriptions.
+
+    The three sources are combined in a single UNION query ordered by
+    (record_date, source, id) and paginated with a keyset cursor on the same
+    tuple, so a page costs the same whatever the size of the history.
+    """
+
+    def __init__(self, patient_id=None, record_type=None):
+        self.patient_id = patient_id
+        self.record_type = record_type
+
+    def _branches(self):
+        branches = []
+
+        records = MedicalRecord.objects.all()
+        if self.record_type:
+            records = records.filter(record_type=self.record_type)
+        branches.append(('medical_record', 'record_date', records.annotate(
+            t_record_type=F('record_type'),
+            t_description=F('description'),
+            t_staff_id=F('recorded_by_id'),
+            t_staff_first_name=F('recorded_by__first_name'),
+            t_staff_last_name=F('recorded_by__last_name'),
+        )))
+
+        if self.record_type in (None, 'consultation'):
+            branches.append(('consultation', 'consultation_datetime', Consultation.objects.annotate(
+                t_record_type=Value('consultation', output_field=CharField()),
+                t_description=Concat(
+                    Value('Consultation: '), 'chief_complaint',
+                    Value('. Diagnosis: '), 'diagnosis',
+                    output_field=TextField(),
+                ),
+                t_staff_id=F('doctor_id'),
+                t_staff_first_name=F('doctor__first_name'),
+                t_staff_last_name=F('doctor__last_name'),
+            )))
+
+        if self.record_type in (None, 'prescription'):
+            # Medication lines are attached after the page is fetched
+            branches.append(('prescription', 'prescribed_date', Prescription.objects.annotate(
+                t_record_type=Value('prescription', output_field=CharField()),
+                t_description=Value('', output_field=TextField()),
+                t_staff_id=F('doctor_id'),
+                t_staff_first_name=F('doctor__first_name'),
+                t_staff_last_name=F('doctor__last_name'),
+            )))
+
+        return branches
+
+    def page(self, after=None, limit=10):
+        """Return ``(entries, next_key)`` for up to ``limit`` entries older than ``after``."""
+        querysets = []
+        for source, date_field, queryset in self._branches():
+            if self.patient_id:
+                queryset = queryset.filter(patient_id=self.patient_id)
+            if after:
+                queryset = queryset.filter(older_than(source, date_field, after))
+            queryset = queryset.annotate(
+                t_record_date=F(date_field),
+                t_source=Value(source, output_field=CharField()),
+                t_id=F('id'),
+                t_patient_id=F('patient_id'),
+                t_patient_first_name=F('patient__first_name'),
+                t_patient_last_name=F('patient__last_name'),
+            ).values_list(*TIMELINE_COLUMNS)
+            if connection.features.supports_slicing_ordering_in_compound:
+                queryset = queryset.order_by(f'-{date_field}', '-id')[:limit + 1]
+            else:
+                queryset = queryset.order_by()
+            querysets.append(queryset)
+
+        combined = querysets[0].union(*querysets[1:], all=True) if len(querysets) > 1 else querysets[0]
+        rows = list(combined.order_by('-t_record_date', '-t_source', '-t_id')[:limit + 1])
+
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = rows[-1][:3]
+
+        entries = [self._entry(dict(zip(TIMELINE_COLUMNS, row))) for row in rows]
+        self._attach_medications(entries)
+        return entries, next_key
+
+    def _entry(self, row):
+        source = row['t_source']
+        return {
+            'id': row['t_id'] if source == 'medical_record' else f'{source}_{row["t_id"]}',
+            'patient': {
+                'id': row['t_patient_id'],
+                'first_name': row['t_patient_first_name'],
+                'last_name': row['t_patient_last_name'],
+            },
+            'recorded_by': {
+                'id': row['t_staff_id'],
+                'first_name': row['t_staff_first_name'],
+                'last_name': row['t_staff_last_name'],
+            } if row['t_staff_id'] else None,
+            'record_type': row['t_record_type'],
+            'description': row['t_description'],
+            'record_date': row['t_record_date'],
+            'source': source,
+        }
+
+    def _attach_medications(self, entries):
+        prescriptions = {
+            int(entry['id'].split('_', 1)[1]): entry
+            for entry in entries if entry['source'] == 'prescription'
+        }
+        if not prescriptions:
+            return
+
+        medications = {pk: [] for pk in prescriptions}
+        details = PrescriptionDetail.objects.filter(
+            prescription_id__in=prescriptions
+        ).values_list('prescription_id', 'medication__item_name', 'dosage', 'frequency').order_by('id')
+        for prescription_id, item_name, dosage, frequency in details:
+            medications[prescription_id].append(f'{item_name} - {dosage} {frequency}')
+
+        for pk, entry in prescriptions.items():
+            lines = medications[pk]
+            entry['description'] = f'Prescription: {", ".join(lines) if lines else "No medications listed"}'
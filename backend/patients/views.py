@@ -2,27 +2,73 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.utils.urls import replace_query_param
+from carepoint.conditional import ConditionalGetMixin
+from carepoint.expansion import ExpansionQuerysetMixin
+from django.conf import settings
+from django.db.models import Case, IntegerField, Prefetch, Value, When
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from datetime import date
+from carepoint.feeds import AppointmentFeedPagination, apply_feed_filters
+from userauth.authentication import get_request_doctor, get_request_patient
 from .models import Patient, MedicalRecord
+from .search import SEARCH_LIMIT, SEARCH_MAX_LIMIT, search_patients
 from .serializers import PatientSerializer, MedicalRecordSerializer
+from .timeline import ClinicalTimeline, decode_cursor, encode_cursor, merge_newest_first
 
-class PatientViewSet(viewsets.ModelViewSet):
+TIMELINE_MAX_PAGE_SIZE = 100
+
+class PatientViewSet(ConditionalGetMixin, ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
+    last_modified_field = 'profile_updated_date'
     permission_classes = [permissions.AllowAny]
+    expand_prefetch_related = {
+        'medical_records': ['medicalrecord_set__recorded_by'],
+    }
 
     def get_queryset(self):
         queryset = Patient.objects.all()
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                first_name__icontains=search) | queryset.filter(
-                last_name__icontains=search) | queryset.filter(
-                contact_email__icontains=search) | queryset.filter(
-                contact_phone__icontains=search
+            # Ranked prefix search through the patient search index
+            patient_ids = search_patients(search, limit=SEARCH_MAX_LIMIT)
+            if not patient_ids:
+                return queryset.none()
+            ranking = Case(
+                *[When(id=patient_id, then=Value(rank)) for rank, patient_id in enumerate(patient_ids)],
+                output_field=IntegerField(),
             )
-        return queryset
+            queryset = queryset.filter(id__in=patient_ids).order_by(ranking)
+        return self.expand_queryset(queryset)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def typeahead(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', SEARCH_LIMIT)), SEARCH_MAX_LIMIT)
+        except ValueError:
+            limit = SEARCH_LIMIT
+        
+        patient_ids = search_patients(query, limit=max(limit, 1))
+        patients = Patient.objects.only(
+            'id', 'first_name', 'last_name', 'contact_email', 'contact_phone', 'date_of_birth'
+        ).in_bulk(patient_ids)
+        
+        results = []
+        for patient_id in patient_ids:
+            patient = patients.get(patient_id)
+            if patient:
+                results.append({
+                    'id': patient.id,
+                    'name': f'{patient.first_name} {patient.last_name}',
+                    'email': patient.contact_email,
+                    'phone': patient.contact_phone,
+                    'dateOfBirth': patient.date_of_birth,
+                })
+        
+        return Response({'results': results})
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def login(self, request):
@@ -65,23 +111,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get_patient_from_token(self, request):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return None
-        
-        try:
-            import jwt
-            from django.conf import settings
-            
-            token = auth_header.split(' ')[1]
-            decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            patient_id = decoded_token.get('user_id')
-            
-            if patient_id:
-                return Patient.objects.get(id=patient_id)
-        except:
-            pass
-        return None
+        return get_request_patient(request)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def me(self, request):
@@ -97,7 +127,7 @@ class PatientViewSet(viewsets.ModelViewSet):
                 'gender': 'M',
                 'address': '123 Main Street, Nairobi, Kenya'
             })
-        return Response(PatientSerializer(patient).data)
+        return Response(PatientSerializer(patient, context=self.get_serializer_context()).data)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def my_appointments(self, request):
@@ -106,10 +136,15 @@ class PatientViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
         
         from appointments.models import Appointment
-        appointments = Appointment.objects.filter(patient=patient).order_by('appointment_datetime')
+        appointments = apply_feed_filters(
+            Appointment.objects.filter(patient=patient).select_related('doctor'),
+            request, 'appointment_datetime'
+        )
+        paginator = AppointmentFeedPagination()
+        page = paginator.paginate_queryset(appointments, request, view=self)
         
         appointment_data = []
-        for apt in appointments:
+        for apt in page:
             appointment_data.append({
                 'id': apt.id,
                 'doctorName': apt.doctor.get_full_name() if apt.doctor else 'Unknown Doctor',
@@ -121,7 +156,7 @@ class PatientViewSet(viewsets.ModelViewSet):
                 'type': 'Consultation'
             })
         
-        return Response({'results': appointment_data})
+        return paginator.get_paginated_response(appointment_data)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def my_records(self, request):
@@ -131,44 +166,53 @@ class PatientViewSet(viewsets.ModelViewSet):
         
         from appointments.models import Appointment
         
-        # Get medical records
-        records = MedicalRecord.objects.filter(patient=patient).order_by('-record_date')
-        
-        # Get appointments
-        appointments = Appointment.objects.filter(patient=patient).order_by('-appointment_datetime')
+        # Medical records and appointments, merged newest first one page at a time
+        records = MedicalRecord.objects.filter(patient=patient).select_related('recorded_by')
+        appointments = Appointment.objects.filter(patient=patient).select_related('doctor')
         
-        combined_records = []
+        cursor = request.query_params.get('cursor', None)
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        try:
+            page_size = min(int(request.query_params.get('page_size', page_size)), TIMELINE_MAX_PAGE_SIZE)
+        except ValueError:
+            pass
         
-        # Add medical records
-        for record in records:
-            combined_records.append({
-                'id': f'record_{record.id}',
-                'date': record.record_date.date(),
-                'doctorName': record.recorded_by.get_full_name() if record.recorded_by else 'Unknown Doctor',
-                'specialty': record.recorded_by.specialization if record.recorded_by else 'General',
-                'diagnosis': record.description,
-                'notes': record.notes or 'No additional notes',
-                'type': 'medical_record',
-                'attachments': 0
-            })
+        items, next_key = merge_newest_first(
+            [('medical_record', 'record_date', records), ('appointment', 'appointment_datetime', appointments)],
+            after=decode_cursor(cursor) if cursor else None,
+            limit=max(page_size, 1),
+        )
         
-        # Add appointments as records
-        for appointment in appointments:
-            combined_records.append({
-                'id': f'appointment_{appointment.id}',
-                'date': appointment.appointment_datetime.date(),
-                'doctorName': appointment.doctor.get_full_name() if appointment.doctor else 'Unknown Doctor',
-                'specialty': appointment.doctor.specialization if appointment.doctor else 'General',
-                'diagnosis': f'Appointment - {appointment.status.title()}',
-                'notes': appointment.reason_for_visit or 'No reason specified',
-                'type': 'appointment',
-                'attachments': 0
-            })
+        combined_records = []
+        for record_date, source, pk, obj in items:
+            if source == 'medical_record':
+                combined_records.append({
+                    'id': f'record_{obj.id}',
+                    'date': record_date.date(),
+                    'doctorName': obj.recorded_by.get_full_name() if obj.recorded_by else 'Unknown Doctor',
+                    'specialty': obj.recorded_by.specialization if obj.recorded_by else 'General',
+                    'diagnosis': obj.description,
+                    'notes': 'No additional notes',
+                    'type': 'medical_record',
+                    'attachments': 0
+                })
+            else:
+                combined_records.append({
+                    'id': f'appointment_{obj.id}',
+                    'date': record_date.date(),
+                    'doctorName': obj.doctor.get_full_name() if obj.doctor else 'Unknown Doctor',
+                    'specialty': obj.doctor.specialization if obj.doctor else 'General',
+                    'diagnosis': f'Appointment - {obj.status.title()}',
+                    'notes': obj.reason_for_visit or 'No reason specified',
+                    'type': 'appointment',
+                    'attachments': 0
+                })
         
-        # Sort by date (newest first)
-        combined_records.sort(key=lambda x: x['date'], reverse=True)
+        next_url = None
+        if next_key:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(next_key))
         
-        return Response({'results': combined_records})
+        return Response({'next': next_url, 'results': combined_records})
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def my_prescriptions(self, request):
@@ -180,7 +224,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         prescriptions = MedicalRecord.objects.filter(
             patient=patient, 
             record_type='prescription'
-        ).order_by('-record_date')
+        ).select_related('recorded_by').order_by('-record_date')
         
         prescription_data = []
         for record in prescriptions:
@@ -196,19 +240,24 @@ class PatientViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def doctors(self, request):
-        from userauth.models import Staff
-        
-        doctors = Staff.objects.filter(role='doctor', status='active')
-        doctor_data = []
-        
-        for doctor in doctors:
-            doctor_data.append({
-                'id': doctor.id,
-                'name': doctor.get_full_name(),
-                'specialization': doctor.specialization or 'General Medicine'
-            })
-        
-        return Response({'results': doctor_data})
+        from userauth.directory import DIRECTORY_MAX_AGE, directory_etag, get_doctor_directory
+        
+        directory, etag = get_doctor_directory()
+        specialization = request.query_params.get('specialization', None)
+        if specialization:
+            directory = {
+                'results': [d for d in directory['results'] if d['specialization'] == specialization],
+                'facets': directory['facets'],
+            }
+            etag = directory_etag(etag, specialization)
+        
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(directory)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=DIRECTORY_MAX_AGE)
+        return response
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def my_billing(self, request):
@@ -218,17 +267,18 @@ class PatientViewSet(viewsets.ModelViewSet):
         
         from billing.models import Bill, BillDetail
         
-        bills = Bill.objects.filter(patient=patient).order_by('-issued_date')
+        bills = Bill.objects.filter(patient=patient).prefetch_related(
+            Prefetch('billdetail_set', queryset=BillDetail.objects.select_related('service', 'item'))
+        ).order_by('-issued_date')
         
         billing_data = []
         for bill in bills:
-            details = BillDetail.objects.filter(bill=bill)
             items = []
-            for detail in details:
+            for detail in bill.billdetail_set.all():
                 if detail.service:
                     items.append(detail.service.service_name)
                 elif detail.item:
-                    items.append(detail.item.name)
+                    items.append(detail.item.item_name)
             
             billing_data.append({
                 'id': f'INV-{bill.id:03d}',
@@ -244,34 +294,23 @@ class PatientViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def doctor_appointments(self, request):
         from appointments.models import Appointment
-        from userauth.models import Staff
         
         # Get doctor from token or use first doctor for testing
-        try:
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                import jwt
-                from django.conf import settings
-                
-                token = auth_header.split(' ')[1]
-                decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-                user_id = decoded_token.get('user_id')
-                doctor = Staff.objects.get(id=user_id, role='doctor')
-            else:
-                doctor = Staff.objects.filter(role='doctor').first()
-        except:
-            doctor = Staff.objects.filter(role='doctor').first()
+        doctor = get_request_doctor(request)
         
         if not doctor:
             return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Get all appointments for the doctor
-        appointments = Appointment.objects.filter(
-            doctor=doctor
-        ).order_by('appointment_datetime')
+        # Windowed, cursor-paginated appointments for the doctor
+        appointments = apply_feed_filters(
+            Appointment.objects.filter(doctor=doctor).select_related('patient'),
+            request, 'appointment_datetime'
+        )
+        paginator = AppointmentFeedPagination()
+        page = paginator.paginate_queryset(appointments, request, view=self)
         
         appointment_data = []
-        for apt in appointments:
+        for apt in page:
             appointment_data.append({
                 'id': str(apt.id),
                 'patientName': f'{apt.patient.first_name} {apt.patient.last_name}',
@@ -282,75 +321,71 @@ class PatientViewSet(viewsets.ModelViewSet):
                 'phone': apt.patient.contact_phone or 'N/A'
             })
         
-        return Response({'results': appointment_data})
+        return paginator.get_paginated_response(appointment_data)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def doctor_patients(self, request):
-        from appointments.models import Appointment
-        from userauth.models import Staff
+        from appointments.models import DoctorPatientPanel
         
         # Get doctor from token or use first doctor for testing
-        try:
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                import jwt
-                from django.conf import settings
-                
-                token = auth_header.split(' ')[1]
-                decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-                user_id = decoded_token.get('user_id')
-                doctor = Staff.objects.get(id=user_id, role='doctor')
-            else:
-                doctor = Staff.objects.filter(role='doctor').first()
-        except:
-            doctor = Staff.objects.filter(role='doctor').first()
+        doctor = get_request_doctor(request)
         
         if not doctor:
             return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Get unique patients who have appointments with this doctor
-        appointments = Appointment.objects.filter(doctor=doctor).select_related('patient')
-        unique_patients = {}
-        
-        for apt in appointments:
-            patient = apt.patient
-            if patient.id not in unique_patients:
-                # Get latest appointment for last visit
-                latest_apt = Appointment.objects.filter(
-                    doctor=doctor, 
-                    patient=patient
-                ).order_by('-appointment_datetime').first()
-                
-                unique_patients[patient.id] = {
-                    'id': f'P{patient.id:03d}',
-                    'name': f'{patient.first_name} {patient.last_name}',
-                    'age': patient.age if hasattr(patient, 'age') else 'N/A',
-                    'gender': patient.gender,
-                    'phone': patient.contact_phone or 'N/A',
-                    'email': patient.contact_email,
-                    'lastVisit': latest_apt.appointment_datetime.date() if latest_apt else 'N/A',
-                    'conditions': ['General Care']  # Default condition
-                }
+        # One indexed read of the doctor's panel, maintained from appointment signals
+        panel = DoctorPatientPanel.objects.filter(
+            doctor=doctor
+        ).select_related('patient').order_by('-last_visit', 'id')
+        page = self.paginate_queryset(panel)
+        
+        patient_data = []
+        for entry in page if page is not None else panel:
+            patient = entry.patient
+            patient_data.append({
+                'id': f'P{patient.id:03d}',
+                'name': f'{patient.first_name} {patient.last_name}',
+                'age': patient.age,
+                'gender': patient.gender,
+                'phone': patient.contact_phone or 'N/A',
+                'email': patient.contact_email,
+                'lastVisit': entry.last_visit.date(),
+                'firstVisit': entry.first_visit.date(),
+                'visitCount': entry.visit_count,
+                'conditions': ['General Care']  # Default condition
+            })
         
-        return Response({'results': list(unique_patients.values())})
+        if page is not None:
+            return self.get_paginated_response(patient_data)
+        return Response({'results': patient_data})
 
 
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def update_appointment_status(self, request):
+        from appointments.booking import SlotUnavailable, slot_guard
         from appointments.models import Appointment
         
         appointment_id = request.data.get('appointment_id')
         new_status = request.data.get('status')
+        if new_status not in dict(Appointment.STATUS_CHOICES):
+            return Response(
+                {'error': f'status must be one of {", ".join(dict(Appointment.STATUS_CHOICES))}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         try:
             appointment = Appointment.objects.get(id=appointment_id)
             appointment.status = new_status
-            appointment.save()
+            # Re-activating a cancelled appointment takes its slot back, which may be booked by now
+            with slot_guard():
+                appointment.save()
             
             return Response({'message': 'Appointment status updated successfully'})
         except Appointment.DoesNotExist:
             return Response({'error': 'Appointment not found'}, status=status.HTTP_404_NOT_FOUND)
+        except SlotUnavailable as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def book_appointment(self, request):
@@ -358,21 +393,24 @@ class PatientViewSet(viewsets.ModelViewSet):
         if not patient:
             return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        from appointments.models import Appointment
-        from userauth.models import Staff
+        from appointments.availability import resolve_doctor
+        from appointments.booking import SlotUnavailable, book_appointment
         from datetime import datetime
         
         try:
-            # Get doctor by name (you might want to improve this)
-            doctor_name = request.data.get('doctor')
-            doctor = Staff.objects.filter(role='doctor').first()  # Default to first doctor
+            # The booking form sends the doctor's directory name; an id also works
+            doctor = resolve_doctor(request.data.get('doctorId') or request.data.get('doctor'))
+            if not doctor:
+                return Response({'error': 'Doctor not found'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Combine date and time
             appointment_date = request.data.get('appointmentDate')
             appointment_time = request.data.get('appointmentTime')
-            appointment_datetime = datetime.strptime(f"{appointment_date} {appointment_time}", "%Y-%m-%d %H:%M")
+            appointment_datetime = timezone.make_aware(
+                datetime.strptime(f"{appointment_date} {appointment_time}", "%Y-%m-%d %H:%M")
+            )
             
-            appointment = Appointment.objects.create(
+            appointment = book_appointment(
                 patient=patient,
                 doctor=doctor,
                 appointment_type='consultation',
@@ -386,20 +424,23 @@ class PatientViewSet(viewsets.ModelViewSet):
                 'appointment_id': appointment.id
             }, status=status.HTTP_201_CREATED)
             
+        except SlotUnavailable as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True)
     def medical_records(self, request, pk=None):
         patient = self.get_object()
-        records = MedicalRecord.objects.filter(patient=patient)
-        serializer = MedicalRecordSerializer(records, many=True)
+        records = MedicalRecord.objects.filter(patient=patient).select_related('patient', 'recorded_by')
+        serializer = MedicalRecordSerializer(records, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
-class MedicalRecordViewSet(viewsets.ModelViewSet):
+class MedicalRecordViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = MedicalRecord.objects.all()
     serializer_class = MedicalRecordSerializer
     permission_classes = [permissions.AllowAny]
+    select_related_always = ('patient', 'recorded_by')
 
     def get_queryset(self):
         queryset = MedicalRecord.objects.all()
@@ -411,90 +452,29 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
         if record_type:
             queryset = queryset.filter(record_type=record_type)
             
-        return queryset.order_by('-record_date')
+        return self.expand_queryset(queryset.order_by('-record_date'))
     
     def list(self, request, *args, **kwargs):
-        # Get regular medical records
-        medical_records = self.get_queryset()
-        
-        # Get consultations
-        from appointments.models import Consultation
-        consultations = Consultation.objects.all().order_by('-consultation_datetime')
-        
-        # Get prescriptions
-        from pharmacy.models import Prescription, PrescriptionDetail
-        prescriptions = Prescription.objects.all().order_by('-prescribed_date')
-        
-        # Combine all records
-        all_records = []
-        
-        # Add medical records
-        for record in medical_records:
-            all_records.append({
-                'id': record.id,
-                'patient': {
-                    'id': record.patient.id,
-                    'first_name': record.patient.first_name,
-                    'last_name': record.patient.last_name
-                } if record.patient else None,
-                'recorded_by': {
-                    'id': record.recorded_by.id,
-                    'first_name': record.recorded_by.first_name,
-                    'last_name': record.recorded_by.last_name
-                } if record.recorded_by else None,
-                'record_type': record.record_type,
-                'description': record.description,
-                'record_date': record.record_date,
-                'source': 'medical_record'
-            })
-        
-        # Add consultations as records
-        for consultation in consultations:
-            all_records.append({
-                'id': f'consultation_{consultation.id}',
-                'patient': {
-                    'id': consultation.patient.id,
-                    'first_name': consultation.patient.first_name,
-                    'last_name': consultation.patient.last_name
-                } if consultation.patient else None,
-                'recorded_by': {
-                    'id': consultation.doctor.id,
-                    'first_name': consultation.doctor.first_name,
-                    'last_name': consultation.doctor.last_name
-                } if consultation.doctor else None,
-                'record_type': 'consultation',
-                'description': f'Consultation: {consultation.chief_complaint}. Diagnosis: {consultation.diagnosis}',
-                'record_date': consultation.consultation_datetime,
-                'source': 'consultation'
-            })
-        
-        # Add prescriptions as records
-        for prescription in prescriptions:
-            # Get prescription details
-            details = PrescriptionDetail.objects.filter(prescription=prescription)
-            medications = []
-            for detail in details:
-                medications.append(f'{detail.medication.item_name} - {detail.dosage} {detail.frequency}')
-            
-            all_records.append({
-                'id': f'prescription_{prescription.id}',
-                'patient': {
-                    'id': prescription.patient.id,
-                    'first_name': prescription.patient.first_name,
-                    'last_name': prescription.patient.last_name
-                } if prescription.patient else None,
-                'recorded_by': {
-                    'id': prescription.doctor.id,
-                    'first_name': prescription.doctor.first_name,
-                    'last_name': prescription.doctor.last_name
-                } if prescription.doctor else None,
-                'record_type': 'prescription',
-                'description': f'Prescription: {", ".join(medications) if medications else "No medications listed"}',
-                'record_date': prescription.prescribed_date,
-                'source': 'prescription'
-            })
-        
-        # Sort all records by date (newest first)
-        all_records.sort(key=lambda x: x['record_date'], reverse=True)
-        
-        return Response(all_records)
+        # Medical records, consultations and prescriptions as one keyset-paginated timeline
+        timeline = ClinicalTimeline(
+            patient_id=self.request.query_params.get('patient_id', None),
+            record_type=self.request.query_params.get('record_type', None),
+        )
+
+        cursor = request.query_params.get('cursor', None)
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        try:
+            page_size = min(int(request.query_params.get('page_size', page_size)), TIMELINE_MAX_PAGE_SIZE)
+        except ValueError:
+            pass
+
+        entries, next_key = timeline.page(
+            after=decode_cursor(cursor) if cursor else None,
+            limit=max(page_size, 1),
+        )
+
+        next_url = None
+        if next_key:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(next_key))
+
+        return Response({'next': next_url, 'results': entries})
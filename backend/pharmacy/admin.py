@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Supplier, Inventory, Prescription, PrescriptionDetail
+from .models import Supplier, Inventory, Prescription, PrescriptionDetail, StockMovement, StockSnapshot
 
 @admin.register(Supplier)
 class SupplierAdmin(admin.ModelAdmin):
@@ -13,6 +13,33 @@ class InventoryAdmin(admin.ModelAdmin):
     search_fields = ('item_name', 'description', 'batch_number')
     date_hierarchy = 'expiry_date'
 
+    def get_readonly_fields(self, request, obj=None):
+        # Existing stock changes only through ledger movements
+        return ('quantity_in_stock',) if obj else ()
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('id', 'inventory', 'kind', 'quantity', 'prescription', 'performed_by', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('inventory__item_name', 'inventory__batch_number', 'note')
+    date_hierarchy = 'created_at'
+
+    # The ledger is append-only and written through pharmacy.stock
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('id', 'inventory', 'taken_at', 'quantity')
+    list_filter = ('taken_at',)
+    search_fields = ('inventory__item_name',)
+
 class PrescriptionDetailInline(admin.TabularInline):
     model = PrescriptionDetail
     extra = 1
@@ -0,0 +1,56 @@
+"""
+Prescription dispensing.
+
+A dispense runs in one transaction: a guarded
+``UPDATE ... WHERE status = 'pending'`` claims the prescription, each line
+is split across batches of its drug first-expiry-first-out (see
+``pharmacy.allocation``), and the split is recorded as ``dispense``
+movements in the stock ledger, which decrements every batch in one guarded
+``UPDATE`` (see ``pharmacy.stock``). If any drug is short the whole
+dispense rolls back, leaving the prescription pending and every count
+untouched.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .allocation import allocate
+from .models import Prescription, PrescriptionDetail, StockMovement
+from .stock import apply_movements
+
+
+class AlreadyProcessed(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Prescription already processed'
+    default_code = 'already_processed'
+
+
+def dispense_prescription(prescription_id, pharmacist):
+    """Dispense every line of a pending prescription or, on any shortage, none of them; returns the allocations."""
+    now = timezone.now()
+    with transaction.atomic():
+        if not Prescription.objects.filter(id=prescription_id, status='pending').update(
+            status='dispensed', updated_date=now
+        ):
+            raise AlreadyProcessed()
+
+        details = list(
+            PrescriptionDetail.objects.filter(prescription_id=prescription_id).select_related('medication').only(
+                'quantity', 'dispensed_by', 'dispensed_date', 'medication__category', 'medication__item_name'
+            )
+        )
+        allocations = allocate(details)
+        apply_movements([
+            StockMovement(
+                inventory_id=allocation.batch.id, kind='dispense', quantity=-allocation.quantity,
+                prescription_id=prescription_id, prescription_detail=allocation.detail,
+                performed_by=pharmacist, created_at=now
+            )
+            for allocation in allocations
+        ])
+
+        for detail in details:
+            detail.dispensed_by = pharmacist
+            detail.dispensed_date = now
+        PrescriptionDetail.objects.bulk_update(details, ['dispensed_by', 'dispensed_date'])
+    return allocations
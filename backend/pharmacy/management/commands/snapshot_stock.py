@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from pharmacy.stock import ledger_drift, take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot every inventory balance so point-in-time stock queries stay cheap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Also report items whose counter disagrees with the ledger')
+
+    def handle(self, *args, **options):
+        written = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f'Snapshotted {written} inventory items'))
+        if options['check']:
+            drift = ledger_drift()
+            for pk, item_name, counter, balance in drift:
+                self.stdout.write(self.style.WARNING(f'{item_name} (#{pk}): counter {counter}, ledger {balance}'))
+            if not drift:
+                self.stdout.write(self.style.SUCCESS('Stock counters match the ledger'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0003_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescription',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
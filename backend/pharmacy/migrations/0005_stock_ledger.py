@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    # Existing stock becomes each item's opening balance
+    Inventory = apps.get_model('pharmacy', 'Inventory')
+    StockMovement = apps.get_model('pharmacy', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(inventory_id=pk, kind='opening', quantity=quantity, note='Stock before the ledger')
+            for pk, quantity in Inventory.objects.exclude(quantity_in_stock=0).values_list('id', 'quantity_in_stock')
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0004_updated_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('opening', 'Opening Balance'), ('receipt', 'Receipt'), ('adjustment', 'Adjustment'), ('dispense', 'Dispense'), ('expiry_write_off', 'Expiry Write-off')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='pharmacy.inventory')),
+                ('performed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('prescription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='pharmacy.prescription')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inventory', 'created_at'], name='stock_move_item_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='pharmacy.inventory')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('inventory', 'taken_at'), name='stock_snapshot_key')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -35,9 +35,67 @@ class Inventory(models.Model):
     storage_location = models.CharField(max_length=100, blank=True, null=True)
     last_updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Batches of one item, earliest expiry first, for FEFO allocation
+            models.Index(fields=['category', 'item_name', 'expiry_date'], name='inventory_fefo_idx'),
+        ]
+
     def __str__(self):
         return f"{self.item_name} - {self.batch_number}"
 
+class StockMovement(models.Model):
+    """
+    One change to an item's stock. The ledger is append-only: corrections are
+    new movements, and ``Inventory.quantity_in_stock`` is the running sum.
+    """
+    KIND_CHOICES = [
+        ('opening', 'Opening Balance'),
+        ('receipt', 'Receipt'),
+        ('adjustment', 'Adjustment'),
+        ('dispense', 'Dispense'),
+        ('expiry_write_off', 'Expiry Write-off'),
+    ]
+
+    # An item with history cannot be deleted; write its stock off instead
+    inventory = models.ForeignKey(Inventory, on_delete=models.PROTECT, related_name='movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Signed: receipts are positive, dispenses and write-offs negative
+    quantity = models.IntegerField()
+    prescription = models.ForeignKey('Prescription', on_delete=models.SET_NULL, null=True, blank=True)
+    # The prescription line a dispense was allocated to; one line may draw on several batches
+    prescription_detail = models.ForeignKey('PrescriptionDetail', on_delete=models.SET_NULL, null=True, blank=True)
+    performed_by = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventory', 'created_at'], name='stock_move_item_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Stock movements are append-only')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.inventory} {self.quantity:+d} ({self.kind})"
+
+class StockSnapshot(models.Model):
+    """An item's stock as of ``taken_at``, so point-in-time queries only replay later movements."""
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='snapshots')
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['inventory', 'taken_at'], name='stock_snapshot_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory} = {self.quantity} at {self.taken_at}"
+
 class Prescription(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -45,12 +103,25 @@ class Prescription(models.Model):
         ('cancelled', 'Cancelled'),
     ]
 
+    # Dispensing moves stock, so it stays on the dispense action
+    STATUS_TRANSITIONS = {
+        'cancelled': ('pending',),
+    }
+
     consultation = models.ForeignKey(Consultation, on_delete=models.CASCADE)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     doctor = models.ForeignKey(Staff, on_delete=models.CASCADE, related_name='prescriptions_given')
     prescribed_date = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(blank=True, null=True)
+    updated_date = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'prescribed_date'], name='rx_patient_date_idx'),
+            models.Index(fields=['doctor', 'prescribed_date'], name='rx_doctor_date_idx'),
+            models.Index(fields=['status', 'prescribed_date'], name='rx_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.patient} - {self.prescribed_date}"
@@ -1,29 +1,46 @@
 from rest_framework import serializers
-from .models import Supplier, Inventory, Prescription, PrescriptionDetail
+from carepoint.expansion import ExpandableFieldsMixin
+from .models import Supplier, Inventory, Prescription, PrescriptionDetail, StockMovement
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
 
-class InventorySerializer(serializers.ModelSerializer):
+class InventorySerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     supplier_details = SupplierSerializer(source='supplier', read_only=True)
+    expandable_fields = ('supplier_details',)
 
     class Meta:
         model = Inventory
         fields = '__all__'
 
-class PrescriptionDetailSerializer(serializers.ModelSerializer):
+    def validate_quantity_in_stock(self, value):
+        # Stock only changes through ledger movements once the item exists
+        if self.instance is not None and value != self.instance.quantity_in_stock:
+            raise serializers.ValidationError('Use adjust_stock to change stock levels.')
+        return value
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    performed_by_name = serializers.CharField(source='performed_by.get_full_name', read_only=True, default=None)
+
+    class Meta:
+        model = StockMovement
+        fields = '__all__'
+
+class PrescriptionDetailSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     medication_details = InventorySerializer(source='medication', read_only=True)
+    expandable_fields = ('medication_details',)
 
     class Meta:
         model = PrescriptionDetail
         fields = '__all__'
 
-class PrescriptionSerializer(serializers.ModelSerializer):
+class PrescriptionSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     details = PrescriptionDetailSerializer(many=True, read_only=True, source='prescriptiondetail_set')
     patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
     doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
+    expandable_fields = ('details',)
 
     class Meta:
         model = Prescription
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Inventory, StockMovement
+
+
+@receiver(post_save, sender=Inventory)
+def open_stock_ledger(sender, instance, created=False, raw=False, **kwargs):
+    # The counter already holds the starting stock; the ledger only has to match it
+    if raw or not created or not instance.quantity_in_stock:
+        return
+    StockMovement.objects.create(inventory=instance, kind='opening', quantity=instance.quantity_in_stock)
@@ -0,0 +1,136 @@
+"""
+Inventory stock ledger.
+
+Every change to stock is a ``StockMovement`` row. ``Inventory.quantity_in_stock``
+is kept as the running sum: the affected items are locked in id order (so
+concurrent writers never deadlock), then all of them are moved with one
+``UPDATE ... SET quantity_in_stock = quantity_in_stock + CASE id ... END``
+guarded by ``quantity_in_stock >= n`` for each decrement, in the same
+transaction that appends the movements.
+
+``StockSnapshot`` rows record each item's balance at a moment; the stock
+at any time is the latest snapshot before it plus the movements after the
+snapshot, so history queries never replay the whole ledger.
+"""
+import operator
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .models import Inventory, StockMovement, StockSnapshot
+
+# Movements in flight when a snapshot is cut may carry an earlier created_at,
+# so snapshots are taken this far behind the clock
+SNAPSHOT_LAG = timedelta(minutes=5)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Movements staff may record by hand; dispenses come from prescriptions
+MANUAL_MOVEMENT_KINDS = ('receipt', 'adjustment', 'expiry_write_off')
+
+
+class InsufficientStock(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = 'insufficient_stock'
+
+    def __init__(self, item_names):
+        self.item_names = item_names
+        super().__init__(f'Insufficient stock for {", ".join(item_names)}')
+
+
+def apply_movements(movements):
+    """
+    Append unsaved ``StockMovement`` rows and move each item's counter by their total.
+
+    Raises ``InsufficientStock`` (rolling everything back) if any item would go negative.
+    """
+    totals = defaultdict(int)
+    for movement in movements:
+        totals[movement.inventory_id] += movement.quantity
+
+    changes = {pk: change for pk, change in totals.items() if change}
+    now = timezone.now()
+    with transaction.atomic():
+        current = {
+            pk: (item_name, quantity)
+            for pk, item_name, quantity in Inventory.objects.select_for_update().filter(id__in=changes).order_by('id')
+            .values_list('id', 'item_name', 'quantity_in_stock')
+        }
+        short = [pk for pk in sorted(changes) if pk not in current or current[pk][1] + changes[pk] < 0]
+        if changes and not short:
+            # The guard also holds on backends without row locks, where another writer may have got in first
+            guard = reduce(operator.or_, (
+                Q(id=pk, quantity_in_stock__gte=-change) if change < 0 else Q(id=pk)
+                for pk, change in changes.items()
+            ))
+            updated = Inventory.objects.filter(guard).update(
+                quantity_in_stock=F('quantity_in_stock') + Case(
+                    *(When(id=pk, then=Value(change)) for pk, change in changes.items()),
+                    default=Value(0), output_field=IntegerField(),
+                ),
+                last_updated=now,
+            )
+            if updated != len(changes):
+                short = sorted(pk for pk, change in changes.items() if change < 0)
+        if short:
+            raise InsufficientStock([current[pk][0] if pk in current else f'item {pk}' for pk in short])
+        StockMovement.objects.bulk_create(movements)
+    return movements
+
+
+def move_stock(inventory_id, quantity, kind, performed_by=None, note=''):
+    """Record a single movement; returns it."""
+    movement = StockMovement(
+        inventory_id=inventory_id, quantity=quantity, kind=kind, performed_by=performed_by, note=note
+    )
+    apply_movements([movement])
+    return movement
+
+
+def with_stock_at(queryset, moment):
+    """Annotate inventory rows with ``stock_at``: their balance at ``moment``, from snapshot + later movements."""
+    snapshot = StockSnapshot.objects.filter(inventory=OuterRef('pk'), taken_at__lte=moment).order_by('-taken_at')
+    queryset = queryset.annotate(
+        snapshot_at=Subquery(snapshot.values('taken_at')[:1]),
+        snapshot_quantity=Subquery(snapshot.values('quantity')[:1]),
+    )
+    delta = StockMovement.objects.filter(
+        inventory=OuterRef('pk'), created_at__lte=moment, created_at__gt=Coalesce(OuterRef('snapshot_at'), Value(EPOCH))
+    ).order_by().values('inventory').annotate(total=Sum('quantity')).values('total')
+    return queryset.annotate(
+        stock_at=Coalesce(F('snapshot_quantity'), 0) + Coalesce(Subquery(delta, output_field=IntegerField()), 0)
+    )
+
+
+def stock_at(inventory_id, moment):
+    return with_stock_at(Inventory.objects.filter(id=inventory_id), moment).values_list('stock_at', flat=True).first()
+
+
+def take_snapshots(moment=None):
+    """
+    Snapshot every item's balance at ``moment`` (default: ``SNAPSHOT_LAG`` ago).
+
+    Items already snapshotted at ``moment`` are left alone, so re-running is
+    safe; returns the number of snapshots actually written.
+    """
+    moment = moment or timezone.now() - SNAPSHOT_LAG
+    taken = StockSnapshot.objects.filter(taken_at=moment)
+    before = taken.count()
+    balances = with_stock_at(Inventory.objects.exclude(snapshots__taken_at=moment), moment).values_list('id', 'stock_at')
+    StockSnapshot.objects.bulk_create(
+        (StockSnapshot(inventory_id=pk, taken_at=moment, quantity=quantity) for pk, quantity in balances),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    # bulk_create cannot tell which rows a conflict skipped, so count the table instead
+    return taken.count() - before
+
+
+def ledger_drift():
+    """``(id, item_name, counter, ledger balance)`` for items whose counter disagrees with the ledger."""
+    items = with_stock_at(Inventory.objects.all(), timezone.now()).exclude(quantity_in_stock=F('stock_at'))
+    return list(items.values_list('id', 'item_name', 'quantity_in_stock', 'stock_at'))
@@ -1,3 +1,317 @@
-from django.test import TestCase
+import io
+import threading
+from datetime import date, datetime, timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from appointments.models import Appointment, Consultation
+from patients.models import Patient
+from userauth.models import Staff
+from .allocation import usable_batches
+from .dispensing import dispense_prescription
+from .models import Inventory, Prescription, PrescriptionDetail, StockMovement, StockSnapshot
+from .stock import InsufficientStock, apply_movements, ledger_drift, stock_at, take_snapshots
 
-# Create your tests here.
+
+def make_consultation(doctor):
+    patient = Patient.objects.create(
+        first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+        contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+    )
+    appointment = Appointment.objects.create(
+        patient=patient, doctor=doctor, appointment_type='consultation',
+        appointment_datetime=timezone.now() + timedelta(days=1), reason_for_visit='Checkup'
+    )
+    return Consultation.objects.create(
+        appointment=appointment, patient=patient, doctor=doctor,
+        chief_complaint='Cough', diagnosis='URTI', notes='-'
+    )
+
+
+def make_prescription(consultation, lines):
+    prescription = Prescription.objects.create(
+        consultation=consultation, patient=consultation.patient, doctor=consultation.doctor
+    )
+    PrescriptionDetail.objects.bulk_create([
+        PrescriptionDetail(
+            prescription=prescription, medication=medication, quantity=quantity,
+            dosage='1 tab', frequency='bd', duration='5 days'
+        )
+        for medication, quantity in lines
+    ])
+    return prescription
+
+
+def make_medicine(name, stock, expiry_date=None, batch_number=None):
+    return Inventory.objects.create(
+        item_name=name, category='medicine', quantity_in_stock=stock, unit_price='1.00', reorder_level=10,
+        expiry_date=expiry_date, batch_number=batch_number
+    )
+
+
+class DispenseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.pharmacist = Staff.objects.create_user(username='pharm', password='pass', role='pharmacist')
+        cls.consultation = make_consultation(cls.doctor)
+        cls.amoxicillin = make_medicine('Amoxicillin', 20)
+        cls.paracetamol = make_medicine('Paracetamol', 5)
+
+    def dispense(self, prescription):
+        client = APIClient()
+        client.force_authenticate(self.pharmacist)
+        return client.post(f'/api/pharmacy/prescriptions/{prescription.id}/dispense/')
+
+    def stock(self):
+        return dict(Inventory.objects.values_list('item_name', 'quantity_in_stock'))
+
+    def test_dispense_decrements_stock_and_stamps_lines(self):
+        prescription = make_prescription(
+            self.consultation, [(self.amoxicillin, 6), (self.paracetamol, 2), (self.amoxicillin, 4)]
+        )
+        # Claim, read lines, allocate batches, lock and decrement them, append the ledger, stamp the lines,
+        # plus two savepoint pairs
+        with CaptureQueriesContext(connection) as queries:
+            dispense_prescription(prescription.id, self.pharmacist)
+        statements = [query['sql'].split(' ', 1)[0] for query in queries]
+        # One batch lookup and one decrement for all 150 batches; only the ledger insert
+        # may be split, to stay under the backend's parameter limit
+        self.assertEqual(statements.count('UPDATE'), 3)
+        self.assertEqual(statements.count('SELECT'), 3)
+        self.assertLessEqual(len(statements), 13)
+        self.assertEqual(self.stock(), {'Amoxicillin': 10, 'Paracetamol': 3})
+        prescription.refresh_from_db()
+        self.assertEqual(prescription.status, 'dispensed')
+        self.assertEqual(
+            set(prescription.prescriptiondetail_set.values_list('dispensed_by', flat=True)), {self.pharmacist.id}
+        )
+        self.assertEqual(self.dispense(prescription).data, {'error': 'Prescription already processed'})
+
+    def test_shortage_rolls_everything_back(self):
+        prescription = make_prescription(self.consultation, [(self.amoxicillin, 6), (self.paracetamol, 9)])
+        response = self.dispense(prescription)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Insufficient stock for Paracetamol', 'items': ['Paracetamol']})
+        prescription.refresh_from_db()
+        self.assertEqual(prescription.status, 'pending')
+        self.assertEqual(self.stock(), {'Amoxicillin': 20, 'Paracetamol': 5})
+        self.assertFalse(prescription.prescriptiondetail_set.exclude(dispensed_date=None).exists())
+
+    def test_repeated_lines_are_checked_against_their_total(self):
+        prescription = make_prescription(self.consultation, [(self.paracetamol, 3), (self.paracetamol, 3)])
+        with self.assertRaises(InsufficientStock):
+            dispense_prescription(prescription.id, self.pharmacist)
+        self.assertEqual(self.stock()['Paracetamol'], 5)
+
+
+class StockLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.pharmacist = Staff.objects.create_user(username='pharm', password='pass', role='pharmacist')
+        cls.consultation = make_consultation(cls.doctor)
+        cls.item = make_medicine('Amoxicillin', 20)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.pharmacist)
+
+    def adjust(self, **data):
+        return self.client.post(f'/api/pharmacy/inventory/{self.item.id}/adjust_stock/', data, format='json')
+
+    def test_every_movement_is_recorded(self):
+        self.assertEqual(self.adjust(quantity=30, kind='receipt', note='PO 118').data['new_quantity'], 50)
+        self.assertEqual(self.adjust(quantity=-5, kind='expiry_write_off').data['new_quantity'], 45)
+        prescription = make_prescription(self.consultation, [(self.item, 12)])
+        dispense_prescription(prescription.id, self.pharmacist)
+
+        response = self.client.get(f'/api/pharmacy/inventory/{self.item.id}/ledger/')
+        self.assertEqual(
+            [(row['kind'], row['quantity']) for row in response.data['results']],
+            [('dispense', -12), ('expiry_write_off', -5), ('receipt', 30), ('opening', 20)]
+        )
+        self.assertEqual(response.data['results'][0]['prescription'], prescription.id)
+        self.assertEqual(response.data['results'][2]['performed_by_name'], self.pharmacist.get_full_name())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_in_stock, 33)
+        self.assertEqual(ledger_drift(), [])
+
+    def test_invalid_adjustments_change_nothing(self):
+        self.assertEqual(self.adjust(quantity=-21).data, {'error': 'Stock cannot be negative'})
+        self.assertEqual(self.adjust(quantity=-3, kind='receipt').status_code, 400)
+        self.assertEqual(self.adjust(quantity=0).status_code, 400)
+        self.assertEqual(self.adjust(quantity=4, kind='dispense').status_code, 400)
+        self.assertEqual(self.adjust(quantity='lots').status_code, 400)
+        # Stock levels cannot be overwritten outside the ledger
+        response = self.client.patch(f'/api/pharmacy/inventory/{self.item.id}/', {'quantity_in_stock': 99}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.item.movements.count(), 1)
+        self.assertEqual(Inventory.objects.get(id=self.item.id).quantity_in_stock, 20)
+
+    def test_movements_are_append_only(self):
+        movement = self.item.movements.get()
+        movement.quantity = 500
+        with self.assertRaises(ValueError):
+            movement.save()
+
+    def test_items_with_history_cannot_be_deleted(self):
+        response = self.client.delete(f'/api/pharmacy/inventory/{self.item.id}/')
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(Inventory.objects.filter(id=self.item.id).exists())
+        self.assertEqual(self.item.movements.count(), 1)
+
+    def test_point_in_time_stock_reads_snapshot_and_delta(self):
+        start = timezone.make_aware(datetime(2025, 6, 1, 9))
+        StockMovement.objects.filter(inventory=self.item).update(created_at=start)
+        apply_movements([
+            StockMovement(inventory=self.item, kind='receipt', quantity=quantity, created_at=start + timedelta(days=day))
+            for day, quantity in ((1, 10), (2, -4), (4, 6))
+        ])
+        self.assertEqual(stock_at(self.item.id, start + timedelta(days=3)), 26)
+
+        self.assertEqual(take_snapshots(start + timedelta(days=2, hours=1)), 1)
+        self.assertEqual(StockSnapshot.objects.get().quantity, 26)
+        # Re-running for the same moment writes, and reports, nothing
+        self.assertEqual(take_snapshots(start + timedelta(days=2, hours=1)), 0)
+        # Later reads start from the snapshot instead of replaying the ledger
+        StockSnapshot.objects.update(quantity=100)
+        self.assertEqual(stock_at(self.item.id, start + timedelta(days=3)), 100)
+        self.assertEqual(stock_at(self.item.id, start + timedelta(days=5)), 106)
+        self.assertEqual(stock_at(self.item.id, start + timedelta(days=1)), 30)
+
+        response = self.client.get(f'/api/pharmacy/inventory/{self.item.id}/stock_at/', {'at': '2025-06-01'})
+        self.assertEqual(response.data['quantity'], 20)
+
+    def test_snapshot_command_reports_drift(self):
+        Inventory.objects.filter(id=self.item.id).update(quantity_in_stock=18)
+        out = io.StringIO()
+        call_command('snapshot_stock', '--check', stdout=out)
+        self.assertIn('Snapshotted 1 inventory items', out.getvalue())
+        self.assertIn('Amoxicillin (#%d): counter 18, ledger 20' % self.item.id, out.getvalue())
+
+
+class FefoAllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        cls.pharmacist = Staff.objects.create_user(username='pharm', password='pass', role='pharmacist')
+        cls.consultation = make_consultation(cls.doctor)
+        today = timezone.localdate()
+        cls.batches = {
+            label: make_medicine('Amoxicillin', stock, expiry, label)
+            for label, stock, expiry in (
+                ('expired', 50, today - timedelta(days=1)),
+                ('later', 30, today + timedelta(days=365)),
+                ('undated', 20, None),
+                ('soon', 8, today + timedelta(days=10)),
+                ('today', 2, today),
+            )
+        }
+
+    def dispense(self, prescription):
+        client = APIClient()
+        client.force_authenticate(self.pharmacist)
+        return client.post(f'/api/pharmacy/prescriptions/{prescription.id}/dispense/')
+
+    def stock(self):
+        return {batch.batch_number: batch.quantity_in_stock for batch in Inventory.objects.all()}
+
+    def test_lines_draw_on_the_earliest_expiring_batches(self):
+        prescription = make_prescription(
+            self.consultation, [(self.batches['later'], 6), (self.batches['undated'], 14)]
+        )
+        response = self.dispense(prescription)
+        self.assertEqual(
+            [(row['batch_number'], row['quantity']) for row in response.data['allocations']],
+            [('today', 2), ('soon', 4), ('soon', 4), ('later', 10)]
+        )
+        self.assertEqual(self.stock(), {'expired': 50, 'later': 20, 'undated': 20, 'soon': 0, 'today': 0})
+        second_line = prescription.prescriptiondetail_set.order_by('id')[1]
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(prescription_detail=second_line).values_list('quantity', flat=True)),
+            [-10, -4]
+        )
+
+    def test_expired_stock_is_never_dispensed(self):
+        prescription = make_prescription(self.consultation, [(self.batches['expired'], 61)])
+        response = self.dispense(prescription)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['items'], ['Amoxicillin'])
+        self.assertEqual(self.stock()['expired'], 50)
+        # Undated batches are used once every dated one is empty
+        prescription = make_prescription(self.consultation, [(self.batches['expired'], 60)])
+        self.assertEqual(self.dispense(prescription).status_code, 200)
+        self.assertEqual(self.stock(), {'expired': 50, 'later': 0, 'undated': 0, 'soon': 0, 'today': 0})
+
+    def test_allocation_cost_does_not_grow_with_lines(self):
+        today = timezone.localdate()
+        drugs = [
+            [make_medicine(f'Drug {n}', 10, today + timedelta(days=30 * batch), f'D{n}-{batch}') for batch in (1, 2, 3)]
+            for n in range(50)
+        ]
+        prescription = make_prescription(self.consultation, [(batches[2], 25) for batches in drugs])
+        with CaptureQueriesContext(connection) as queries:
+            dispense_prescription(prescription.id, self.pharmacist)
+        statements = [query['sql'].split(' ', 1)[0] for query in queries]
+        # One batch lookup and one decrement for all 150 batches; only the ledger insert
+        # may be split, to stay under the backend's parameter limit
+        self.assertEqual(statements.count('UPDATE'), 3)
+        self.assertEqual(statements.count('SELECT'), 3)
+        self.assertLessEqual(len(statements), 13)
+        self.assertEqual(
+            sorted(set(Inventory.objects.filter(item_name__startswith='Drug').values_list('quantity_in_stock', flat=True))),
+            [0, 5]
+        )
+
+    def test_batch_lookup_uses_the_fefo_index(self):
+        plan = usable_batches({('medicine', 'Amoxicillin')}, timezone.localdate()).explain()
+        self.assertIn('inventory_fefo_idx', plan)
+
+
+class ConcurrentDispenseTests(TransactionTestCase):
+    def setUp(self):
+        doctor = Staff.objects.create_user(username='house', password='pass', role='doctor')
+        self.pharmacists = [
+            Staff.objects.create_user(username=f'pharm{i}', password='pass', role='pharmacist') for i in range(8)
+        ]
+        consultation = make_consultation(doctor)
+        self.drugs = [make_medicine('Amoxicillin', 25), make_medicine('Paracetamol', 40)]
+        # Half the prescriptions list the drugs in the opposite order
+        self.prescriptions = [
+            make_prescription(consultation, [(self.drugs[i % 2], 5), (self.drugs[1 - i % 2], 5)]) for i in range(16)
+        ]
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_concurrent_dispenses_never_oversell(self):
+        outcomes = []
+        barrier = threading.Barrier(len(self.pharmacists))
+
+        def work(index, pharmacist):
+            barrier.wait()
+            try:
+                for prescription in self.prescriptions[index::len(self.pharmacists)]:
+                    try:
+                        dispense_prescription(prescription.id, pharmacist)
+                        outcomes.append(prescription.id)
+                    except InsufficientStock:
+                        pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=pair) for pair in enumerate(self.pharmacists)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        dispensed = Prescription.objects.filter(status='dispensed')
+        self.assertEqual(sorted(dispensed.values_list('id', flat=True)), sorted(outcomes))
+        # Amoxicillin runs out after exactly five prescriptions, whichever ones win
+        self.assertEqual(len(outcomes), 5)
+        stock = dict(Inventory.objects.values_list('item_name', 'quantity_in_stock'))
+        self.assertEqual(stock, {'Amoxicillin': 0, 'Paracetamol': 15})
+        self.assertEqual(PrescriptionDetail.objects.exclude(dispensed_date=None).count(), 10)
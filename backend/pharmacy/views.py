@@ -1,12 +1,19 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import F
+from django.db.models import F, ProtectedError
+from carepoint.conditional import ConditionalGetMixin
+from carepoint.expansion import ExpansionQuerysetMixin
+from carepoint.feeds import parse_window_bound
+from carepoint.filters import DateRangeFilter
+from carepoint.transitions import bulk_transition, parse_ids
+from .dispensing import AlreadyProcessed, dispense_prescription
 from .models import Supplier, Inventory, Prescription, PrescriptionDetail
 from .serializers import (
     SupplierSerializer, InventorySerializer,
-    PrescriptionSerializer, PrescriptionDetailSerializer
+    PrescriptionSerializer, PrescriptionDetailSerializer, StockMovementSerializer
 )
+from .stock import MANUAL_MOVEMENT_KINDS, InsufficientStock, move_stock, stock_at
 
 class SupplierViewSet(viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
@@ -20,10 +27,14 @@ class SupplierViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(supplier_name__icontains=search)
         return queryset
 
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(ConditionalGetMixin, ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = Inventory.objects.all()
     serializer_class = InventorySerializer
+    last_modified_field = 'last_updated'
     permission_classes = [permissions.AllowAny]
+    expand_select_related = {
+        'supplier_details': ['supplier'],
+    }
 
     def get_queryset(self):
         queryset = Inventory.objects.all()
@@ -35,36 +46,96 @@ class InventoryViewSet(viewsets.ModelViewSet):
         if low_stock:
             queryset = queryset.filter(quantity_in_stock__lte=F('reorder_level'))
             
-        return queryset
+        return self.expand_queryset(queryset)
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {'error': 'Items with stock history cannot be deleted; write off their stock instead'},
+                status=status.HTTP_409_CONFLICT
+            )
 
     @action(detail=True, methods=['post'])
     def adjust_stock(self, request, pk=None):
         inventory = self.get_object()
-        quantity = request.data.get('quantity', 0)
+        kind = request.data.get('kind', 'adjustment')
+        note = request.data.get('note', '') or ''
         
         try:
-            quantity = int(quantity)
-            inventory.quantity_in_stock += quantity
-            if inventory.quantity_in_stock < 0:
-                return Response(
-                    {'error': 'Stock cannot be negative'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            inventory.save()
-            return Response({
-                'status': 'stock updated',
-                'new_quantity': inventory.quantity_in_stock
-            })
-        except ValueError:
+            quantity = int(request.data.get('quantity', 0))
+        except (TypeError, ValueError):
             return Response(
                 {'error': 'Invalid quantity'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if kind not in MANUAL_MOVEMENT_KINDS:
+            return Response(
+                {'error': f'kind must be one of {", ".join(MANUAL_MOVEMENT_KINDS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not quantity or (kind == 'receipt' and quantity < 0) or (kind == 'expiry_write_off' and quantity > 0):
+            return Response(
+                {'error': 'Receipts add stock, write-offs remove it, and quantity cannot be zero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            movement = move_stock(
+                inventory.id, quantity, kind,
+                performed_by=request.user if request.user.is_authenticated else None, note=note[:255]
+            )
+        except InsufficientStock:
+            return Response(
+                {'error': 'Stock cannot be negative'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        inventory.refresh_from_db(fields=['quantity_in_stock'])
+        return Response({
+            'status': 'stock updated',
+            'new_quantity': inventory.quantity_in_stock,
+            'movement': StockMovementSerializer(movement).data,
+        })
+
+    @action(detail=True, methods=['get'])
+    def ledger(self, request, pk=None):
+        inventory = self.get_object()
+        movements = inventory.movements.select_related('performed_by').order_by('-created_at', '-id')
+        kind = request.query_params.get('kind', None)
+        if kind:
+            movements = movements.filter(kind=kind)
+        page = self.paginate_queryset(movements)
+        if page is not None:
+            return self.get_paginated_response(StockMovementSerializer(page, many=True).data)
+        return Response(StockMovementSerializer(movements, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def stock_at(self, request, pk=None):
+        inventory = self.get_object()
+        at = request.query_params.get('at', None)
+        if not at:
+            return Response({'error': 'at is required'}, status=status.HTTP_400_BAD_REQUEST)
+        # A bare date means the end of that day
+        moment = parse_window_bound(at, 'at', end=True)
+        return Response({
+            'inventory': inventory.id,
+            'at': moment,
+            'quantity': stock_at(inventory.id, moment),
+        })
 
-class PrescriptionViewSet(viewsets.ModelViewSet):
+class PrescriptionViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = Prescription.objects.all()
     serializer_class = PrescriptionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DateRangeFilter]
+    date_range_field = 'prescribed_date'
+    select_related_always = ('patient', 'doctor')
+    expand_prefetch_related = {
+        'details': ['prescriptiondetail_set'],
+        'details.medication_details': ['prescriptiondetail_set__medication'],
+        'details.medication_details.supplier_details': ['prescriptiondetail_set__medication__supplier'],
+    }
 
     def get_queryset(self):
         queryset = Prescription.objects.all()
@@ -79,46 +150,54 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         if doctor_id:
             queryset = queryset.filter(doctor_id=doctor_id)
 
-        return queryset.order_by('-prescribed_date')
+        return self.expand_queryset(queryset.order_by('-prescribed_date'))
 
     @action(detail=True, methods=['post'])
     def dispense(self, request, pk=None):
         prescription = self.get_object()
-        if prescription.status != 'pending':
+        try:
+            allocations = dispense_prescription(prescription.id, request.user)
+        except InsufficientStock as e:
             return Response(
-                {'error': 'Prescription already processed'}, 
+                {'error': str(e.detail), 'items': e.item_names},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        except AlreadyProcessed as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update prescription status and record who dispensed it
-        prescription.status = 'dispensed'
-        prescription.save()
-
-        # Update inventory for each medication
-        for detail in prescription.prescriptiondetail_set.all():
-            medication = detail.medication
-            if medication.quantity_in_stock < detail.quantity:
-                return Response(
-                    {'error': f'Insufficient stock for {medication.item_name}'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            medication.quantity_in_stock -= detail.quantity
-            medication.save()
-            
-            detail.dispensed_by = request.user
-            detail.dispensed_date = timezone.now()
-            detail.save()
+        return Response({
+            'status': 'prescription dispensed',
+            'allocations': [
+                {
+                    'detail': allocation.detail.id,
+                    'inventory': allocation.batch.id,
+                    'batch_number': allocation.batch.batch_number,
+                    'expiry_date': allocation.batch.expiry_date,
+                    'quantity': allocation.quantity,
+                }
+                for allocation in allocations
+            ],
+        })
 
-        return Response({'status': 'prescription dispensed'})
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        ids = parse_ids(request.data.get('ids'))
+        new_status = request.data.get('status')
+        updated, results = bulk_transition(Prescription.objects.all(), ids, new_status)
+        return Response({'status': new_status, 'updated': updated, 'results': results})
 
-class PrescriptionDetailViewSet(viewsets.ModelViewSet):
+class PrescriptionDetailViewSet(ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = PrescriptionDetail.objects.all()
     serializer_class = PrescriptionDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_select_related = {
+        'medication_details': ['medication'],
+        'medication_details.supplier_details': ['medication__supplier'],
+    }
 
     def get_queryset(self):
         queryset = PrescriptionDetail.objects.all()
         prescription_id = self.request.query_params.get('prescription_id', None)
         if prescription_id:
             queryset = queryset.filter(prescription_id=prescription_id)
-        return queryset
+        return self.expand_queryset(queryset)
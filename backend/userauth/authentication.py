@@ -0,0 +1,129 @@
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from patients.models import Patient
+from .models import Staff
+
+# Seconds; saves and deletes invalidate sooner, on every worker only when CACHES is shared
+PRINCIPAL_CACHE_TIMEOUT = 60
+PRINCIPAL_MODELS = {
+    'staff': Staff,
+    'patient': Patient,
+}
+
+_UNRESOLVED = object()
+
+
+class Principal:
+    """The staff member or patient a request's bearer token belongs to."""
+
+    def __init__(self, user_type, user, token):
+        self.user_type = user_type
+        self.user = user
+        self.token = token
+
+    @property
+    def is_staff(self):
+        return self.user_type == 'staff'
+
+    @property
+    def is_patient(self):
+        return self.user_type == 'patient'
+
+
+def principal_cache_key(user_type, pk):
+    return f'principal:{user_type}:{pk}'
+
+
+def load_principal_row(user_type, pk):
+    key = principal_cache_key(user_type, pk)
+    row = cache.get(key)
+    if row is None:
+        row = PRINCIPAL_MODELS[user_type].objects.filter(pk=pk).first()
+        if row is not None:
+            cache.set(key, row, PRINCIPAL_CACHE_TIMEOUT)
+    return row
+
+
+def _resolve_principal(http_request):
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(http_request)
+    if header is None:
+        return None
+
+    try:
+        raw_token = authenticator.get_raw_token(header)
+    except AuthenticationFailed:
+        return None
+    if raw_token is None:
+        return None
+    return principal_from_raw_token(raw_token)
+
+
+def principal_from_raw_token(raw_token):
+    """Resolve a bare access token to its principal, or None."""
+    try:
+        token = JWTAuthentication().get_validated_token(raw_token)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+
+    user_type = token.get('user_type', 'staff')
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_type not in PRINCIPAL_MODELS or user_id is None:
+        return None
+
+    user = load_principal_row(user_type, user_id)
+    if user is None or not user.is_active:
+        return None
+    return Principal(user_type, user, token)
+
+
+def get_principal(request):
+    """Decode the request's bearer token once and memoize the principal on the request."""
+    http_request = getattr(request, '_request', request)
+    principal = getattr(http_request, '_carepoint_principal', _UNRESOLVED)
+    if principal is _UNRESOLVED:
+        principal = _resolve_principal(http_request)
+        http_request._carepoint_principal = principal
+    return principal
+
+
+def get_request_patient(request):
+    principal = get_principal(request)
+    return principal.user if principal and principal.is_patient else None
+
+
+def get_request_doctor(request):
+    """
+    The doctor behind the token.
+
+    Only a request with no Authorization header at all falls back to the first
+    doctor, for untokened testing. A token that is expired, invalid or not a
+    doctor's is refused instead of being attributed to someone else.
+    """
+    principal = get_principal(request)
+    if principal is None:
+        if JWTAuthentication().get_header(getattr(request, '_request', request)) is not None:
+            raise exceptions.AuthenticationFailed('Token is invalid or expired.')
+        return Staff.objects.filter(role='doctor').first()
+    if not principal.is_staff or principal.user.role != 'doctor':
+        raise exceptions.PermissionDenied('Only doctors can do this.')
+    return principal.user
+
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication for both staff and patient tokens.
+
+    Staff tokens authenticate ``request.user``. Patient tokens (``user_type``
+    claim of ``patient``) leave the request anonymous so staff-only permissions
+    keep working; views read the patient through ``get_request_patient``.
+    """
+
+    def authenticate(self, request):
+        principal = get_principal(request)
+        if principal is None or not principal.is_staff:
+            return None
+        return principal.user, principal.token
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import Staff, StaffSchedule
+
+DIRECTORY_VERSION_KEY = 'doctor_directory:version'
+DIRECTORY_CACHE_TIMEOUT = 60 * 60 * 24
+DIRECTORY_MAX_AGE = 300  # seconds browsers may reuse the directory without revalidating
+DEFAULT_SPECIALIZATION = 'General Medicine'
+DAY_ORDER = {day: index for index, (day, _) in enumerate(StaffSchedule.DAYS_OF_WEEK)}
+
+
+def _directory_version():
+    version = cache.get(DIRECTORY_VERSION_KEY)
+    if version is None:
+        # Time-based so a lost version key never resurrects an older cached directory
+        cache.add(DIRECTORY_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(DIRECTORY_VERSION_KEY)
+    return version
+
+
+def invalidate_doctor_directory():
+    try:
+        cache.incr(DIRECTORY_VERSION_KEY)
+    except ValueError:
+        cache.set(DIRECTORY_VERSION_KEY, time.time_ns(), None)
+
+
+def build_doctor_directory():
+    doctors = Staff.objects.filter(role='doctor', status='active').prefetch_related(
+        Prefetch('staffschedule_set', queryset=StaffSchedule.objects.filter(is_active=True))
+    ).order_by('last_name', 'first_name', 'id')
+
+    results = []
+    facets = {}
+    for doctor in doctors:
+        specialization = doctor.specialization or DEFAULT_SPECIALIZATION
+        facets[specialization] = facets.get(specialization, 0) + 1
+        schedule = sorted(doctor.staffschedule_set.all(), key=lambda slot: DAY_ORDER.get(slot.day_of_week, 7))
+        results.append({
+            'id': doctor.id,
+            'name': doctor.get_full_name(),
+            'specialization': specialization,
+            'schedule': [
+                {
+                    'day': slot.day_of_week,
+                    'start': slot.start_time.strftime('%H:%M'),
+                    'end': slot.end_time.strftime('%H:%M'),
+                }
+                for slot in schedule
+            ],
+        })
+
+    return {
+        'results': results,
+        'facets': {
+            'specialization': [
+                {'value': name, 'count': count} for name, count in sorted(facets.items())
+            ],
+        },
+    }
+
+
+def directory_etag(payload, *variant):
+    body = json.dumps([payload, variant], sort_keys=True, cls=DjangoJSONEncoder)
+    return '"{}"'.format(hashlib.md5(body.encode()).hexdigest())
+
+
+def get_doctor_directory():
+    """Return ``(directory, etag)``, rebuilding only after a Staff/StaffSchedule change."""
+    key = f'doctor_directory:{_directory_version()}'
+    cached = cache.get(key)
+    if cached is None:
+        directory = build_doctor_directory()
+        cached = (directory, directory_etag(directory))
+        cache.set(key, cached, DIRECTORY_CACHE_TIMEOUT)
+    return cached
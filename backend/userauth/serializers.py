@@ -1,14 +1,16 @@
 from rest_framework import serializers
+from carepoint.expansion import ExpandableFieldsMixin
 from .models import Staff, StaffSchedule
 
-class StaffScheduleSerializer(serializers.ModelSerializer):
+class StaffScheduleSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = StaffSchedule
         fields = '__all__'
 
-class StaffSerializer(serializers.ModelSerializer):
+class StaffSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     schedules = StaffScheduleSerializer(many=True, read_only=True, source='staffschedule_set')
     password = serializers.CharField(write_only=True)
+    expandable_fields = ('schedules',)
 
     class Meta:
         model = Staff
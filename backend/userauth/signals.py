@@ -0,0 +1,27 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from patients.models import Patient
+from .authentication import principal_cache_key
+from .directory import invalidate_doctor_directory
+from .models import Staff, StaffSchedule
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def invalidate_staff_principal(sender, instance, **kwargs):
+    cache.delete(principal_cache_key('staff', instance.pk))
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_patient_principal(sender, instance, **kwargs):
+    cache.delete(principal_cache_key('patient', instance.pk))
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+@receiver(post_save, sender=StaffSchedule)
+@receiver(post_delete, sender=StaffSchedule)
+def invalidate_directory(sender, **kwargs):
+    invalidate_doctor_directory()
@@ -1,3 +1,130 @@
+from datetime import date, time
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from laboratory.models import LabRequest
+from patients.models import Patient
+from .models import Staff, StaffSchedule
 
-# Create your tests here.
+
+class PrincipalAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = Staff.objects.create_user(
+            username='doc', password='pass', first_name='Gregory', last_name='House', role='doctor'
+        )
+        cls.patient = Patient.objects.create(
+            first_name='Ann', last_name='Otieno', date_of_birth=date(1990, 1, 1), gender='F',
+            contact_email='ann@example.com', contact_phone='0712345678', address='Nairobi'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def authorize(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def patient_token(self):
+        refresh = RefreshToken()
+        refresh['user_id'] = self.patient.id
+        refresh['user_type'] = 'patient'
+        return refresh.access_token
+
+    def test_staff_token_authenticates_request_user(self):
+        self.authorize(RefreshToken.for_user(self.doctor).access_token)
+        response = self.client.get('/api/auth/schedules/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_patient_token_resolves_patient_but_not_staff(self):
+        self.authorize(self.patient_token())
+        response = self.client.get('/api/patients/patients/me/')
+        self.assertEqual(response.data['contact_email'], 'ann@example.com')
+        response = self.client.get('/api/auth/schedules/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_principal_rows_are_cached_and_invalidated(self):
+        self.authorize(self.patient_token())
+        self.client.get('/api/patients/patients/me/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/patients/patients/me/')
+
+        self.patient.first_name = 'Annie'
+        self.patient.save()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/patients/patients/me/')
+        self.assertEqual(response.data['first_name'], 'Annie')
+
+    def test_doctor_actions_refuse_tokens_that_are_not_a_doctors(self):
+        nurse = Staff.objects.create_user(username='nurse', password='pass', role='nurse')
+        payload = {'patient_id': self.patient.id, 'test_name': 'CBC'}
+        for token, expected in (
+            ('expired-or-garbage', 401),
+            (self.patient_token(), 403),
+            (RefreshToken.for_user(nurse).access_token, 403),
+        ):
+            with self.subTest(expected=expected):
+                self.authorize(token)
+                response = self.client.post('/api/laboratory/requests/create_request/', payload, format='json')
+                self.assertEqual(response.status_code, expected)
+        self.assertFalse(LabRequest.objects.exists())
+
+        # Only a request without any Authorization header uses the testing fallback
+        self.client.credentials()
+        response = self.client.post('/api/laboratory/requests/create_request/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(LabRequest.objects.get().doctor, self.doctor)
+
+    def test_invalid_token_is_anonymous(self):
+        self.authorize('not-a-token')
+        response = self.client.get('/api/patients/patients/my_records/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['error'], 'Invalid token')
+
+
+class DoctorDirectoryTests(TestCase):
+    url = '/api/patients/patients/doctors/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.house = Staff.objects.create_user(
+            username='house', password='pass', first_name='Gregory', last_name='House',
+            role='doctor', specialization='Diagnostics'
+        )
+        Staff.objects.create_user(
+            username='wilson', password='pass', first_name='James', last_name='Wilson',
+            role='doctor', specialization='Oncology'
+        )
+        Staff.objects.create_user(username='nurse', password='pass', role='nurse')
+        StaffSchedule.objects.create(staff=cls.house, day_of_week='Wednesday', start_time=time(9), end_time=time(17))
+        StaffSchedule.objects.create(staff=cls.house, day_of_week='Monday', start_time=time(8), end_time=time(12))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_directory_with_facets_and_schedules(self):
+        response = self.client.get(self.url)
+        self.assertEqual([d['name'] for d in response.data['results']], ['Gregory House', 'James Wilson'])
+        self.assertEqual([s['day'] for s in response.data['results'][0]['schedule']], ['Monday', 'Wednesday'])
+        self.assertEqual(response.data['facets']['specialization'], [
+            {'value': 'Diagnostics', 'count': 1}, {'value': 'Oncology', 'count': 1}
+        ])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+        response = self.client.get(self.url, {'specialization': 'Oncology'})
+        self.assertEqual([d['name'] for d in response.data['results']], ['James Wilson'])
+
+    def test_cached_until_staff_or_schedule_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        StaffSchedule.objects.filter(day_of_week='Monday').update(start_time=time(10))
+        StaffSchedule.objects.get(day_of_week='Monday').save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['schedule'][0]['start'], '10:00')
+        self.assertNotEqual(response['ETag'], etag)
@@ -1,6 +1,8 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from carepoint.conditional import ConditionalGetMixin
+from carepoint.expansion import ExpansionQuerysetMixin
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import Staff, StaffSchedule
@@ -8,17 +10,21 @@ from .serializers import StaffSerializer, StaffScheduleSerializer
 from patients.models import Patient
 from patients.serializers import PatientSerializer
 
-class StaffViewSet(viewsets.ModelViewSet):
+class StaffViewSet(ConditionalGetMixin, ExpansionQuerysetMixin, viewsets.ModelViewSet):
     queryset = Staff.objects.all()
     serializer_class = StaffSerializer
+    last_modified_field = 'updated_date'
     permission_classes = [permissions.AllowAny]
+    expand_prefetch_related = {
+        'schedules': ['staffschedule_set'],
+    }
 
     def get_queryset(self):
         queryset = Staff.objects.all()
         role = self.request.query_params.get('role', None)
         if role is not None:
             queryset = queryset.filter(role=role)
-        return queryset
+        return self.expand_queryset(queryset)
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def login(self, request):
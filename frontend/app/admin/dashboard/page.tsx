@@ -36,7 +36,7 @@ export default function AdminDashboard() {
         })
         
         // Fetch appointments
-        const appointmentsResponse = await fetch('http://localhost:8000/api/appointments/appointments/', {
+        const appointmentsResponse = await fetch('http://localhost:8000/api/appointments/appointments/?expand=patient_details,doctor_details', {
           headers: { 'Content-Type': 'application/json' }
         })
         
@@ -48,8 +48,8 @@ export default function AdminDashboard() {
           headers: { 'Content-Type': 'application/json' }
         })
         
-        // Fetch medical records (same as Records page)
-        const recordsResponse = await fetch('http://localhost:8000/api/patients/medical-records/', {
+        // Fetch the newest medical records; the panel only shows five, so one short page is enough
+        const recordsResponse = await fetch('http://localhost:8000/api/patients/medical-records/?page_size=5', {
           headers: { 'Content-Type': 'application/json' }
         })
         
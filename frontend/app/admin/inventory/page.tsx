@@ -48,6 +48,7 @@ export default function AdminInventory() {
       let url = 'http://localhost:8000/api/pharmacy/inventory/'
       
       const params = new URLSearchParams()
+      params.append('expand', 'supplier_details')
       if (categoryFilter !== 'all') {
         params.append('category', categoryFilter)
       }
@@ -5,6 +5,7 @@ import { Card, CardContent } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
 import { Input } from "@/components/ui/input"
 import { FileText, Search, Eye, Plus, Calendar, User } from "lucide-react"
+import { fetchPage } from "@/lib/utils"
 
 interface MedicalRecord {
   id: string
@@ -21,46 +22,38 @@ export default function AdminMedicalRecords() {
   const [records, setRecords] = useState<MedicalRecord[]>([])
   const [loading, setLoading] = useState(true)
   const [searchTerm, setSearchTerm] = useState("")
+  const [nextUrl, setNextUrl] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+
+  const formatRecord = (record: any): MedicalRecord => ({
+    id: record.id,
+    patientName: `${record.patient?.first_name || ''} ${record.patient?.last_name || ''}`.trim(),
+    patientId: `P${record.patient?.id || '000'}`,
+    recordType: record.record_type || 'General',
+    description: record.description || 'No description',
+    recordDate: record.record_date,
+    doctorName: record.recorded_by?.first_name ? `${record.recorded_by.first_name} ${record.recorded_by.last_name}` : 'Unknown Doctor'
+  })
+
+  // The records list is paginated newest first; older pages load on request
+  const loadRecords = async (url: string) => {
+    const page = await fetchPage<any>(url, {
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    })
+    if (!page) {
+      console.error('Failed to fetch medical records:', url)
+      return
+    }
+    setRecords(prev => [...prev, ...page.results.map(formatRecord)])
+    setNextUrl(page.next)
+  }
 
   useEffect(() => {
     const fetchRecords = async () => {
       try {
-        const accessToken = localStorage.getItem('access_token')
-        console.log('Fetching medical records with token:', accessToken ? 'Token exists' : 'No token')
-        
-        const response = await fetch('http://localhost:8000/api/patients/medical-records/', {
-          headers: {
-            'Content-Type': 'application/json',
-          },
-        })
-        
-        console.log('Response status:', response.status)
-        
-        if (response.ok) {
-          const data = await response.json()
-          console.log('Raw API response:', data)
-          
-          // Handle both paginated and non-paginated responses
-          const recordsArray = data.results || data
-          console.log('Records array:', recordsArray)
-          
-          const formattedRecords = recordsArray.map((record: any) => ({
-            id: record.id,
-            patientName: `${record.patient?.first_name || ''} ${record.patient?.last_name || ''}`.trim(),
-            patientId: `P${record.patient?.id || '000'}`,
-            recordType: record.record_type || 'General',
-            description: record.description || 'No description',
-            recordDate: record.record_date,
-            doctorName: record.recorded_by?.first_name ? `${record.recorded_by.first_name} ${record.recorded_by.last_name}` : 'Unknown Doctor'
-          }))
-          
-          console.log('Formatted records:', formattedRecords)
-          setRecords(formattedRecords)
-        } else {
-          console.error('API response not ok:', response.status, response.statusText)
-          const errorText = await response.text()
-          console.error('Error response:', errorText)
-        }
+        await loadRecords('http://localhost:8000/api/patients/medical-records/')
       } catch (error) {
         console.error('Failed to fetch medical records:', error)
       } finally {
@@ -71,6 +64,18 @@ export default function AdminMedicalRecords() {
     fetchRecords()
   }, [])
 
+  const loadMore = async () => {
+    if (!nextUrl) return
+    setLoadingMore(true)
+    try {
+      await loadRecords(nextUrl)
+    } catch (error) {
+      console.error('Failed to fetch more medical records:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleLogout = () => {
     localStorage.removeItem('access_token')
     localStorage.removeItem('refresh_token')
@@ -179,7 +184,7 @@ export default function AdminMedicalRecords() {
             </div>
           ) : (
             <div className="space-y-4">
-              <p className="text-sm text-gray-500 mb-4">Showing {filteredRecords.length} of {records.length} records</p>
+              <p className="text-sm text-gray-500 mb-4">Showing {filteredRecords.length} of {records.length}{nextUrl ? "+" : ""} records</p>
               {filteredRecords.map((record) => (
                 <Card key={record.id} className="bg-white border border-gray-200 hover:shadow-md transition-shadow">
                   <CardContent className="p-6">
@@ -216,6 +221,13 @@ export default function AdminMedicalRecords() {
               ))}
             </div>
           )}
+          {!loading && nextUrl && (
+            <div className="text-center pt-4">
+              <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? "Loading..." : "Load older records"}
+              </Button>
+            </div>
+          )}
         </div>
       </div>
     </div>
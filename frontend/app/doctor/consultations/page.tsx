@@ -7,6 +7,7 @@ import { Button } from "@/components/ui/button"
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "@/components/ui/dialog"
 import { Input } from "@/components/ui/input"
 import { Calendar, Phone, FileText, Plus, Video } from "lucide-react"
+import { fetchAllPages, PANEL_MAX_PAGES } from "@/lib/utils"
 
 interface Consultation {
   id: string
@@ -43,30 +44,28 @@ export default function Consultations() {
       try {
         const accessToken = localStorage.getItem('access_token')
         
-        // Fetch consultations
-        const consultationsResponse = await fetch('http://localhost:8000/api/appointments/consultations/doctor_consultations/', {
+        // Fetch consultations; the feed is paginated, so follow every page
+        const consultationList = await fetchAllPages<Consultation>('http://localhost:8000/api/appointments/consultations/doctor_consultations/', {
           headers: {
             'Authorization': `Bearer ${accessToken}`,
             'Content-Type': 'application/json',
           },
         })
         
-        if (consultationsResponse.ok) {
-          const data = await consultationsResponse.json()
-          setConsultations(data.results)
+        if (consultationList) {
+          setConsultations(consultationList)
         }
         
-        // Fetch patients for dropdown
-        const patientsResponse = await fetch('http://localhost:8000/api/patients/patients/doctor_patients/', {
+        // Fetch patients for dropdown; the panel is paginated, so follow every page
+        const panel = await fetchAllPages<any>('http://localhost:8000/api/patients/patients/doctor_patients/', {
           headers: {
             'Authorization': `Bearer ${accessToken}`,
             'Content-Type': 'application/json',
           },
-        })
+        }, PANEL_MAX_PAGES)
         
-        if (patientsResponse.ok) {
-          const patientsData = await patientsResponse.json()
-          setPatients(patientsData.results)
+        if (panel) {
+          setPatients(panel)
         }
         
         const email = localStorage.getItem("userEmail")
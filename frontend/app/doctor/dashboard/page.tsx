@@ -6,13 +6,14 @@ import { Card, CardContent } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "@/components/ui/dialog"
 import { Calendar, Clock, CheckCircle, AlertCircle, Phone, Eye } from "lucide-react"
+import { fetchAllPages, localDateString } from "@/lib/utils"
 
 interface DoctorAppointment {
   id: string
   patientName: string
   patientId: string
   time: string
-  status: "pending" | "in-progress" | "completed"
+  status: "pending" | "in_progress" | "completed"
   reason: string
   phone: string
 }
@@ -23,23 +24,27 @@ export default function DoctorDashboard() {
   const [loading, setLoading] = useState(true)
   const [selectedAppointment, setSelectedAppointment] = useState<DoctorAppointment | null>(null)
   const [showModal, setShowModal] = useState(false)
+  const [reloadKey, setReloadKey] = useState(0)
 
   useEffect(() => {
     const fetchData = async () => {
       try {
         const accessToken = localStorage.getItem('access_token')
         
-        // Fetch doctor appointments
-        const response = await fetch('http://localhost:8000/api/patients/patients/doctor_appointments/', {
-          headers: {
-            'Authorization': `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-          },
-        })
+        // Fetch today's doctor appointments; the feed is paginated, so follow every page
+        const today = localDateString()
+        const appointments = await fetchAllPages<DoctorAppointment>(
+          `http://localhost:8000/api/patients/patients/doctor_appointments/?from=${today}&to=${today}`,
+          {
+            headers: {
+              'Authorization': `Bearer ${accessToken}`,
+              'Content-Type': 'application/json',
+            },
+          }
+        )
         
-        if (response.ok) {
-          const data = await response.json()
-          setTodayAppointments(data.results)
+        if (appointments) {
+          setTodayAppointments(appointments)
         }
         
         // Set doctor name from token or default
@@ -53,6 +58,68 @@ export default function DoctorDashboard() {
     }
 
     fetchData()
+  }, [reloadKey])
+
+  // Status changes are pushed by the server instead of re-fetching the day.
+  // Streams need the backend running under ASGI, so they are opt-in.
+  useEffect(() => {
+    if (process.env.NEXT_PUBLIC_LIVE_UPDATES !== 'true') return
+    const accessToken = localStorage.getItem('access_token')
+    if (!accessToken) return
+    let source: EventSource | null = null
+    let retry: ReturnType<typeof setTimeout> | undefined
+    let lastEventId = ''
+    let stopped = false
+
+    const connect = async () => {
+      // EventSource cannot send the bearer token, so trade it for a short-lived stream ticket
+      const response = await fetch('http://localhost:8000/api/appointments/appointments/live_ticket/', {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${accessToken}`,
+        },
+      }).catch(() => null)
+      if (stopped) return
+      if (!response || !response.ok) {
+        // 501: the backend is not serving streams; 401: signed out. Otherwise try again later
+        if (response?.status !== 501 && response?.status !== 401) retry = setTimeout(connect, 30000)
+        return
+      }
+      const { ticket } = await response.json()
+      if (stopped) return
+      const params = new URLSearchParams({ ticket })
+      if (lastEventId) params.set('last_event_id', lastEventId)
+      source = new EventSource(`http://localhost:8000/api/appointments/live/?${params}`)
+      source.addEventListener('appointment', handleDelta)
+      source.onerror = () => {
+        // The browser reconnects by itself until the ticket expires; then it gives up and needs a new one
+        if (source?.readyState === EventSource.CLOSED) {
+          retry = setTimeout(connect, 3000)
+        }
+      }
+    }
+
+    const handleDelta = (event: Event) => {
+      lastEventId = (event as MessageEvent).lastEventId || lastEventId
+      const delta = JSON.parse((event as MessageEvent).data)
+      const id = String(delta.id)
+      setTodayAppointments(prev => {
+        if (!prev.some(apt => apt.id === id)) {
+          // A booking we have not seen yet; load it with the rest of the list
+          setReloadKey(key => key + 1)
+          return prev
+        }
+        return prev.map(apt => apt.id === id ? { ...apt, status: delta.status } : apt)
+      })
+      setSelectedAppointment(prev => prev?.id === id ? { ...prev, status: delta.status } : prev)
+    }
+
+    connect()
+    return () => {
+      stopped = true
+      clearTimeout(retry)
+      source?.close()
+    }
   }, [])
 
   const handleStatusChange = async (appointmentId: string, newStatus: string) => {
@@ -101,13 +168,13 @@ export default function DoctorDashboard() {
 
   const getStatusIcon = (status: string) => {
     if (status === "completed") return <CheckCircle className="w-4 h-4 text-green-600" />
-    if (status === "in-progress") return <Clock className="w-4 h-4 text-blue-600" />
+    if (status === "in_progress") return <Clock className="w-4 h-4 text-blue-600" />
     return <AlertCircle className="w-4 h-4 text-yellow-600" />
   }
 
   const getStatusColor = (status: string) => {
     if (status === "completed") return "bg-green-100 text-green-800"
-    if (status === "in-progress") return "bg-blue-100 text-blue-800"
+    if (status === "in_progress") return "bg-blue-100 text-blue-800"
     return "bg-yellow-100 text-yellow-800"
   }
 
@@ -264,8 +331,8 @@ export default function DoctorDashboard() {
                   </Button>
                   <Button 
                     size="sm" 
-                    variant={selectedAppointment.status === 'in-progress' ? 'default' : 'outline'}
-                    onClick={() => handleStatusChange(selectedAppointment.id, 'in-progress')}
+                    variant={selectedAppointment.status === 'in_progress' ? 'default' : 'outline'}
+                    onClick={() => handleStatusChange(selectedAppointment.id, 'in_progress')}
                   >
                     In Progress
                   </Button>
@@ -7,6 +7,7 @@ import { Button } from "@/components/ui/button"
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "@/components/ui/dialog"
 import { Input } from "@/components/ui/input"
 import { TestTubes, Plus, Eye, Trash2 } from "lucide-react"
+import { fetchAllPages, PANEL_MAX_PAGES } from "@/lib/utils"
 
 interface LabRequest {
   id: string
@@ -48,17 +49,16 @@ export default function LabRequests() {
           setRequests(data.results)
         }
         
-        // Fetch patients for dropdown
-        const patientsResponse = await fetch('http://localhost:8000/api/patients/patients/doctor_patients/', {
+        // Fetch patients for dropdown; the panel is paginated, so follow every page
+        const panel = await fetchAllPages<any>('http://localhost:8000/api/patients/patients/doctor_patients/', {
           headers: {
             'Authorization': `Bearer ${accessToken}`,
             'Content-Type': 'application/json',
           },
-        })
+        }, PANEL_MAX_PAGES)
         
-        if (patientsResponse.ok) {
-          const patientsData = await patientsResponse.json()
-          setPatients(patientsData.results)
+        if (panel) {
+          setPatients(panel)
         }
         
         const email = localStorage.getItem("userEmail")
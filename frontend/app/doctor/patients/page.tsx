@@ -7,6 +7,7 @@ import { Button } from "@/components/ui/button"
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "@/components/ui/dialog"
 import { Search, Phone, Mail, Eye } from "lucide-react"
 import { Input } from "@/components/ui/input"
+import { fetchAllPages, PANEL_MAX_PAGES } from "@/lib/utils"
 
 interface Patient {
   id: string
@@ -32,17 +33,16 @@ export default function MyPatients() {
       try {
         const accessToken = localStorage.getItem('access_token')
         
-        // Fetch doctor's patients
-        const response = await fetch('http://localhost:8000/api/patients/patients/doctor_patients/', {
+        // Fetch doctor's patients; the panel is paginated, so follow every page
+        const panel = await fetchAllPages<Patient>('http://localhost:8000/api/patients/patients/doctor_patients/', {
           headers: {
             'Authorization': `Bearer ${accessToken}`,
             'Content-Type': 'application/json',
           },
-        })
+        }, PANEL_MAX_PAGES)
         
-        if (response.ok) {
-          const data = await response.json()
-          setPatients(data.results)
+        if (panel) {
+          setPatients(panel)
         }
         
         // Set doctor name
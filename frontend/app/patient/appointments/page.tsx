@@ -5,6 +5,7 @@ import { Card, CardContent } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
 import { Calendar, Clock, MapPin, Plus, User2 } from "lucide-react"
 import { PatientSidebar } from "@/components/patient-sidebar"
+import { fetchAllPages } from "@/lib/utils"
 
 interface Appointment {
   id: string
@@ -31,16 +32,16 @@ export default function PatientAppointments() {
           return
         }
 
-        const response = await fetch('http://localhost:8000/api/patients/patients/my_appointments/', {
+        // The feed is paginated, so follow every page
+        const appointments = await fetchAllPages<Appointment>('http://localhost:8000/api/patients/patients/my_appointments/', {
           headers: {
             'Authorization': `Bearer ${accessToken}`,
             'Content-Type': 'application/json',
           },
         })
         
-        if (response.ok) {
-          const data = await response.json()
-          setAppointments(data.results || [])
+        if (appointments) {
+          setAppointments(appointments)
         }
       } catch (error) {
         console.error('Failed to fetch appointments:', error)
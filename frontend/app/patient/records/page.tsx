@@ -5,6 +5,7 @@ import { PatientSidebar } from "@/components/patient-sidebar"
 import { Card, CardContent } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
 import { FileText, Download, Eye, Calendar, User, Plus } from "lucide-react"
+import { fetchPage } from "@/lib/utils"
 
 interface MedicalRecord {
   id: string
@@ -21,6 +22,13 @@ export default function MedicalRecords() {
   const [userName, setUserName] = useState("Loading...")
   const [records, setRecords] = useState<MedicalRecord[]>([])
   const [loading, setLoading] = useState(true)
+  const [nextUrl, setNextUrl] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+
+  const authHeaders = () => ({
+    'Authorization': `Bearer ${localStorage.getItem('access_token')}`,
+    'Content-Type': 'application/json',
+  })
 
   useEffect(() => {
     const fetchData = async () => {
@@ -41,17 +49,14 @@ export default function MedicalRecords() {
           setUserName(`${patient.first_name} ${patient.last_name}`)
         }
 
-        // Fetch records
-        const recordsResponse = await fetch('http://localhost:8000/api/patients/patients/my_records/', {
-          headers: {
-            'Authorization': `Bearer ${accessToken}`,
-            'Content-Type': 'application/json',
-          },
+        // Fetch the newest records; older pages load on request
+        const page = await fetchPage<MedicalRecord>('http://localhost:8000/api/patients/patients/my_records/', {
+          headers: authHeaders(),
         })
         
-        if (recordsResponse.ok) {
-          const data = await recordsResponse.json()
-          setRecords(data.results)
+        if (page) {
+          setRecords(page.results)
+          setNextUrl(page.next)
         }
       } catch (error) {
         console.error('Failed to fetch data:', error)
@@ -63,6 +68,21 @@ export default function MedicalRecords() {
     fetchData()
   }, [])
 
+  const loadMore = async () => {
+    if (!nextUrl) return
+    setLoadingMore(true)
+    try {
+      const page = await fetchPage<MedicalRecord>(nextUrl, { headers: authHeaders() })
+      if (page) {
+        setRecords(prev => [...prev, ...page.results])
+        setNextUrl(page.next)
+      }
+    } catch (error) {
+      console.error('Failed to fetch more records:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
 
 
   return (
@@ -124,6 +144,13 @@ export default function MedicalRecords() {
                 </CardContent>
               </Card>
             ))}
+            {nextUrl && (
+              <div className="text-center pt-2">
+                <Button variant="outline" className="border-border bg-transparent" onClick={loadMore} disabled={loadingMore}>
+                  {loadingMore ? "Loading..." : "Load older records"}
+                </Button>
+              </div>
+            )}
           </div>
         )}
       </main>
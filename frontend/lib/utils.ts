@@ -4,3 +4,48 @@ import { twMerge } from 'tailwind-merge'
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
+
+// Reads one page of a paginated API list: its rows and the `next` link, if any.
+// Returns null when the request fails, like a single fetch that is not ok.
+export async function fetchPage<T>(url: string, init?: RequestInit): Promise<{ results: T[]; next: string | null } | null> {
+  const response = await fetch(url, init)
+  if (!response.ok) {
+    return null
+  }
+  const data = await response.json()
+  if (Array.isArray(data)) {
+    return { results: data, next: null }
+  }
+  return { results: data.results ?? [], next: data.next ?? null }
+}
+
+// Page cap for a doctor's patient panel (10 per page), which feeds lists and dropdowns
+export const PANEL_MAX_PAGES = 200
+
+// Reads every page of a paginated API list by following its `next` links.
+// For short lists only (e.g. dropdowns); long histories should page with fetchPage.
+// Returns null when the first page fails; stops with a warning after maxPages.
+export async function fetchAllPages<T>(url: string, init?: RequestInit, maxPages = 50): Promise<T[] | null> {
+  const results: T[] = []
+  let next: string | null = url
+  for (let page = 0; next; page++) {
+    if (page === maxPages) {
+      console.warn(`Stopped reading ${url} after ${maxPages} pages; the list is incomplete`)
+      break
+    }
+    const data = await fetchPage<T>(next, init)
+    if (!data) {
+      return page === 0 ? null : results
+    }
+    results.push(...data.results)
+    next = data.next
+  }
+  return results
+}
+
+// Today's date in the browser's timezone as YYYY-MM-DD, for date-windowed feeds
+export function localDateString(date: Date = new Date()): string {
+  const month = String(date.getMonth() + 1).padStart(2, '0')
+  const day = String(date.getDate()).padStart(2, '0')
+  return `${date.getFullYear()}-${month}-${day}`
+}